@@ -1,46 +1,801 @@
 import logging
-from jira_instance import JiraInstance
+import math
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import async_jira
+from async_jira import AsyncJiraInstance
+from jira_instance import JiraInstance, prefetch_pool
+from cache import TTLCache
+import persistence
+from speech import speech_summaries
+from task_index import TaskIndex
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logger.setLevel(logging.INFO)
 
+# Projects the skill works in, in order of preference. Each user works in the first one their site has
+PROJECT_KEYS = [key.strip() for key in os.environ.get("JIRA_PROJECT_KEYS", "PTD").split(",") if key.strip()]
+# Issue types whose ids and required fields are looked up with the projects
+ISSUE_TYPES = (JiraInstance.TYPE_TASK, JiraInstance.TYPE_STORY, JiraInstance.TYPE_EPIC)
+
+# Short lived per user, per query results, so "how many" followed by "what are" only goes to Jira once
+RESULT_CACHE_TTL = 30
+RESULT_CACHE_SIZE = 512
+RESULT_CACHE_BYTES = 2 * 1024 * 1024
+
+
+def result_size(value):
+    """Estimates a cached result's size, counting the summaries in a list as well as the list itself"""
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+result_cache = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL, max_bytes=RESULT_CACHE_BYTES, size_of=result_size)
+
+# The last answer seen for each query, kept much longer, for when Jira is too slow to answer in time
+LAST_KNOWN_CACHE_TTL = 24 * 3600
+last_known_cache = TTLCache(RESULT_CACHE_SIZE, LAST_KNOWN_CACHE_TTL, max_bytes=RESULT_CACHE_BYTES,
+                            size_of=result_size)
+
+# Tasks we couldn't send to Jira in time, kept in the persistence store per user and created on a later request
+PENDING_TASKS_LIMIT = 20
+PENDING_FLUSH_MIN_TIME = 3.0
+
+# Per user copies of the open Tasks, kept current with searches for what changed since the last sync
+TASK_INDEX_TTL = 24 * 3600
+TASK_INDEX_SIZE = 128
+task_indexes = TTLCache(TASK_INDEX_SIZE, TASK_INDEX_TTL)
+task_indexes_lock = threading.Lock()
+# Syncs closer together than this are skipped, so concurrent queries in one request share a sync
+INDEX_SYNC_INTERVAL = 2
+# How often the index is checked against the full list of open keys, to catch deleted issues
+INDEX_RECONCILE_INTERVAL = 15 * 60
+# While Jira webhooks for the site are reaching this container they keep the index current, so it's synced
+# much less often, about as often as a cached result would be refreshed anyway
+WEBHOOK_SYNC_INTERVAL = RESULT_CACHE_TTL
+WEBHOOK_LIVE_WINDOW = 15 * 60
+
+# Lists are read out a page at a time. The session carries the next few items, and the page after those is
+# fetched in the background into the container, ready for when the session runs out
+LIST_PAGE_ITEMS = 5
+LIST_BUFFER_ITEMS = 10
+LIST_PREFETCH_TTL = 300
+list_prefetch = TTLCache(RESULT_CACHE_SIZE, LIST_PREFETCH_TTL)
+
+# Bounded pool for the independent searches behind a single request, such as the daily briefing
+QUERY_WORKERS = 6
+query_pool = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="jira-query")
+BRIEFING_TIMEOUT = 5
+BRIEFING_TOP_TASKS = 3
+
+# Full syncs and scans fetch the pages after the first all at once, on the shared event loop, when aiohttp is there
+ASYNC_JIRA = os.environ.get("JIRA_ASYNC", "1") != "0" and async_jira.available()
+
+# Snapshots older than this aren't trusted, however quiet the project has been
+SNAPSHOT_MAX_AGE = 7 * 24 * 3600
+SNAPSHOT_LIST_ITEMS = 200
+# Snapshots precomputed by the scheduled warm up are answered from without checking for this long, and checked after
+PRECOMPUTED_MAX_AGE = 15 * 60
+
+# Result cache kinds
+RESULT_COUNT = "count"
+RESULT_LIST = "list"
+RESULT_HISTOGRAM = "histogram"
+
+# Words and punctuation that separate tasks dictated together, e.g. "milk, eggs and bread"
+TASK_SEPARATORS = re.compile(r"\s*[,;]\s*")
+# "and" and "then" only separate tasks where they close a list, e.g. "milk, eggs and bread", since a single task
+# can use them too, e.g. "buy fish and chips"
+LIST_LEADING_WORDS = re.compile(r"^(?:and then|and|then)\s+", re.IGNORECASE)
+LIST_CLOSING_WORDS = re.compile(r"\s+(?:and then|and|then)\s+", re.IGNORECASE)
+
+
+def minutes_since(timestamp):
+    """Whole minutes since a time.time() timestamp, rounded up, plus one for changes made during the sync"""
+    return math.ceil(max(0.0, time.time() - timestamp) / 60) + 1
+
+
+def site_indexes(site_id):
+    """The task indexes this container holds for a site, as ((user key, site, project, type), index) pairs"""
+    return [(key, index) for key, index in task_indexes.items() if key[1] == site_id]
+
+
+def index_changed(index_key):
+    """Drops the cached answers a webhook has made out of date, given the key of the task index it changed"""
+    user_key, _, project_key, issue_type_name = index_key
+    for status in (JiraInstance.STATUS_TODO, JiraInstance.STATUS_IN_PROGRESS, JiraInstance.STATUS_DONE):
+        for kind in (RESULT_COUNT, RESULT_LIST):
+            result_cache.invalidate((user_key, kind, project_key, issue_type_name, status))
+    result_cache.invalidate((user_key, RESULT_HISTOGRAM, project_key))
+
+
+def index_sync_interval(index, now):
+    """How long an index can go between syncs, longer while webhooks are arriving for its site"""
+    if index.last_event is not None and now - index.last_event < WEBHOOK_LIVE_WINDOW:
+        return WEBHOOK_SYNC_INTERVAL
+    return INDEX_SYNC_INTERVAL
+
+
+def split_task_names(utterance):
+    """Splits an utterance listing several tasks into the individual task names. Without a comma it's one task"""
+    names = [LIST_LEADING_WORDS.sub("", name.strip()) for name in TASK_SEPARATORS.split(utterance) if name.strip()]
+    if len(names) > 1:
+        names[-1:] = LIST_CLOSING_WORDS.split(names[-1], maxsplit=1)
+    return [name for name in names if name]
+
+
+def spoken_task_names(utterance):
+    """The tasks an unpunctuated utterance may list, split at every "and" and "then", or None if it's punctuated
+    or has neither. Alexa's slot values have no commas, and speech can't tell the list "buy milk and bread" from
+    the task "buy fish and chips", so the caller asks which was meant"""
+    if TASK_SEPARATORS.search(utterance):
+        return None
+    names = [name.strip() for name in LIST_CLOSING_WORDS.split(LIST_LEADING_WORDS.sub("", utterance.strip()))]
+    names = [name for name in names if name]
+    return names if len(names) > 1 else None
+
 
 class AlexaJiraHelper:
     """Helper class to abstract Jira calls for Alexa consumption"""
 
-    def __init__(self, access_token):
-        self.jira_instance = JiraInstance(access_token)
-        self.project_key = "PTD"
+    def __init__(self, access_token, deadline=None, metrics=None, snapshot=None, user_key=None):
+        self.jira_instance = JiraInstance(access_token, deadline=deadline, metrics=metrics)
+        # Shares the sync client's site, metadata and deadline, for the calls that can overlap
+        self.async_jira = AsyncJiraInstance(self.jira_instance) if ASYNC_JIRA else None
+        # Who the task index belongs to. Tokens are refreshed, so a stable user id is better when there is one
+        self.user_key = user_key or self.jira_instance.token_fingerprint
+        # Only a stable user id can hold tasks for a later request
+        self.pending_key = user_key
+        self.deadline = deadline
+        self.metrics = self.jira_instance.metrics
+        self.project_keys = list(PROJECT_KEYS)
+        self.project_key = self.project_keys[0]
         self.connected = False
+        # Set when an answer came from the last known results, or a task was queued, because Jira ran out of time
+        self.stale = False
+        self.queued = False
+        # The user's saved snapshot, whether it still matches Jira once checked, and when Jira was last read
+        self.snapshot = None
+        self.snapshot_current = None
+        self.synced_at = None
+        if snapshot is not None and snapshot.get("project_key") in self.project_keys:
+            self.seed_from_snapshot(snapshot)
+
         # Get the Jira site ID
         ret_status = self.jira_instance.set_site_id()
 
-        # Check we've got the site
+        # Check we've got the site, and a project on it to work in
         if not ret_status:
             self.connected = False
         else:
-            self.connected = True
+            self.connected = self.resolve_project()
+            if self.connected:
+                self.flush_pending_tasks()
+
+        # Not connected only because Jira was slow or down, so fallback answers are still possible
+        self.degraded = not self.connected and self.jira_instance.unavailable()
+
+    def seed_from_snapshot(self, snapshot):
+        """Primes the container caches from a snapshot written by an earlier container"""
+        self.snapshot = snapshot
+        self.project_key = snapshot["project_key"]
+        self.jira_instance.seed_site_id(snapshot.get("site_id"), snapshot.get("cloud_ids"))
+        self.jira_instance.seed_metadata(snapshot.get("site_id"), self.project_keys, snapshot.get("projects"))
+        issue_type = self.jira_instance.TYPE_TASK
+        issue_status = self.jira_instance.STATUS_TODO
+        for kind, value in ((RESULT_COUNT, snapshot.get("todo_count")),
+                            (RESULT_LIST, snapshot.get("todo_summaries"))):
+            key = self.result_key(kind, issue_type, issue_status)
+            if value is not None and last_known_cache.get(key) is None:
+                last_known_cache.put(key, value)
+
+    def resolve_project(self):
+        """Loads the metadata of the configured projects and works in the first one the user's site has.
+        Returns False if the site has none of them, so requests fail here instead of in Jira"""
+        ret_status, projects = self.jira_instance.load_metadata(self.project_keys, ISSUE_TYPES)
+        if not ret_status:
+            # Carry on by key and name, and let Jira check them
+            return True
+        available = [project_key for project_key in self.project_keys if project_key in projects]
+        if not available:
+            self.jira_instance.rejected(f"none of the projects {', '.join(self.project_keys)} on the site")
+            return False
+        self.project_key = available[0]
+        return True
+
+    def snapshot_is_current(self):
+        """Checks, with a single count query, that no Task has been created or changed since the snapshot was
+        taken, so its To Do count and list can be used as they are. Checked at most once per request"""
+        if self.snapshot_current is None:
+            self.snapshot_current = False
+            last_sync = self.snapshot.get("last_sync") if self.snapshot is not None else None
+            if self.snapshot_precomputed():
+                # Written moments ago by the scheduled warm up, so answer now and bring the index up to date after
+                self.snapshot_current = True
+                self.metrics.add("PrecomputedAnswers", 1)
+                if self.connected:
+                    query_pool.submit(self.synced_index)
+            elif last_sync is not None and self.connected and time.time() - last_sync < SNAPSHOT_MAX_AGE:
+                ret_status, changed = self.jira_instance.updated_count(self.jira_instance.TYPE_TASK,
+                                                                       self.project_key, minutes_since(last_sync))
+                self.snapshot_current = ret_status and changed == 0
+                self.metrics.add("SnapshotChecks", 1)
+                if self.snapshot_current:
+                    self.synced_at = time.time()
+        return self.snapshot_current
+
+    def snapshot_precomputed(self):
+        """True if the snapshot was precomputed by the scheduled warm up recently enough to answer from as is"""
+        last_sync = self.snapshot.get("last_sync") if self.snapshot is not None else None
+        return bool(self.snapshot and self.snapshot.get("precomputed") and last_sync is not None and
+                    time.time() - last_sync < PRECOMPUTED_MAX_AGE)
+
+    def from_snapshot(self, kind, key):
+        """Answers a To Do query from a still current snapshot, caching the answer like a Jira result"""
+        name = "todo_count" if kind == RESULT_COUNT else "todo_summaries"
+        if self.snapshot is None or self.snapshot.get(name) is None or self.task_index().last_sync is not None:
+            return None
+        if not self.snapshot_is_current():
+            return None
+        value = self.snapshot[name]
+        result_cache.put(key, value)
+        last_known_cache.put(key, value)
+        self.metrics.add("SnapshotAnswers", 1)
+        return value
+
+    def task_index(self):
+        """Returns this user's index of open Tasks in the project, empty until its first sync"""
+        key = (self.user_key, self.jira_instance.site_id, self.project_key, self.jira_instance.TYPE_TASK["Name"])
+        with task_indexes_lock:
+            index = task_indexes.get(key)
+            if index is None:
+                index = TaskIndex(closed_statuses=[self.jira_instance.STATUS_DONE])
+                task_indexes.put(key, index)
+        return index
+
+    def synced_index(self):
+        """Brings the task index up to date and returns it, or None if Jira couldn't be reached.
+
+        The first sync fetches every open Task. After that only Tasks updated since the last sync are
+        fetched, which is usually none, with a keys only reconcile every so often to drop deleted Tasks.
+        While webhooks are arriving they apply changes as they happen, and syncs are only a backstop.
+        """
+        if not self.connected:
+            return None
+        index = self.task_index()
+        with index.sync_lock:
+            started = time.time()
+            if index.last_sync is not None:
+                if started - index.last_sync < index_sync_interval(index, started):
+                    self.metrics.add("IndexSyncSkips", 1)
+                    return index
+                if not self.delta_sync(index, started):
+                    return None
+                if started - index.last_reconcile < INDEX_RECONCILE_INTERVAL or self.reconcile(index, started):
+                    return index
+            return index if self.full_sync(index, started) else None
+
+    def full_sync(self, index, started):
+        """Replaces the index with every open Task"""
+        jql = self.jira_instance.build_open_jql(self.jira_instance.TYPE_TASK, self.project_key)
+        with self.metrics.span("IndexFullSync"):
+            if self.async_jira is not None:
+                ret_status, records = self.run_async(self.async_jira.sync_issues(jql))
+            else:
+                ret_status, records = self.jira_instance.sync_issues(jql)
+        if ret_status:
+            index.replace(records, started)
+        return ret_status
+
+    def delta_sync(self, index, started):
+        """Applies the Tasks created or changed since the last sync"""
+        jql = self.jira_instance.build_updated_jql(self.jira_instance.TYPE_TASK, self.project_key,
+                                                   minutes_since(index.last_sync))
+        with self.metrics.span("IndexDeltaSync"):
+            ret_status, records = self.jira_instance.sync_issues(jql)
+        if ret_status:
+            index.apply(records, started)
+            self.metrics.add("IndexDeltaIssues", len(records))
+        return ret_status
+
+    def reconcile(self, index, started):
+        """Drops deleted Tasks, by comparing against the keys of every open Task. Returns False if Jira has
+        open Tasks the deltas missed, so the index needs a full sync"""
+        jql = self.jira_instance.build_open_jql(self.jira_instance.TYPE_TASK, self.project_key)
+        with self.metrics.span("IndexReconcile"):
+            ret_status, records = self.jira_instance.sync_issues(jql, self.jira_instance.PROJECTION_KEYS)
+        # A failed reconcile waits for a later request, the delta has already made the index current
+        if not ret_status or not index.retain([record["key"] for record in records], started):
+            return True
+        self.metrics.add("IndexResets", 1)
+        return False
+
+    def run_async(self, coroutine):
+        """Runs a chain of async Jira calls on the shared event loop, waiting no longer than the deadline
+        allows. Returns the chain's (status, value), or (False, None) if it ran out of time"""
+        timeout = self.deadline.remaining() if self.deadline is not None else None
+        try:
+            return async_jira.run(coroutine, timeout)
+        except TimeoutError:
+            self.jira_instance.last_failure = self.jira_instance.FAILURE_TIMEOUT
+            return False, None
+
+    def build_snapshot(self, precomputed=False):
+        """Builds the snapshot to persist for the user, or None if nothing was read from Jira this request"""
+        if self.synced_at is None or self.jira_instance.site_id is None:
+            return None
+        issue_type = self.jira_instance.TYPE_TASK
+        issue_status = self.jira_instance.STATUS_TODO
+        todo_count = last_known_cache.get(self.result_key(RESULT_COUNT, issue_type, issue_status))
+        todo_summaries = last_known_cache.get(self.result_key(RESULT_LIST, issue_type, issue_status))
+        if todo_summaries is not None and len(todo_summaries) > SNAPSHOT_LIST_ITEMS:
+            # Too long to be worth carrying, a cold container will sync this user's index instead
+            todo_summaries = None
+        if todo_count is None and todo_summaries is None:
+            return None
+        return persistence.new_snapshot(self.jira_instance.site_id, self.jira_instance.cloud_ids, self.project_key,
+                                        todo_count, todo_summaries, self.synced_at,
+                                        self.jira_instance.projects or None, precomputed)
+
+    @staticmethod
+    def cache_stats():
+        """Returns hit and miss counters for the result cache"""
+        return result_cache.stats()
+
+    def result_key(self, kind, issue_type, status):
+        """Builds the result cache key for this user and query. Keys and names rather than JQL, which uses ids
+        once the metadata is loaded"""
+        return self.user_key, kind, self.project_key, issue_type["Name"], status
 
     def add_new_todo_task(self, task_summary):
-        """Handle request to add a new Task"""
+        """Handle request to add a new Task. If there's no time left to reach Jira the task is queued
+        instead, and the issue id is None"""
         issue_type = self.jira_instance.TYPE_TASK
-        ret_status, issue_id = self.jira_instance.create_issue(issue_type, task_summary,
-                                                               self.project_key)
+        ret_status = False
+        issue_id = None
+        if self.connected:
+            ret_status, issue_id = self.jira_instance.create_issue(issue_type, task_summary,
+                                                                   self.project_key)
+        if ret_status:
+            self.tasks_added([(issue_id, task_summary)])
+        elif self.queue_tasks([task_summary]):
+            return True, None
         return ret_status, issue_id
 
+    def add_new_todo_tasks(self, task_summaries):
+        """Handle request to add several new Tasks at once. Returns a status, and a list of
+        (created, issue key) pairs in the same order as the summaries"""
+        if len(task_summaries) == 1:
+            ret_status, issue_id = self.add_new_todo_task(task_summaries[0])
+            return True, [(ret_status, issue_id)]
+
+        issue_type = self.jira_instance.TYPE_TASK
+        ret_status = False
+        results = None
+        if self.connected:
+            ret_status, results = self.jira_instance.create_issues(issue_type, task_summaries, self.project_key)
+        if ret_status:
+            self.tasks_added([(issue_id, task_summary)
+                              for task_summary, (created, issue_id) in zip(task_summaries, results) if created])
+        elif self.queue_tasks(task_summaries):
+            return True, [(True, None) for task_summary in task_summaries]
+        return ret_status, results
+
+    def queue_tasks(self, task_summaries):
+        """Queues tasks for the next request if the last call never reached Jira. A call that did reach
+        Jira but timed out may still have created them, so those aren't queued"""
+        if self.jira_instance.last_failure != self.jira_instance.FAILURE_NOT_SENT or self.pending_key is None:
+            return False
+        # Only tell the user they'll be added once they're stored somewhere any later request can find them, so
+        # fail now rather than start a write the deadline won't leave time for
+        write_time = persistence.pending_write_time()
+        if write_time is None or (self.deadline is not None and self.deadline.remaining() < write_time):
+            return False
+        task_summaries = list(task_summaries)
+
+        def add(queue):
+            return queue + task_summaries if len(queue) + len(task_summaries) <= PENDING_TASKS_LIMIT else None
+
+        queue, saved = persistence.update_pending_tasks(self.pending_key, add)
+        if not saved:
+            return False
+        self.queued = True
+        self.metrics.add("QueuedTasks", len(task_summaries))
+        return True
+
+    def flush_pending_tasks(self):
+        """Creates any tasks queued by an earlier request, if there's time to do so"""
+        if self.pending_key is None or (self.deadline is not None and
+                                        self.deadline.remaining() < PENDING_FLUSH_MIN_TIME):
+            return
+        # Taken by emptying the queue with a conditional write, so only one request, in whichever container,
+        # creates them
+        task_summaries, taken = persistence.update_pending_tasks(self.pending_key,
+                                                                 lambda queue: [] if queue else None)
+        if not taken:
+            return
+
+        issue_type = self.jira_instance.TYPE_TASK
+        ret_status, results = self.jira_instance.create_issues(issue_type, task_summaries, self.project_key)
+        if ret_status:
+            self.tasks_added([(issue_id, task_summary)
+                              for task_summary, (created, issue_id) in zip(task_summaries, results) if created])
+        elif self.jira_instance.last_failure == self.jira_instance.FAILURE_NOT_SENT:
+            # Still couldn't reach Jira, so put them back for next time
+            queue, saved = persistence.update_pending_tasks(self.pending_key, lambda queue: task_summaries + queue)
+            if not saved:
+                logger.warning(f"Dropped {len(task_summaries)} queued tasks")
+        else:
+            logger.warning(f"Dropped {len(task_summaries)} queued tasks")
+
+    def cached_result(self, key):
+        """Looks up the result cache, counting hits and misses for this invocation"""
+        value = result_cache.get(key)
+        self.metrics.add("ResultCacheHits" if value is not None else "ResultCacheMisses", 1)
+        return value
+
+    def last_known(self, key):
+        """Falls back to the last answer seen for a query, but only when Jira was too slow or down to answer"""
+        if not self.jira_instance.unavailable():
+            return False, None
+        value = last_known_cache.get(key)
+        if value is None:
+            return False, None
+        self.stale = True
+        self.metrics.add("StaleAnswers", 1)
+        return True, value
+
+    def tasks_added(self, created):
+        """Keep the cached count right after a create, have the list fetched again next time, and add the
+        (issue key, summary) pairs to the task index so they can be found by name straight away"""
+        if not created:
+            return
+        issue_type = self.jira_instance.TYPE_TASK
+        issue_status = self.jira_instance.STATUS_TODO
+        for cache in (result_cache, last_known_cache):
+            cache.update(self.result_key(RESULT_COUNT, issue_type, issue_status),
+                         lambda count: count + len(created))
+        result_cache.invalidate(self.result_key(RESULT_LIST, issue_type, issue_status))
+
+        # An index that hasn't had its first sync will get them from Jira anyway
+        index = self.task_index()
+        if index.last_sync is not None:
+            for issue_key, task_summary in created:
+                index.add({"key": issue_key, "summary": task_summary, "status": issue_status, "updated": None})
+
+    def find_task(self, spoken_name):
+        """Resolves a spoken task name to the open Task it means. Returns a status, and (record, clear) for the
+        Task matching best, where clear is False if another matched about as well, or None if none matched.
+        Uses the task index as it is, and only syncs it when that finds no clear match"""
+        index = self.task_index()
+        if index.last_sync is not None:
+            match = index.lookup(spoken_name)
+            if match is not None and match[1]:
+                self.metrics.add("TaskNameIndexHits", 1)
+                return True, match
+        index = self.synced_index()
+        if index is None:
+            return False, None
+        return True, index.lookup(spoken_name)
+
+    def matching_tasks(self, spoken_name):
+        """Every open Task a spoken name matches well, as task index records. Uses the index as it is, and only
+        syncs it when that finds nothing"""
+        index = self.task_index()
+        if index.last_sync is not None:
+            records = index.match_all(spoken_name)
+            if records:
+                self.metrics.add("TaskNameIndexHits", 1)
+                return True, records
+        index = self.synced_index()
+        if index is None:
+            return False, None
+        return True, index.match_all(spoken_name)
+
+    def complete_tasks(self, spoken_names, match_all=False):
+        """Handle request to mark Tasks as done. Each spoken name is one Task, or with match_all, every Task it
+        matches. Returns a status, a list of (issue key, summary, done) for the Tasks marked, the names that
+        matched nothing, and the records of the Tasks best matching names that matched several about as well,
+        for the user to confirm"""
+        if not self.connected:
+            return False, None, None, None
+        found = {}
+        missing = []
+        unclear = {}
+        for spoken_name in spoken_names:
+            if match_all:
+                ret_status, records = self.matching_tasks(spoken_name)
+            else:
+                ret_status, match = self.find_task(spoken_name)
+                records = []
+                if match is not None:
+                    record, clear = match
+                    if not clear:
+                        # Marking the wrong Task done can't be undone by voice, so check with the user first
+                        unclear.setdefault(record["key"], record)
+                        continue
+                    records.append(record)
+            if not ret_status:
+                return False, None, None, None
+            if not records:
+                missing.append(spoken_name)
+            for record in records:
+                found.setdefault(record["key"], record)
+        unclear = [record for issue_key, record in unclear.items() if issue_key not in found]
+        if not found:
+            return True, [], missing, unclear
+        ret_status, results = self.mark_done(found)
+        return ret_status, results, missing, unclear
+
+    def complete_task(self, issue_key):
+        """Handle the user confirming a Task to mark as done. Returns a status, and a list of (issue key,
+        summary, done) that is empty if the Task isn't open any more"""
+        if not self.connected:
+            return False, None
+        record = self.task_index().get(issue_key)
+        if record is None:
+            index = self.synced_index()
+            if index is None:
+                return False, None
+            record = index.get(issue_key)
+        if record is None:
+            return True, []
+        return self.mark_done({issue_key: record})
+
+    def mark_done(self, found):
+        """Moves Tasks to done, given their task index records by issue key. Returns a status and a list of
+        (issue key, summary, done)"""
+        issue_type = self.jira_instance.TYPE_TASK
+        issue_status = self.jira_instance.STATUS_DONE
+        ret_status, results = self.jira_instance.transition_issues(
+            [(issue_key, record["status"]) for issue_key, record in found.items()], issue_type, issue_status,
+            self.project_key)
+        self.tasks_moved([found[issue_key] for issue_key, moved in results if moved], issue_status)
+        return ret_status, [(issue_key, found[issue_key]["summary"], moved) for issue_key, moved in results]
+
+    def tasks_moved(self, records, issue_status):
+        """Keep the task index right after a transition, and have counts and lists fetched again next time"""
+        if not records:
+            return
+        index = self.task_index()
+        for record in records:
+            index.add(dict(record, status=issue_status))
+        issue_type = self.jira_instance.TYPE_TASK
+        for status in {record["status"] for record in records} | {issue_status}:
+            for kind in (RESULT_COUNT, RESULT_LIST):
+                result_cache.invalidate(self.result_key(kind, issue_type, status))
+
     def todo_task_count(self):
         """Handle request to count Tasks"""
+        return self.task_count(self.jira_instance.STATUS_TODO)
+
+    def in_progress_task_count(self):
+        """Handle request to count Tasks in progress"""
+        return self.task_count(self.jira_instance.STATUS_IN_PROGRESS)
+
+    def task_count(self, issue_status):
+        """Count Tasks with the given status"""
+        issue_type = self.jira_instance.TYPE_TASK
+        key = self.result_key(RESULT_COUNT, issue_type, issue_status)
+        count = self.cached_result(key)
+        if count is not None:
+            return True, count
+
+        # A precomputed To Do count is answered straight away
+        if issue_status == self.jira_instance.STATUS_TODO and self.snapshot_precomputed():
+            count = self.from_snapshot(RESULT_COUNT, key)
+            if count is not None:
+                return True, count
+
+        ret_status = False
+        if issue_status == self.jira_instance.STATUS_DONE or self.task_index().last_sync is None:
+            # Done Tasks aren't indexed, and there could be any number of them. Until this container has indexed
+            # the open Tasks, a count only query is far cheaper than reading them all
+            if self.connected:
+                ret_status, count = self.jira_instance.issue_count(issue_type, True, f"'{issue_status}'",
+                                                                   self.project_key)
+        else:
+            index = self.synced_index()
+            if index is not None:
+                ret_status, count = True, index.count(issue_status)
+        if ret_status:
+            result_cache.put(key, count)
+            last_known_cache.put(key, count)
+            return ret_status, count
+        return self.last_known(key)
+
+    def todo_task_items(self):
+        """Get the summaries of every Task to do, oldest first"""
         issue_type = self.jira_instance.TYPE_TASK
         issue_status = self.jira_instance.STATUS_TODO
-        ret_status, count = self.jira_instance.issue_count(issue_type, True, f"'{issue_status}'",
-                                                           self.project_key)
-        return ret_status, count
+        key = self.result_key(RESULT_LIST, issue_type, issue_status)
+        issue_summaries = self.cached_result(key)
+        if issue_summaries is None:
+            issue_summaries = self.from_snapshot(RESULT_LIST, key)
+        if issue_summaries is not None:
+            return True, issue_summaries
+
+        index = self.synced_index()
+        if index is not None:
+            issue_summaries = index.summaries(issue_status)
+            result_cache.put(key, issue_summaries)
+            last_known_cache.put(key, issue_summaries)
+            # The snapshot's sync time is when its list was last known to match Jira
+            self.synced_at = index.last_sync
+            return True, issue_summaries
+        return self.last_known(key)
 
     def todo_task_list(self):
         """Handle request to list Tasks"""
+        ret_status, issue_summaries = self.todo_task_items()
+        if not ret_status:
+            return False, None
+        return True, speech_summaries(issue_summaries, total=len(issue_summaries))
+
+    def todo_task_page(self, page_items=LIST_PAGE_ITEMS):
+        """Handle request to list Tasks a page at a time. Returns the first page of summaries, and a cursor
+        for the rest to keep in the session, or None if there's nothing more"""
+        ret_status, issue_summaries = self.todo_task_items()
+        if not ret_status:
+            return False, None, None
+        cursor = None
+        if len(issue_summaries) > page_items:
+            end = page_items + LIST_BUFFER_ITEMS
+            cursor = {"items": issue_summaries[page_items:end], "start_at": min(end, len(issue_summaries)),
+                      "total": len(issue_summaries)}
+            # The container already has the rest, so keep it for a read more served here
+            if cursor["start_at"] < cursor["total"]:
+                list_prefetch.put(self.prefetch_key(cursor["start_at"]),
+                                  self.completed(issue_summaries[end:end + LIST_BUFFER_ITEMS]))
+        return True, issue_summaries[:page_items], cursor
+
+    def next_task_page(self, cursor, page_items=LIST_PAGE_ITEMS):
+        """Handle request to read more of a list. The page comes from the session cursor, topped up from what
+        this container prefetched, with Jira only searched if neither has it. Returns the page and the
+        updated cursor, which is None once the list is finished"""
+        items = list(cursor.get("items", []))
+        start_at = cursor.get("start_at", 0)
+        total = cursor.get("total", 0)
+
+        # Top up the session's items when they won't cover this page and the next
+        ret_status = True
+        if len(items) < 2 * page_items and start_at < total:
+            ret_status, more = self.list_items_from(start_at)
+            if ret_status:
+                items.extend(more)
+                start_at += len(more)
+                # Jira has fewer Tasks to do than when the list started
+                if not more:
+                    total = start_at
+
+        page = items[:page_items]
+        items = items[page_items:]
+        if not page:
+            # Either the list has finished, or Jira couldn't be reached to continue it
+            return ret_status, page, None
+        if not items and start_at >= total:
+            return True, page, None
+
+        # Start on what the next top up will need, while the user listens to this page
+        if len(items) < 2 * page_items and start_at < total:
+            self.prefetch_items_from(start_at)
+        return True, page, {"items": items, "start_at": start_at, "total": total}
+
+    def prefetch_key(self, start_at):
+        return self.user_key, self.jira_instance.STATUS_TODO, start_at
+
+    @staticmethod
+    def completed(value):
+        """Wraps an already known result as a finished future, to sit alongside background fetches"""
+        future = Future()
+        future.set_result((True, value))
+        return future
+
+    def prefetch_items_from(self, start_at):
+        """Fetches the list items from start_at in the background, into this container"""
+        key = self.prefetch_key(start_at)
+        if list_prefetch.get(key) is None:
+            list_prefetch.put(key, prefetch_pool.submit(self.fetch_items_from, start_at))
+
+    def list_items_from(self, start_at):
+        """Gets the list items from start_at, from this container's prefetch if it has them"""
+        future = list_prefetch.get(self.prefetch_key(start_at))
+        if future is not None:
+            list_prefetch.invalidate(self.prefetch_key(start_at))
+            timeout = self.deadline.remaining() if self.deadline is not None else None
+            try:
+                ret_status, items = future.result(timeout=timeout)
+                if ret_status:
+                    self.metrics.add("ListPrefetchHits", 1)
+                    return ret_status, items
+            except Exception as e:
+                logger.info(f"List prefetch failed: {type(e).__name__}")
+        return self.fetch_items_from(start_at)
+
+    def fetch_items_from(self, start_at, max_items=LIST_BUFFER_ITEMS):
+        """Gets the list items from start_at, from the task index if this container has one, otherwise with
+        a single page search. Either way in the same oldest first order"""
+        index = self.task_index()
+        if index.last_sync is not None:
+            return True, index.summaries(self.jira_instance.STATUS_TODO)[start_at:start_at + max_items]
+        if not self.connected:
+            return False, None
         issue_type = self.jira_instance.TYPE_TASK
-        issue_status = self.jira_instance.STATUS_TODO
-        ret_status, issue_summaries = self.jira_instance.issue_summaries(issue_type, True, f"'{issue_status}'",
-                                                                         self.project_key)
-        return ret_status, issue_summaries
+        return self.jira_instance.issue_summary_page(issue_type, f"'{self.jira_instance.STATUS_TODO}'",
+                                                     self.project_key, start_at, max_items)
+
+    def status_summary(self):
+        """Handle request for how many issues are in each status. One paged scan of the project counts
+        every status and issue type, instead of a count query per status"""
+        key = self.user_key, RESULT_HISTOGRAM, self.project_key
+        histogram = self.cached_result(key)
+        if histogram is not None:
+            return True, histogram
+
+        ret_status = False
+        if self.connected:
+            with self.metrics.span("StatusScan"):
+                if self.async_jira is not None:
+                    ret_status, histogram = self.run_async(self.async_jira.status_histogram(self.project_key))
+                else:
+                    ret_status, histogram = self.jira_instance.status_histogram(self.project_key)
+        if not ret_status:
+            return self.last_known(key)
+        result_cache.put(key, histogram)
+        last_known_cache.put(key, histogram)
+
+        # The scan has counted the Tasks in every status too, so a "how many" straight after needs no query
+        issue_type = self.jira_instance.TYPE_TASK
+        task_counts = histogram["types"].get(issue_type["Name"], {})
+        for issue_status in (self.jira_instance.STATUS_TODO, self.jira_instance.STATUS_IN_PROGRESS,
+                             self.jira_instance.STATUS_DONE):
+            result_cache.put(self.result_key(RESULT_COUNT, issue_type, issue_status),
+                             task_counts.get(issue_status, 0))
+        return True, histogram
+
+    def todo_task_top(self, max_issues=BRIEFING_TOP_TASKS):
+        """Get the summaries of the first few Tasks to do, as a list for the caller to say with the To Do count"""
+        if self.task_index().last_sync is None:
+            # Not indexed in this container yet, so ask for just the first few rather than every open Task
+            if not self.connected:
+                return False, None
+            return self.jira_instance.issue_summary_page(self.jira_instance.TYPE_TASK,
+                                                         f"'{self.jira_instance.STATUS_TODO}'", self.project_key, 0,
+                                                         max_issues)
+        index = self.synced_index()
+        if index is None:
+            return False, None
+        return True, index.summaries(self.jira_instance.STATUS_TODO, max_issues)
+
+    def daily_briefing(self, timeout=BRIEFING_TIMEOUT):
+        """Handle request for a daily briefing. The To Do count, In Progress count and top To Do summaries
+        are fetched concurrently, and anything not back within the timeout is left as None"""
+        if self.deadline is not None:
+            timeout = min(timeout, self.deadline.remaining())
+        futures = {
+            "todo_count": query_pool.submit(self.todo_task_count),
+            "in_progress_count": query_pool.submit(self.in_progress_task_count),
+            "todo_summaries": query_pool.submit(self.todo_task_top),
+        }
+
+        # All three share the one deadline, so this waits for the slowest, not the sum
+        with self.metrics.span("BriefingWait"):
+            wait(futures.values(), timeout=timeout)
+        briefing = {}
+        for name, future in futures.items():
+            briefing[name] = None
+            if future.done() and future.exception() is None:
+                ret_status, value = future.result()
+                if ret_status:
+                    briefing[name] = value
+            else:
+                future.cancel()
+        ret_status = any(value is not None for value in briefing.values())
+        return ret_status, briefing
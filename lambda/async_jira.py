@@ -0,0 +1,392 @@
+import asyncio
+import atexit
+import json
+import logging
+import threading
+import time
+from contextlib import aclosing
+from importlib.util import find_spec
+from types import SimpleNamespace
+
+import http_pool
+import resilience
+from jira_instance import JiraSearchError
+from search_decoder import CHUNK_BYTES, SearchDecoder
+from speech import MAX_SPEECH_CHARS, MORE_WORDS, SpeechRenderer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# One event loop per container, run in a background thread so the synchronous ASK handlers can hand it coroutines
+_loop = None
+_loop_lock = threading.Lock()
+# Search pages fetched at once by all_issues. Within the connection pool, and the rate limit's burst
+PAGE_CONCURRENCY = min(resilience.RATE_BURST, http_pool.POOL_SIZE)
+# Longest close() lets calls still running finish before closing the session
+CLOSE_WAIT = 5
+# The aiohttp session lives on that loop, so warm invocations reuse its keep-alive connections
+_session = None
+
+
+def available():
+    """True if aiohttp is installed, so the async client can be used"""
+    return find_spec("aiohttp") is not None
+
+
+def get_loop():
+    """Returns the shared event loop, starting its thread on first use"""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="jira-async", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run(coroutine, timeout=None):
+    """Runs a coroutine on the shared loop from synchronous code and returns its result. If it isn't done within
+    timeout seconds it's cancelled and TimeoutError raised. Must not be called from the loop's own thread"""
+    future = asyncio.run_coroutine_threadsafe(coroutine, get_loop())
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        future.cancel()
+        raise
+
+
+async def get_session():
+    """Returns the shared aiohttp session, creating it on the running loop on first use"""
+    global _session
+    if _session is None:
+        # aiohttp is only loaded once an async call needs it
+        import aiohttp
+        connector = aiohttp.TCPConnector(limit=http_pool.POOL_SIZE)
+        _session = aiohttp.ClientSession(connector=connector, headers={"Accept-Encoding": "gzip"})
+        atexit.register(close)
+    return _session
+
+
+def close(wait=CLOSE_WAIT):
+    """Closes the shared session and its connections, for scripts that exit, once calls still running have had up
+    to wait seconds to finish. Lambda just freezes the container"""
+    global _session
+    if _session is not None:
+        session, _session = _session, None
+        run(close_session(session, wait), timeout=wait + 1)
+
+
+def settle(wait=CLOSE_WAIT):
+    """Gives calls still running on the shared loop up to wait seconds to finish, leaving the session open"""
+    if _loop is not None:
+        run(wait_for_running(wait), timeout=wait + 1)
+
+
+async def close_session(session, wait):
+    # Calls whose callers stopped waiting for them may still be using the session
+    await wait_for_running(wait)
+    await session.close()
+
+
+async def wait_for_running(wait):
+    running = asyncio.all_tasks() - {asyncio.current_task()}
+    if running:
+        await asyncio.wait(running, timeout=wait)
+
+
+class JiraResponse:
+    """The parts of a requests response the Jira calls read, taken from an aiohttp response before its connection
+    goes back to the pool"""
+
+    def __init__(self, status_code, headers, content, request_body):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.request = SimpleNamespace(body=request_body)
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncIssueSearch:
+    """The issues matching a JQL search, fetched a page at a time, like IssueSearch but for async for.
+
+    issues() yields them, requesting the next page while the caller works through the current one, and nothing
+    more once the caller stops or the limit is reached. total is set once the first page has arrived.
+    """
+
+    def __init__(self, client, jql, projection, limit=None):
+        self.client = client
+        self.jql = jql
+        self.projection = projection
+        self.limit = limit
+        self.total = None
+
+    async def issues(self):
+        yielded = 0
+        start_at = 0
+        next_page = None
+        try:
+            page = await self.client.fetch_page(self.jql, self.projection, start_at)
+            while True:
+                issues = page.issues
+                self.total = page.total
+                next_start = start_at + len(issues)
+                wanted = self.limit is None or next_start < self.limit
+                if issues and next_start < self.total and wanted:
+                    next_page = asyncio.ensure_future(self.client.fetch_page(self.jql, self.projection, next_start))
+                for issue in issues:
+                    if self.limit is not None and yielded >= self.limit:
+                        return
+                    yield issue
+                    yielded += 1
+                if next_page is None:
+                    return
+                page = await next_page
+                next_page = None
+                start_at = next_start
+        finally:
+            # Caller stopped early, so don't wait on a page nobody will read
+            if next_page is not None:
+                next_page.cancel()
+
+
+class AsyncJiraInstance:
+    """asyncio counterpart of JiraInstance, so independent calls within one request can overlap.
+
+    Wraps a JiraInstance and shares its site id, metadata, deadline, metrics and resilience, so the two can be
+    used side by side. The calls are coroutines for the shared loop; run() drives them from synchronous code.
+    """
+
+    def __init__(self, jira_instance):
+        self.jira = jira_instance
+
+    async def send_request(self, method, url, operation, **kwargs):
+        """Sends a request over the pooled aiohttp session, returning the response or None if it couldn't be
+        sent. Retried like JiraInstance.send_request, but waiting without holding up the loop"""
+        jira = self.jira
+        site = jira.site_id or jira.BASE_RESOURCE_URL
+        attempt = 0
+        while True:
+            response = await self.send_once(method, url, operation, site, **kwargs)
+            delay = jira.retry_delay(operation, response, attempt)
+            if delay is None:
+                return response
+            attempt += 1
+            jira.metrics.add("Retries", 1)
+            jira.metrics.add("RetryWaitMs", delay * 1000, "Milliseconds")
+            resilience.count("Retries")
+            await asyncio.sleep(delay)
+
+    async def send_once(self, method, url, operation, site, json=None, params=None, decoder=None):
+        """Makes one attempt at a call, within the site's rate limit and unless its circuit breaker is open.
+        With a decoder, a successful response's body is fed to it as it arrives rather than kept"""
+        jira = self.jira
+        if jira.out_of_time():
+            return None
+
+        waited = time.perf_counter()
+        if jira.site_id is not None:
+            wait = resilience.bucket_for(site).reserve(jira.throttle_wait())
+            if wait is None:
+                jira.client_throttled()
+                return None
+            if wait > 0:
+                await asyncio.sleep(wait)
+        jira.metrics.add("RateLimitWaitMs", (time.perf_counter() - waited) * 1000, "Milliseconds")
+
+        breaker = jira.admit(site)
+        if breaker is None:
+            return None
+
+        import aiohttp
+        session = await get_session()
+        connect_timeout, read_timeout = jira.call_timeout()
+        timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        body = _json_bytes(json)
+        start = time.perf_counter()
+        response = None
+        try:
+            async with session.request(method, url, headers=jira.headers, params=params, data=body,
+                                       timeout=timeout) as raw:
+                if decoder is not None and raw.status == 200:
+                    async for chunk in raw.content.iter_chunked(CHUNK_BYTES):
+                        decoder.feed(chunk)
+                    content = b""
+                else:
+                    content = await raw.read()
+                response = JiraResponse(raw.status, raw.headers, content, body)
+        except aiohttp.ConnectionTimeoutError:
+            # Never reached Jira
+            return jira.call_failed("ConnectTimeout", jira.FAILURE_NOT_SENT, breaker)
+        except asyncio.TimeoutError:
+            # Sent, but the answer didn't arrive in time
+            return jira.call_failed("Timeout", jira.FAILURE_TIMEOUT, breaker)
+        except aiohttp.ClientError as e:
+            return jira.call_failed(type(e).__name__, jira.FAILURE_ERROR, breaker)
+        except asyncio.CancelledError:
+            # Cut off by run()'s timeout, so there's no result for the breaker
+            breaker.record_inconclusive()
+            raise
+        finally:
+            jira.record_call(operation, response, start, decoder is not None and decoder.bytes_read > 0)
+        return jira.check_response(response, breaker)
+
+    async def set_site_id(self):
+        """Obtains and sets the site id from the Jira API app, using the container cache where possible"""
+        jira = self.jira
+        if jira.cached_site_id():
+            return True
+        response = await self.send_request("GET", jira.BASE_RESOURCE_URL, jira.OP_SITE_LOOKUP)
+        return jira.read_site_id(response)
+
+    async def load_metadata(self, project_keys, issue_types):
+        """Looks up the ids and required fields of the projects and issue types, from the container cache
+        where possible"""
+        jira = self.jira
+        projects = jira.cached_metadata(project_keys)
+        if projects is not None:
+            return True, projects
+        jira_rest_url, params = jira.metadata_request(project_keys, issue_types)
+        response = await self.send_request("GET", jira_rest_url, jira.OP_METADATA, params=params)
+        return jira.read_metadata(project_keys, response)
+
+    async def create_issue(self, issue_type, issue_summary, project_key):
+        """Creates a Jira issue object in the given project"""
+        jira = self.jira
+        error = jira.validate_issue(issue_type, issue_summary, project_key)
+        if error is not None:
+            jira.rejected(error)
+            return False, None
+        jira_rest_url, data = jira.create_request(issue_type, issue_summary, project_key)
+        response = await self.send_request("POST", jira_rest_url, jira.OP_CREATE, json=data)
+        return jira.read_created(response)
+
+    async def issue_count(self, issue_type, use_status, status, project_key):
+        """Gets a count of issues with type and status"""
+        jql = self.jira.build_jql(issue_type, use_status, status, project_key)
+        ret_status, page = await self.search_page(jql, self.jira.PROJECTION_COUNT)
+        if not ret_status:
+            return False, None
+        return True, page.total
+
+    async def issue_summaries(self, issue_type, use_status, status, project_key, max_chars=MAX_SPEECH_CHARS,
+                              max_issues=None, max_seconds=None, more=MORE_WORDS):
+        """Get a list of issue summaries with type and status as speech, stopping once max_chars of speech or
+        max_seconds of speaking is reached, and saying how many more there are"""
+        jira = self.jira
+        jql = jira.build_jql(issue_type, use_status, status, project_key)
+        projection = jira.PROJECTION_SUMMARY
+        if max_issues is not None:
+            projection = jira.field_projection(projection["fields"], min(max_issues, jira.PAGE_SIZE))
+        results = AsyncIssueSearch(self, jql, projection, max_issues)
+        renderer = SpeechRenderer(max_chars, max_seconds, more)
+        try:
+            async with aclosing(results.issues()) as issues:
+                async for issue in issues:
+                    # No more pages are fetched once the speech is full
+                    if not renderer.add(issue.summary):
+                        break
+        except JiraSearchError:
+            return False, None
+        return True, renderer.render(results.total)
+
+    async def sync_issues(self, jql, projection=None):
+        """Fetches every issue matching the JQL as records for the task index, the pages after the first all
+        requested at once"""
+        try:
+            issues = await self.all_issues(jql, projection or self.jira.PROJECTION_SYNC)
+        except JiraSearchError:
+            return False, None
+        return True, [issue.index_record() for issue in issues]
+
+    async def status_histogram(self, project_key):
+        """Counts every issue in the project by status and by issue type, like JiraInstance.status_histogram,
+        the pages after the first all requested at once"""
+        jira = self.jira
+        try:
+            issues = await self.all_issues(jira.build_project_jql(project_key), jira.PROJECTION_STATUS)
+        except JiraSearchError:
+            return False, None
+        return True, jira.count_statuses(issues)
+
+    async def all_issues(self, jql, projection):
+        """Fetches every issue matching the JQL. The first page gives the total, then the remaining pages are
+        fetched PAGE_CONCURRENCY at a time rather than one after another. Raises JiraSearchError if any page
+        fails, cancelling the pages still being fetched"""
+        first = await self.fetch_page(jql, projection, 0)
+        issues = list(first.issues)
+        page_size = len(issues)
+        if not page_size or page_size >= first.total:
+            return issues
+
+        # Enough pages in flight to keep the connections busy, but not so many the site's rate limit runs dry
+        limit = asyncio.Semaphore(PAGE_CONCURRENCY)
+
+        async def fetch(start_at):
+            async with limit:
+                return await self.fetch_page(jql, projection, start_at)
+
+        fetches = [asyncio.ensure_future(fetch(start_at)) for start_at in range(page_size, first.total, page_size)]
+        try:
+            done, _ = await asyncio.wait(fetches, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            # One page failing fails the lot, so stop fetching the others
+            for page in fetches:
+                page.cancel()
+            await asyncio.gather(*fetches, return_exceptions=True)
+        for page in done:
+            if page.exception() is not None:
+                raise page.exception()
+        for page in fetches:
+            issues.extend(page.result().issues)
+        return issues
+
+    async def fetch_page(self, jql, projection, start_at):
+        """Fetches one page of search results as a SearchPage, raising JiraSearchError on failure"""
+        ret_status, page = await self.search_page(jql, projection, start_at)
+        if not ret_status:
+            raise JiraSearchError()
+        return page
+
+    async def get_issue_list(self, issue_type, use_status, status, project_key, projection=None, start_at=0):
+        """Query the REST API for issues with type and status"""
+        jira = self.jira
+        jql = jira.build_jql(issue_type, use_status, status, project_key)
+        return await self.search(jql, projection or jira.PROJECTION_DEFAULT, start_at)
+
+    async def search_page(self, jql, projection, start_at=0):
+        """Run a JQL search, decoding the response as it arrives into a SearchPage of IssueRecords, like
+        JiraInstance.search_page"""
+        jira = self.jira
+        jira_rest_url, data = jira.search_request(jql, projection, start_at)
+        decoder = SearchDecoder()
+        try:
+            response = await self.send_request("POST", jira_rest_url, jira.OP_SEARCH, json=data, decoder=decoder)
+            if response is None or response.status_code != 200:
+                return False, None
+            page = decoder.close()
+        except ValueError:
+            return jira.read_failed("InvalidSearchResponse", jira.FAILURE_ERROR)
+        if not response.headers.get("Content-Length"):
+            jira.metrics.add("JiraResponseBytes", decoder.bytes_read, "Bytes")
+        return True, page
+
+    async def search(self, jql, projection, start_at=0):
+        """Run a JQL search, asking only for what the projection needs"""
+        jira = self.jira
+        jira_rest_url, data = jira.search_request(jql, projection, start_at)
+        response = await self.send_request("POST", jira_rest_url, jira.OP_SEARCH, json=data)
+        if response is None or response.status_code != 200:
+            return False, None
+        return True, response
+
+
+def _json_bytes(data):
+    """Serialises a JSON payload up front, so its size can be recorded like a requests body"""
+    return json.dumps(data).encode("utf-8") if data is not None else None
@@ -0,0 +1,124 @@
+# Benchmark - the synchronous Jira client against the async one, on the local Jira stand-in with added latency.
+# Times a cold request's chain (site lookup, then metadata, counts and summaries) and a full sync of the open Tasks,
+# each made one call after another with JiraInstance and with the independent calls gathered with AsyncJiraInstance.
+# The skill itself only takes the async path for full syncs and the status summary. Its cold chain stays synchronous,
+# since the project, and so every later call, depends on the metadata, so the cold chain here is what gathering
+# would save rather than what the skill does.
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import async_jira
+import jira_instance
+import metrics
+import resilience
+from alexa_jira_helper import ISSUE_TYPES, PROJECT_KEYS
+from async_jira import AsyncJiraInstance
+from jira_instance import JiraInstance
+from jira_stand_in import JiraStandIn
+
+ACCESS_TOKEN = "bench-async-token"
+TOP_TASKS = 3
+
+
+def cold_caches():
+    """Forgets the site id and metadata, so every run makes the calls a cold container would"""
+    jira_instance.site_id_cache.clear()
+    jira_instance.metadata_cache.clear()
+
+
+def sync_chain(jira):
+    """A cold request's calls, one after another"""
+    jira.set_site_id()
+    project_key = PROJECT_KEYS[0]
+    jira.load_metadata(PROJECT_KEYS, ISSUE_TYPES)
+    todo = jira.issue_count(jira.TYPE_TASK, True, f"'{jira.STATUS_TODO}'", project_key)
+    in_progress = jira.issue_count(jira.TYPE_TASK, True, f"'{jira.STATUS_IN_PROGRESS}'", project_key)
+    top = jira.issue_summaries(jira.TYPE_TASK, True, f"'{jira.STATUS_TODO}'", project_key, max_issues=TOP_TASKS)
+    return todo[1], in_progress[1], top[1]
+
+
+async def async_chain(jira):
+    """The same calls, the site lookup first since everything else needs the site, then the rest together"""
+    await jira.set_site_id()
+    project_key = PROJECT_KEYS[0]
+    task = jira.jira.TYPE_TASK
+    _, todo, in_progress, top = await asyncio.gather(
+        jira.load_metadata(PROJECT_KEYS, ISSUE_TYPES),
+        jira.issue_count(task, True, f"'{jira.jira.STATUS_TODO}'", project_key),
+        jira.issue_count(task, True, f"'{jira.jira.STATUS_IN_PROGRESS}'", project_key),
+        jira.issue_summaries(task, True, f"'{jira.jira.STATUS_TODO}'", project_key, max_issues=TOP_TASKS))
+    return todo[1], in_progress[1], top[1]
+
+
+def open_tasks_jql(jira):
+    return jira.build_open_jql(jira.TYPE_TASK, PROJECT_KEYS[0])
+
+
+def sync_full(jira):
+    """A full sync of the open Tasks, each page requested as the one before arrives"""
+    jira.set_site_id()
+    records = jira.sync_issues(open_tasks_jql(jira))[1]
+    return sorted(record["key"] for record in records)
+
+
+async def async_full(jira):
+    """The same sync, the pages after the first requested together"""
+    await jira.set_site_id()
+    records = (await jira.sync_issues(open_tasks_jql(jira.jira)))[1]
+    return sorted(record["key"] for record in records)
+
+
+def time_runs(runs, function, stand_in):
+    """Runs function from a cold cache each time, returning the median ms, the calls per run and the last result"""
+    timings = []
+    result = None
+    for _ in range(runs):
+        cold_caches()
+        stand_in.calls.clear()
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), sum(stand_in.calls.values()), result
+
+
+def do_benchmark(stand_in, runs):
+    scenarios = {
+        "cold chain": (
+            lambda: sync_chain(JiraInstance(ACCESS_TOKEN)),
+            lambda: async_jira.run(async_chain(AsyncJiraInstance(JiraInstance(ACCESS_TOKEN))))),
+        "full sync": (
+            lambda: sync_full(JiraInstance(ACCESS_TOKEN)),
+            lambda: async_jira.run(async_full(AsyncJiraInstance(JiraInstance(ACCESS_TOKEN))))),
+    }
+    print(f"Median of {runs} runs, {stand_in.latency_ms:.0f} ms added to every call")
+    print(f"  {'scenario':<12} {'sync ms':>9} {'async ms':>9} {'calls':>6} {'speed up':>9}")
+    for name, (sync_run, async_run) in scenarios.items():
+        sync_ms, calls, sync_result = time_runs(runs, sync_run, stand_in)
+        async_ms, async_calls, async_result = time_runs(runs, async_run, stand_in)
+        same = "" if sync_result == async_result else "  RESULTS DIFFER"
+        print(f"  {name:<12} {sync_ms:9.1f} {async_ms:9.1f} {calls:3}/{async_calls:<2} "
+              f"{sync_ms / async_ms:8.1f}x{same}")
+
+
+# Run the main function
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the sync and async Jira clients on the Jira stand-in")
+    parser.add_argument("--issues", type=int, default=300, help="issues in the stand-in project")
+    parser.add_argument("--latency-ms", type=float, default=50, help="latency the stand-in adds to every call")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    metrics.stream = open(os.devnull, "w")
+    server = JiraStandIn(args.issues, latency_ms=args.latency_ms, seed=1)
+    server.start()
+    server.use_for_jira()
+    # The stand-in has no rate limit, so neither should the client, or the benchmark measures the limit
+    bucket = resilience.bucket_for(server.site_id)
+    bucket.rate = bucket.burst = bucket.tokens = 10000
+    try:
+        do_benchmark(server, args.runs)
+    finally:
+        server.stop()
@@ -0,0 +1,118 @@
+# Benchmark - cold start cost of the skill: import time per module, and the first lambda_handler invocation.
+# Every run happens in a fresh interpreter, so nothing is shared with a previous run. A linked request is timed against
+# the local Jira stand-in too, as that's the first request to load the HTTP client.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from envelopes import build_envelope
+from jira_stand_in import JiraStandIn
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Run in the child interpreter: import the skill, then send it one request, timing both. Given a stand-in URL, Jira
+# calls go to it. jira_instance is already imported by the skill by then, so pointing it there costs nothing
+FIRST_INVOCATION = """
+import json, sys, time
+start = time.perf_counter()
+import lambda_function
+imported = time.perf_counter()
+envelope = json.loads(sys.argv[1])
+if len(sys.argv) > 2:
+    from jira_instance import JiraInstance
+    JiraInstance.BASE_RESOURCE_URL = sys.argv[2] + "/oauth/token/accessible-resources"
+    JiraInstance.BASE_API_URL = sys.argv[2] + "/ex/jira"
+lambda_function.lambda_handler(envelope, None)
+invoked = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_invocation_ms": (invoked - imported) * 1000}))
+"""
+
+
+def import_times():
+    """Runs python -X importtime on the skill module, returning {module: (self us, cumulative us)}"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import lambda_function"],
+                            cwd=HERE, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def first_invocation(envelope, base_url=None):
+    """Times the import and first request of the skill in a fresh interpreter, sending Jira calls to base_url"""
+    arguments = [json.dumps(envelope)] + ([base_url] if base_url else [])
+    result = subprocess.run([sys.executable, "-c", FIRST_INVOCATION] + arguments,
+                            cwd=HERE, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def do_benchmark(runs, top, stand_in):
+    # Import breakdown, taking the median of each module across runs to smooth out noise
+    samples = [import_times() for _ in range(runs)]
+    modules = {name: statistics.median(sample[name][1] for sample in samples if name in sample)
+               for name in samples[0]}
+    print(f"Import time, median of {runs} runs (cumulative ms)")
+    for name, cumulative_us in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.2f}  {name}")
+
+    # Import plus first request, the user visible part of a cold start. An unlinked LaunchRequest needs no Jira call
+    envelope = build_envelope("LaunchRequest")
+    timings = [first_invocation(envelope) for _ in range(runs)]
+    # A linked request loads requests and makes the cold chain of Jira calls, against the stand-in so only the
+    # skill's own cost is measured
+    linked_envelope = build_envelope("IntentRequest", "GetToDoCountIntent", access_token="bench-cold-token",
+                                     user_id="bench-cold-user")
+    linked_timings = [first_invocation(linked_envelope, stand_in.base_url()) for _ in range(runs)]
+    results = {
+        "import_ms": statistics.median(timing["import_ms"] for timing in timings),
+        "first_invocation_ms": statistics.median(timing["first_invocation_ms"] for timing in timings),
+        "linked_invocation_ms": statistics.median(timing["first_invocation_ms"] for timing in linked_timings),
+        "lambda_function_import_ms": modules.get("lambda_function", 0) / 1000,
+    }
+    print(f"Cold start, median of {runs} runs")
+    for name, value in results.items():
+        print(f"  {name:<28} {value:8.2f} ms")
+    return results
+
+
+def check_regression(results, baseline_file, tolerance):
+    """Compares against a saved baseline, returning False if anything got slower than the tolerance allows"""
+    with open(baseline_file) as baseline_json:
+        baseline = json.load(baseline_json)
+    ok = True
+    for name, value in results.items():
+        allowed = baseline.get(name, value) * (1 + tolerance)
+        if value > allowed:
+            print(f"REGRESSION: {name} {value:.2f} ms, baseline {baseline[name]:.2f} ms")
+            ok = False
+    return ok
+
+
+# Run the main function
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure skill import and first invocation time")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--save", help="write the results to this JSON file, to use as a baseline")
+    parser.add_argument("--baseline", help="fail if slower than the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    parser.add_argument("--issues", type=int, default=50, help="issues in the stand-in project")
+    args = parser.parse_args()
+
+    server = JiraStandIn(args.issues, seed=1)
+    server.start()
+    try:
+        bench_results = do_benchmark(args.runs, args.top, server)
+    finally:
+        server.stop()
+    if args.save:
+        with open(args.save, "w") as results_json:
+            json.dump(bench_results, results_json, indent=2)
+    if args.baseline and not check_regression(bench_results, args.baseline, args.tolerance):
+        sys.exit(1)
@@ -0,0 +1,101 @@
+# Benchmark - fresh connection per call vs the pooled keep-alive session, against a local TLS stub server
+import argparse
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import http_pool
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every request with a small accessible-resources style JSON body, keeping the connection open"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    body = json.dumps([{"id": "stub-site-id", "name": "stub"}]).encode("utf-8")
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_certificate(directory):
+    """Generates a throwaway self signed certificate for localhost with openssl"""
+    cert_file = os.path.join(directory, "cert.pem")
+    key_file = os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+                    "-keyout", key_file, "-out", cert_file],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return cert_file, key_file
+
+
+def start_server(cert_file, key_file):
+    """Starts the TLS stub server on a free port in a background thread"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def time_calls(call, url, count):
+    """Times count sequential calls, returning per call latencies in milliseconds"""
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = call(url)
+        response.content
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p50 = statistics.median(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<20} p50 {p50:7.2f} ms   p95 {p95:7.2f} ms   mean {statistics.mean(timings):7.2f} ms")
+
+
+def do_benchmark(count):
+    with tempfile.TemporaryDirectory() as directory:
+        cert_file, key_file = make_certificate(directory)
+        server = start_server(cert_file, key_file)
+        url = f"https://localhost:{server.server_address[1]}/oauth/token/accessible-resources"
+        try:
+            # Baseline - what JiraInstance used to do, a new connection and TLS handshake per call
+            fresh = time_calls(lambda u: requests.get(u, verify=cert_file, timeout=http_pool.default_timeout()),
+                               url, count)
+
+            # Pooled - the shared session, so only the first call pays for the handshake
+            session = http_pool.create_session()
+            pooled = time_calls(lambda u: session.get(u, verify=cert_file, timeout=http_pool.default_timeout()),
+                                url, count)
+        finally:
+            server.shutdown()
+
+    print(f"{count} sequential GETs against local TLS stub")
+    report("fresh connection", fresh)
+    report("pooled session", pooled)
+
+
+# Run the main function
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200, help="number of calls per mode")
+    args = parser.parse_args()
+    do_benchmark(args.count)
@@ -0,0 +1,121 @@
+# Benchmark - decoding search responses in full with json.loads, as response.json() does, against the streaming
+# SearchDecoder, for peak memory, memory kept afterwards and CPU time. Uses recorded Jira search responses, or
+# generates large ones shaped like Jira's, with every field of each issue the way an unprojected search returns them.
+import argparse
+import gc
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from search_decoder import CHUNK_BYTES, SearchDecoder
+
+WORDS = ["buy", "milk", "call", "mum", "fix", "car", "tax", "return", "book", "dentist", "walk", "dog", "plants"]
+
+
+def generated_response(issue_count, all_fields, rng):
+    """A search response body like Jira's, with either every field of each issue or just the projected ones"""
+    issues = []
+    for number in range(1, issue_count + 1):
+        fields = {
+            "summary": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 8))).capitalize(),
+            "status": {"self": f"https://example.atlassian.net/rest/api/2/status/{number % 3}",
+                       "name": rng.choice(["To Do", "In Progress", "Complete"]), "id": str(number % 3),
+                       "statusCategory": {"id": 2, "key": "new", "colorName": "blue-gray", "name": "To Do"}},
+            "issuetype": {"id": "10001", "name": "Task", "subtask": False,
+                          "iconUrl": "https://example.atlassian.net/images/icons/issuetypes/task.svg"},
+            "updated": "2026-10-18T09:30:00.000+0000",
+        }
+        if all_fields:
+            person = {"accountId": f"5b10a2844c20165700ede{number:03}", "displayName": "Alex Example",
+                      "active": True, "timeZone": "Europe/London",
+                      "avatarUrls": {size: f"https://avatar-management.example.net/{number}/{size}.png"
+                                     for size in ("48x48", "24x24", "16x16", "32x32")}}
+            fields.update({
+                "description": " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 200))),
+                "assignee": person, "reporter": person, "creator": person,
+                "priority": {"name": "Medium", "id": "3", "iconUrl": "https://example.net/medium.svg"},
+                "labels": [rng.choice(WORDS) for _ in range(3)],
+                "created": "2026-10-01T09:30:00.000+0000",
+                "comment": {"comments": [{"body": " ".join(rng.choice(WORDS) for _ in range(30)), "author": person}
+                                         for _ in range(rng.randint(0, 3))], "total": 3},
+                "customfield_10020": None, "customfield_10021": [], "timetracking": {},
+            })
+        issues.append({"expand": "operations,editmeta,changelog", "id": str(10000 + number),
+                       "self": f"https://example.atlassian.net/rest/api/2/issue/{10000 + number}",
+                       "key": f"PTD-{number}", "fields": fields})
+    body = {"expand": "schema,names", "startAt": 0, "maxResults": issue_count, "total": issue_count * 3,
+            "issues": issues}
+    return json.dumps(body).encode("utf-8")
+
+
+def decode_full(body):
+    """What response.json() does: the whole response as nested dicts and lists"""
+    page = json.loads(body)
+    return page["total"], [issue["fields"]["summary"] for issue in page["issues"]], page
+
+
+def decode_lean(body):
+    """The streaming decoder, fed the body a chunk at a time as it would come off the socket"""
+    decoder = SearchDecoder()
+    view = memoryview(body)
+    for start in range(0, len(body), CHUNK_BYTES):
+        decoder.feed(view[start:start + CHUNK_BYTES])
+    page = decoder.close()
+    return page.total, [issue.summary for issue in page.issues], page
+
+
+def measure(decode, body, runs):
+    """Returns (median ms, peak KB while decoding, KB still held by the result) for decoding the body"""
+    timings = []
+    for _ in range(runs):
+        gc.collect()
+        start = time.process_time()
+        decode(body)
+        timings.append((time.process_time() - start) * 1000)
+
+    # Memory is measured on its own run, since tracing slows decoding down
+    gc.collect()
+    tracemalloc.start()
+    result = decode(body)
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    summaries = result[1]
+    del result
+    return statistics.median(timings), peak / 1024, held / 1024, summaries
+
+
+def do_benchmark(bodies, runs):
+    print(f"CPU ms is the median of {runs} runs. Peak and held exclude the response body itself")
+    print(f"  {'response':<24} {'KB':>8}  {'decoder':<6} {'CPU ms':>8} {'peak KB':>9} {'held KB':>9}")
+    for name, body in bodies:
+        full = measure(decode_full, body, runs)
+        lean = measure(decode_lean, body, runs)
+        for label, (cpu_ms, peak_kb, held_kb, summaries) in (("full", full), ("lean", lean)):
+            print(f"  {name:<24} {len(body) / 1024:8.0f}  {label:<6} {cpu_ms:8.2f} {peak_kb:9.0f} {held_kb:9.0f}")
+        if full[3] != lean[3]:
+            print(f"  {name}: DECODERS DISAGREE")
+
+
+# Run the main function
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare full and streaming decoding of Jira search responses")
+    parser.add_argument("responses", nargs="*", help="recorded search response bodies, as JSON files")
+    parser.add_argument("--issues", type=int, default=1000, help="issues in each generated response")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.responses:
+        response_bodies = []
+        for path in args.responses:
+            with open(path, "rb") as response_file:
+                response_bodies.append((path[-24:], response_file.read()))
+    else:
+        random_source = random.Random(args.seed)
+        response_bodies = [
+            (f"{args.issues} projected", generated_response(args.issues, False, random_source)),
+            (f"{args.issues} all fields", generated_response(args.issues, True, random_source)),
+        ]
+    do_benchmark(response_bodies, args.runs)
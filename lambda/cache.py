@@ -0,0 +1,108 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Small thread safe LRU cache with per entry expiry, shared across warm Lambda invocations.
+
+    Entries are bounded by count and, optionally, by an estimate of their total size in bytes.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, max_bytes=None, size_of=sys.getsizeof):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value, size = entry
+            if expires_at <= time.monotonic():
+                # Expired, so drop it
+                self._remove(key)
+                self.misses += 1
+                return None
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, ttl_seconds=None):
+        """Stores value against key, evicting the least recently used entries when full"""
+        if ttl_seconds is None:
+            ttl_seconds = self.ttl_seconds
+        size = self.size_of(value) if self.max_bytes is not None else 0
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl_seconds, value, size)
+            self._bytes += size
+            self._evict()
+
+    def update(self, key, function):
+        """Replaces a live entry's value with function(value), keeping its expiry. Returns False if not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return False
+            expires_at, value, size = entry
+            value = function(value)
+            new_size = self.size_of(value) if self.max_bytes is not None else 0
+            self._entries[key] = (expires_at, value, new_size)
+            self._bytes += new_size - size
+            self._evict()
+            return True
+
+    def invalidate(self, key):
+        """Removes key from the cache, if present"""
+        with self._lock:
+            self._remove(key)
+
+    def items(self):
+        """Returns the live (key, value) pairs, without changing how recently they were used"""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, entry[1]) for key, entry in self._entries.items() if entry[0] > now]
+
+    def clear(self):
+        """Removes all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns counters suitable for publishing as metrics"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or
+                                 (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry[2]
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,36 @@
+import time
+
+
+class Deadline:
+    """Time budget for a single invocation, derived from the Lambda context's remaining time"""
+
+    # Alexa gives up on the skill after about 8 seconds
+    DEFAULT_BUDGET = 7.0
+    # Time kept back for building and returning the response
+    SAFETY_MARGIN = 0.75
+    # Never hand out a timeout shorter than this, a call that can't finish is not worth starting
+    MIN_TIMEOUT = 0.1
+
+    def __init__(self, budget_seconds):
+        self.expires_at = time.monotonic() + budget_seconds
+
+    @classmethod
+    def from_context(cls, context, safety_margin=SAFETY_MARGIN):
+        """Creates a deadline from a Lambda context, falling back to the Alexa budget when there isn't one"""
+        budget = cls.DEFAULT_BUDGET
+        if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+            budget = min(budget, context.get_remaining_time_in_millis() / 1000)
+        return cls(budget - safety_margin)
+
+    def remaining(self):
+        """Seconds left before the deadline, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        """True once there's no longer time to make another call"""
+        return self.remaining() < self.MIN_TIMEOUT
+
+    def timeout(self, connect_timeout, read_timeout):
+        """Caps a (connect, read) timeout pair so the call can't outlive the deadline"""
+        remaining = self.remaining()
+        return min(connect_timeout, remaining), min(read_timeout, remaining)
@@ -0,0 +1,58 @@
+# Synthetic Alexa request envelopes and Lambda context, for driving lambda_handler locally
+import time
+import uuid
+
+APPLICATION_ID = "amzn1.ask.skill.local"
+
+
+class LocalLambdaContext:
+    """Stands in for the Lambda context object, counting down from the function timeout"""
+
+    def __init__(self, timeout_millis=8000):
+        self.aws_request_id = str(uuid.uuid4())
+        self.function_name = "my-planner-local"
+        self.expires_at = time.monotonic() + timeout_millis / 1000
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.expires_at - time.monotonic()) * 1000))
+
+
+def build_envelope(request_type="IntentRequest", intent_name=None, slots=None, access_token=None,
+                   user_id="amzn1.ask.account.local", locale="en-GB", new_session=True, attributes=None):
+    """Builds a request envelope in the shape the Alexa service sends to the skill"""
+    user = {"userId": user_id}
+    if access_token is not None:
+        user["accessToken"] = access_token
+
+    request = {
+        "type": request_type,
+        "requestId": f"amzn1.echo-api.request.{uuid.uuid4()}",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "locale": locale,
+    }
+    if intent_name is not None:
+        request["intent"] = {
+            "name": intent_name,
+            "confirmationStatus": "NONE",
+            "slots": {name: {"name": name, "value": value, "confirmationStatus": "NONE"}
+                      for name, value in (slots or {}).items()},
+        }
+
+    return {
+        "version": "1.0",
+        "session": {
+            "new": new_session,
+            "sessionId": f"amzn1.echo-api.session.{user_id}",
+            "application": {"applicationId": APPLICATION_ID},
+            "attributes": attributes or {},
+            "user": user,
+        },
+        "context": {
+            "System": {
+                "application": {"applicationId": APPLICATION_ID},
+                "user": user,
+                "apiEndpoint": "https://api.amazonalexa.com",
+            }
+        },
+        "request": request,
+    }
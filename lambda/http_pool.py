@@ -0,0 +1,40 @@
+import os
+import threading
+
+# Pool settings, overridable from the Lambda environment
+POOL_SIZE = int(os.environ.get("JIRA_HTTP_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.environ.get("JIRA_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.environ.get("JIRA_READ_TIMEOUT", "5"))
+
+# One session per container, so warm invocations reuse open keep-alive connections
+_session = None
+_session_lock = threading.Lock()
+
+
+def create_session(pool_size=POOL_SIZE):
+    """Creates a requests session with a keep-alive connection pool of the given size"""
+    # requests is a large share of import time, so it's only loaded once a Jira call needs it
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip", "Connection": "keep-alive"})
+    return session
+
+
+def get_session():
+    """Returns the shared, module scoped session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def default_timeout():
+    """Returns the default (connect, read) timeout tuple for a single call"""
+    return CONNECT_TIMEOUT, READ_TIMEOUT
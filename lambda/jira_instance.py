@@ -4,12 +4,103 @@
 # Please visit https://alexa.design/cookbook for additional examples on implementing slots, dialog management,
 # session persistence, api calls, and more.
 # This sample is built using the handler classes approach in skill builder.
+import hashlib
 import logging
-import requests
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import http_pool
+import resilience
+from cache import TTLCache
+from metrics import InvocationMetrics
+from search_decoder import CHUNK_BYTES, SearchDecoder
+from speech import MAX_SPEECH_CHARS, MORE_WORDS, SpeechRenderer
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Site IDs rarely change, so keep them for the life of the container, keyed by token fingerprint
+SITE_ID_CACHE_TTL = 3600
+SITE_ID_CACHE_SIZE = 256
+site_id_cache = TTLCache(SITE_ID_CACHE_SIZE, SITE_ID_CACHE_TTL)
+
+# Project, issue type and required field metadata hardly ever changes, so it's kept a day per site and project list
+METADATA_CACHE_TTL = 24 * 3600
+METADATA_CACHE_SIZE = 256
+metadata_cache = TTLCache(METADATA_CACHE_SIZE, METADATA_CACHE_TTL)
+
+# Background threads used to fetch the next page of a search while the current one is consumed
+prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="jira-prefetch")
+
+# Transition ids depend only on the workflow, so they're kept per site, project, issue type and starting status
+TRANSITION_CACHE_TTL = 3600
+TRANSITION_CACHE_SIZE = 256
+transition_cache = TTLCache(TRANSITION_CACHE_SIZE, TRANSITION_CACHE_TTL)
+
+# Most transitions sent to Jira at once by one request. Keep it within the HTTP pool size so connections are reused
+TRANSITION_CONCURRENCY = int(os.environ.get("JIRA_TRANSITION_CONCURRENCY", "4"))
+transition_pool = ThreadPoolExecutor(max_workers=http_pool.POOL_SIZE, thread_name_prefix="jira-transition")
+
+class JiraSearchError(Exception):
+    """Raised while iterating a search when Jira can't be reached or returns an error"""
+
+    pass
+
+
+class IssueSearch:
+    """Iterable over the issues matching a JQL search, fetched a page at a time.
+
+    The next page is requested in the background while the caller works through the current one, and
+    nothing more is fetched once the caller stops iterating or the limit is reached. total is set once
+    the first page has arrived.
+    """
+
+    def __init__(self, jira_instance, jql, projection, limit=None):
+        self.jira_instance = jira_instance
+        self.jql = jql
+        self.projection = projection
+        self.limit = limit
+        self.total = None
+
+    def __iter__(self):
+        yielded = 0
+        start_at = 0
+        future = None
+        try:
+            page = self.jira_instance.fetch_page(self.jql, self.projection, start_at)
+            while True:
+                issues = page.issues
+                self.total = page.total
+                next_start = start_at + len(issues)
+
+                # Start on the next page before handing out this one
+                wanted = self.limit is None or next_start < self.limit
+                if issues and next_start < self.total and wanted:
+                    future = prefetch_pool.submit(self.jira_instance.fetch_page, self.jql, self.projection,
+                                                  next_start)
+                else:
+                    future = None
+
+                for issue in issues:
+                    if self.limit is not None and yielded >= self.limit:
+                        return
+                    yield issue
+                    yielded += 1
+
+                if future is None:
+                    return
+                page = future.result()
+                future = None
+                start_at = next_start
+        finally:
+            # Caller stopped early, so don't wait on a page nobody will read
+            if future is not None:
+                future.cancel()
+
 
 class JiraInstance:
     # Constants
@@ -25,23 +116,261 @@ class JiraInstance:
 
     # End point types
     QUERY = {"API": "rest/api/2/search"}
+    BULK_CREATE = {"API": "rest/api/2/issue/bulk"}
+    CREATE_META = {"API": "rest/api/2/issue/createmeta"}
+    TRANSITIONS = {"API": "rest/api/2/issue/{}/transitions"}
+
+    # Query projections - which fields a search asks for, and how many issues per page.
+    # "key" is always returned, so asking for it alone keeps the fields object empty
+    PAGE_SIZE = 50
+    PROJECTION_COUNT = {"fields": ["key"], "maxResults": 0}
+    PROJECTION_KEYS = {"fields": ["key"], "maxResults": PAGE_SIZE}
+    PROJECTION_SUMMARY = {"fields": ["summary"], "maxResults": PAGE_SIZE}
+    PROJECTION_DEFAULT = {"fields": ["summary", "status", "assignee"], "maxResults": 15}
+    PROJECTION_SYNC = {"fields": ["summary", "status", "updated"], "maxResults": PAGE_SIZE}
+    # Status breakdowns only need two small fields per issue, so ask for Jira's largest page
+    SCAN_PAGE_SIZE = 100
+    PROJECTION_STATUS = {"fields": ["status", "issuetype"], "maxResults": SCAN_PAGE_SIZE}
 
     # URLs
     BASE_RESOURCE_URL = "https://api.atlassian.com/oauth/token/accessible-resources"
     BASE_API_URL = "https://api.atlassian.com/ex/jira"
-    
-    def __init__(self, access_token):
+
+    # Status codes that mean the cached site ID can no longer be trusted
+    SITE_INVALID_STATUS_CODES = (401, 404)
+
+    # Why the last call failed, so callers can tell a slow Jira from a broken one
+    FAILURE_NOT_SENT = "not_sent"
+    FAILURE_TIMEOUT = "timeout"
+    FAILURE_ERROR = "error"
+    # Jira answered with a server error, so it's down or struggling rather than refusing the request
+    FAILURE_UNAVAILABLE = "unavailable"
+    # Never sent, because the metadata showed Jira would reject it
+    FAILURE_INVALID = "invalid"
+
+    # Fields every create payload fills in, and the longest summary Jira accepts
+    SUPPLIED_FIELDS = frozenset(["project", "issuetype", "summary"])
+    MAX_SUMMARY_CHARS = 255
+
+    # Operation names, used to label each call's timing in the metrics
+    OP_SITE_LOOKUP = "SiteLookup"
+    OP_SEARCH = "Search"
+    OP_CREATE = "Create"
+    OP_BULK_CREATE = "BulkCreate"
+    OP_TRANSITION_LOOKUP = "TransitionLookup"
+    OP_TRANSITION = "Transition"
+    OP_METADATA = "Metadata"
+
+    # Retries. Jira hasn't acted on a throttled call, so any call can be retried after a 429. A 5xx may come
+    # after a change was made though, so only calls that change nothing are retried on those
+    RETRY_STATUS_CODES = (429,)
+    RETRY_READ_STATUS_CODES = (502, 503, 504)
+    READ_OPERATIONS = (OP_SITE_LOOKUP, OP_SEARCH, OP_TRANSITION_LOOKUP, OP_METADATA)
+    # A retry, or a wait for the rate limit, must leave at least this long for the call itself
+    MIN_RETRY_TIME = 1.0
+    MAX_THROTTLE_WAIT = 1.0
+
+    def __init__(self, access_token, session=None, timeout=None, deadline=None, metrics=None):
         self.site_id = None
+        self.cloud_ids = []
         self.access_token = access_token
+        self.token_fingerprint = hashlib.sha256(access_token.encode("utf-8")).hexdigest()
         self.headers = {'content-type': 'application/json', 'authorization': f'Bearer {self.access_token}'}
+        # Use the shared keep-alive pool unless the caller brings its own session
+        self.session = session if session is not None else http_pool.get_session()
+        self.timeout = timeout if timeout is not None else http_pool.default_timeout()
+        # Optional invocation deadline, every call's timeout is capped by what's left of it
+        self.deadline = deadline
+        self.last_failure = None
+        # Ids and required fields of the configured projects found on the site, by project key. Until they're
+        # loaded, projects and issue types are sent by key and name, and nothing is checked locally
+        self.projects = {}
+        # Timings for this invocation. A throwaway recorder is used if the caller isn't collecting them
+        self.metrics = metrics if metrics is not None else InvocationMetrics()
+
+    def call_timeout(self):
+        """Returns the (connect, read) timeout for the next call"""
+        if self.deadline is None:
+            return self.timeout
+        return self.deadline.timeout(*self.timeout)
+
+    def send_request(self, method, url, operation, **kwargs):
+        """Sends a request over the pooled session, returning the response or None if it couldn't be sent.
+        Throttled or briefly unavailable calls are retried, but only while the deadline leaves time for it"""
+        site = self.site_id or self.BASE_RESOURCE_URL
+        attempt = 0
+        while True:
+            response = self.send_once(method, url, operation, site, **kwargs)
+            delay = self.retry_delay(operation, response, attempt)
+            if delay is None:
+                return response
+            # Let the connection go back to the pool, in case the body was being streamed
+            response.close()
+            attempt += 1
+            self.metrics.add("Retries", 1)
+            self.metrics.add("RetryWaitMs", delay * 1000, "Milliseconds")
+            resilience.count("Retries")
+            time.sleep(delay)
+
+    def send_once(self, method, url, operation, site, **kwargs):
+        """Makes one attempt at a call, within the site's rate limit and unless its circuit breaker is open"""
+        if self.out_of_time():
+            return None
+
+        # Wait for the site's rate limit, but never so long that the call itself can't be made. The site lookup
+        # isn't made against a site, so isn't limited
+        waited = time.perf_counter()
+        if self.site_id is not None and not resilience.bucket_for(site).acquire(self.throttle_wait()):
+            self.client_throttled()
+            return None
+        self.metrics.add("RateLimitWaitMs", (time.perf_counter() - waited) * 1000, "Milliseconds")
+
+        breaker = self.admit(site)
+        if breaker is None:
+            return None
+
+        kwargs.setdefault("headers", self.headers)
+        kwargs["timeout"] = self.call_timeout()
+        # Already loaded by the session, this just binds the names
+        from requests import exceptions as request_errors
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except request_errors.ConnectTimeout:
+            # Never reached Jira
+            return self.call_failed("ConnectTimeout", self.FAILURE_NOT_SENT, breaker)
+        except request_errors.Timeout:
+            # Sent, but the answer didn't arrive in time
+            return self.call_failed("Timeout", self.FAILURE_TIMEOUT, breaker)
+        except request_errors.RequestException as e:
+            return self.call_failed(type(e).__name__, self.FAILURE_ERROR, breaker)
+        finally:
+            self.record_call(operation, response, start, kwargs.get("stream", False))
+        return self.check_response(response, breaker)
+
+    def out_of_time(self):
+        """True, and recorded as a call not sent, once the deadline leaves no time to start another call"""
+        if self.deadline is not None and self.deadline.expired():
+            # No time left, so don't start something that can't finish
+            self.last_failure = self.FAILURE_NOT_SENT
+            self.metrics.add("DeadlineSkips", 1)
+            return True
+        return False
+
+    def throttle_wait(self):
+        """Longest wait for the rate limit that still leaves time for the call itself"""
+        if self.deadline is None:
+            return self.MAX_THROTTLE_WAIT
+        return max(0.0, min(self.MAX_THROTTLE_WAIT, self.deadline.remaining() - self.MIN_RETRY_TIME))
+
+    def client_throttled(self):
+        self.last_failure = self.FAILURE_NOT_SENT
+        self.metrics.add("ClientThrottles", 1)
+        resilience.count("ClientThrottles")
+
+    def admit(self, site):
+        """Returns the site's circuit breaker if a call may be made, or None while Jira is failing, so calls
+        fail fast instead of adding to the load"""
+        breaker = resilience.breaker_for(site)
+        if not breaker.allow():
+            self.last_failure = self.FAILURE_NOT_SENT
+            self.metrics.add("BreakerRejects", 1)
+            self.metrics.set_property("BreakerState", breaker.state)
+            resilience.count("BreakerRejects")
+            return None
+        return breaker
+
+    def call_failed(self, error_name, failure, breaker):
+        """Records a call that got no response"""
+        logger.warning(f"Request to Jira failed: {error_name}")
+        self.last_failure = failure
+        breaker.record_failure()
+        return None
+
+    def check_response(self, response, breaker):
+        """Records a response's outcome against the breaker and the site, and returns it"""
+        if response.status_code == 429:
+            # Jira turned the call away without acting on it. It's busy rather than broken, so the breaker doesn't
+            # count a failure, but a trial call hasn't shown Jira has recovered. The retry waits as long as Jira asks
+            breaker.record_inconclusive()
+            self.metrics.add("Throttles", 1)
+            resilience.count("Throttles")
+            self.last_failure = self.FAILURE_NOT_SENT
+            return response
+        if response.status_code >= 500:
+            breaker.record_failure()
+            self.last_failure = self.FAILURE_UNAVAILABLE
+            return response
+        breaker.record_success()
+        self.check_site_status(response.status_code)
+        self.last_failure = None if response.ok else self.FAILURE_ERROR
+        return response
+
+    def retry_delay(self, operation, response, attempt):
+        """Seconds to wait before retrying a call, or None if it shouldn't be retried"""
+        if response is None or attempt >= resilience.MAX_RETRIES:
+            return None
+        status_code = response.status_code
+        if status_code not in self.RETRY_STATUS_CODES and not (
+                status_code in self.RETRY_READ_STATUS_CODES and operation in self.READ_OPERATIONS):
+            return None
+        retry_after = resilience.retry_after_seconds(response.headers.get("Retry-After"))
+        delay = resilience.backoff_delay(attempt, retry_after)
+        if self.deadline is not None and self.deadline.remaining() - delay < self.MIN_RETRY_TIME:
+            return None
+        if self.deadline is None and delay > resilience.BACKOFF_CAP:
+            return None
+        return delay
+
+    def record_call(self, operation, response, start, streamed=False):
+        """Adds one call's duration, status code and payload sizes to the invocation metrics. A streamed body
+        hasn't been read yet, so only its Content-Length is counted, and the reader adds the size otherwise"""
+        duration_ms = (time.perf_counter() - start) * 1000
+        if response is None:
+            self.metrics.record_http(operation, None, 0, 0, duration_ms)
+            return
+        request = getattr(response, "request", None)
+        request_body = getattr(request, "body", None)
+        request_bytes = len(request_body) if request_body else 0
+        # Wire size where the server gives it, which is the compressed size for gzip responses
+        response_bytes = int(response.headers.get("Content-Length") or 0)
+        if not response_bytes and not streamed:
+            response_bytes = len(response.content)
+        self.metrics.record_http(operation, response.status_code, request_bytes, response_bytes, duration_ms)
+
+    def timed_out(self):
+        """True if the last call failed because the time budget ran out"""
+        return self.last_failure in (self.FAILURE_NOT_SENT, self.FAILURE_TIMEOUT)
+
+    def unavailable(self):
+        """True if the last call failed because Jira was slow, busy or down, rather than because it refused the
+        request, so an earlier answer is better than none"""
+        return self.timed_out() or self.last_failure == self.FAILURE_UNAVAILABLE
 
     def set_site_id(self):
-        """Obtains and sets the site id from the Jira API app"""
-        # Construct headers
-        headers = {'content-type': 'application/json', 'authorization': f'Bearer {self.access_token}'}
+        """Obtains and sets the site id from the Jira API app, using the container cache where possible"""
+        # Check the cache first, to save a round trip on warm containers
+        if self.cached_site_id():
+            return True
 
         # Invoke call to API to return resource details and site
-        response = requests.get(self.BASE_RESOURCE_URL, headers=headers)
+        response = self.send_request("GET", self.BASE_RESOURCE_URL, self.OP_SITE_LOOKUP)
+        return self.read_site_id(response)
+
+    def cached_site_id(self):
+        """Sets the site id from the container cache, returning False if it isn't cached"""
+        cached = site_id_cache.get(self.token_fingerprint)
+        if cached is None:
+            return False
+        self.site_id, self.cloud_ids = cached
+        self.metrics.add("SiteIdCacheHits", 1)
+        return True
+
+    def read_site_id(self, response):
+        """Sets and caches the site id from an accessible-resources response"""
+        if response is None:
+            return False
 
         # Check return code
         status_code = response.status_code
@@ -53,33 +382,149 @@ class JiraInstance:
             # Get the site ID
             response_json = response.json()
             site_id = response_json[0]['id']
-            print(f"Got site ID: {site_id}")
+            logger.info(f"Got site ID: {site_id}")
             self.site_id = site_id
+            self.cloud_ids = [resource['id'] for resource in response_json]
+            site_id_cache.put(self.token_fingerprint, (self.site_id, self.cloud_ids))
             return True
 
+    def seed_site_id(self, site_id, cloud_ids):
+        """Primes the container cache with a site id saved by an earlier container, unless one is cached"""
+        if site_id and site_id_cache.get(self.token_fingerprint) is None:
+            site_id_cache.put(self.token_fingerprint, (site_id, list(cloud_ids or [site_id])))
+
+    def load_metadata(self, project_keys, issue_types):
+        """Looks up the ids and required fields of the projects and issue types, from the container cache
+        where possible. Projects the site doesn't have, or the user can't create issues in, are left out"""
+        projects = self.cached_metadata(project_keys)
+        if projects is not None:
+            return True, projects
+
+        # Invoke the API
+        jira_rest_url, params = self.metadata_request(project_keys, issue_types)
+        response = self.send_request("GET", jira_rest_url, self.OP_METADATA, params=params)
+        return self.read_metadata(project_keys, response)
+
+    def cached_metadata(self, project_keys):
+        """Sets the projects from the container cache, returning None if they aren't cached"""
+        projects = metadata_cache.get((self.site_id, tuple(project_keys)))
+        if projects is not None:
+            self.projects = projects
+            self.metrics.add("MetadataCacheHits", 1)
+        return projects
+
+    def metadata_request(self, project_keys, issue_types):
+        """Builds the createmeta URL and query parameters for the projects and issue types"""
+        # Construct the API URL
+        api = self.CREATE_META["API"]
+        jira_rest_url = f"{self.BASE_API_URL}/{self.site_id}/{api}"
+        params = {
+            "projectKeys": ",".join(project_keys),
+            "issuetypeNames": ",".join(issue_type["Name"] for issue_type in issue_types),
+            "expand": "projects.issuetypes.fields",
+        }
+        return jira_rest_url, params
+
+    def read_metadata(self, project_keys, response):
+        """Sets and caches the projects from a createmeta response"""
+        if response is None or response.status_code != 200:
+            return False, None
+        projects = {project["key"]: self.project_metadata(project) for project in response.json()["projects"]}
+        metadata_cache.put((self.site_id, tuple(project_keys)), projects)
+        self.projects = projects
+        return True, projects
+
+    def seed_metadata(self, site_id, project_keys, projects):
+        """Primes the container cache with metadata saved by an earlier container, unless some is cached"""
+        cache_key = (site_id, tuple(project_keys))
+        if site_id and projects is not None and metadata_cache.get(cache_key) is None:
+            metadata_cache.put(cache_key, projects)
+
+    @staticmethod
+    def project_metadata(project):
+        """Keeps just the ids and required fields from a createmeta project"""
+        return {
+            "id": project["id"],
+            "types": {
+                issue_type["name"]: {
+                    "id": issue_type["id"],
+                    # Fields Jira would reject a create without, because they have no default
+                    "required": sorted(key for key, field in issue_type.get("fields", {}).items()
+                                       if field.get("required") and not field.get("hasDefaultValue")),
+                }
+                for issue_type in project.get("issuetypes", [])
+            },
+        }
+
+    def project_ref(self, project_key):
+        """The project's id once the metadata is loaded, otherwise its key"""
+        project = self.projects.get(project_key)
+        return project["id"] if project is not None else project_key
+
+    def type_ref(self, issue_type, project_key):
+        """The issue type's id in the project once the metadata is loaded, otherwise its name"""
+        project = self.projects.get(project_key)
+        type_meta = project["types"].get(issue_type["Name"]) if project is not None else None
+        return type_meta["id"] if type_meta is not None else issue_type["Name"]
+
+    def validate_issue(self, issue_type, issue_summary, project_key):
+        """Checks an issue would be accepted before it's sent, returning what's wrong, or None if it's fine"""
+        if not issue_summary or not issue_summary.strip():
+            return "empty summary"
+        if len(issue_summary) > self.MAX_SUMMARY_CHARS:
+            return "summary too long"
+        if not self.projects:
+            # Metadata not loaded, so leave it to Jira
+            return None
+        project = self.projects.get(project_key)
+        if project is None:
+            return f"no project {project_key}"
+        type_meta = project["types"].get(issue_type["Name"])
+        if type_meta is None:
+            return f"no issue type {issue_type['Name']} in {project_key}"
+        missing = set(type_meta["required"]) - self.SUPPLIED_FIELDS
+        if missing:
+            return f"required fields {', '.join(sorted(missing))}"
+        return None
+
+    def rejected(self, error):
+        """Records an issue that failed validation, so it's neither sent nor queued"""
+        logger.warning(f"Issue not sent: {error}")
+        self.last_failure = self.FAILURE_INVALID
+        self.metrics.add("ValidationFailures", 1)
+
+    def check_site_status(self, status_code):
+        """Drops the cached site ID if the API says the token or site is no longer valid"""
+        if status_code in self.SITE_INVALID_STATUS_CODES:
+            site_id_cache.invalidate(self.token_fingerprint)
+
     def create_issue(self, issue_type, issue_summary, project_key):
         """Creates a Jira issue object in the given project"""
+        error = self.validate_issue(issue_type, issue_summary, project_key)
+        if error is not None:
+            self.rejected(error)
+            return False, None
+
+        # Invoke the API
+        jira_rest_url, data = self.create_request(issue_type, issue_summary, project_key)
+        response = self.send_request("POST", jira_rest_url, self.OP_CREATE, json=data)
+        return self.read_created(response)
+
+    def create_request(self, issue_type, issue_summary, project_key):
+        """Builds the create URL and JSON payload for a single issue"""
 
         # Construct the API URL
         api = issue_type["API"]
-        issue_type_name = issue_type["Name"]
         jira_rest_url = f"{self.BASE_API_URL}/{self.site_id}/{api}"
 
         # Construct the JSON payload
-        data = {
-            "fields": {
-                "project": {
-                    "key": project_key,
-                },
-                "issuetype": {
-                    "name": issue_type_name,
-                },
-                "summary": issue_summary,
-            }
-        }
+        return jira_rest_url, self.issue_fields(issue_type, issue_summary, project_key)
 
-        # Invoke the API
-        response = requests.post(jira_rest_url, headers=self.headers, json=data)
+    @staticmethod
+    def read_created(response):
+        """Gets the new issue's key from a create response"""
+        if response is None:
+            return False, None
 
         # Process status
         status_code = response.status_code
@@ -92,63 +537,296 @@ class JiraInstance:
             issue_key = response_json['key']
             return True, issue_key
 
+    def create_issues(self, issue_type, issue_summaries, project_key):
+        """Creates several Jira issues in the given project with a single bulk call.
+        Returns a status, and a list of (created, issue key) pairs in the same order as the summaries"""
+
+        # Only send the ones Jira will accept
+        valid = []
+        for index, issue_summary in enumerate(issue_summaries):
+            error = self.validate_issue(issue_type, issue_summary, project_key)
+            if error is not None:
+                self.rejected(error)
+            else:
+                valid.append(index)
+        if not valid:
+            return False, None
+
+        # Construct the API URL
+        api = self.BULK_CREATE["API"]
+        jira_rest_url = f"{self.BASE_API_URL}/{self.site_id}/{api}"
+
+        # Construct the JSON payload
+        data = {
+            "issueUpdates": [self.issue_fields(issue_type, issue_summaries[index], project_key) for index in valid]
+        }
+
+        # Invoke the API
+        response = self.send_request("POST", jira_rest_url, self.OP_BULK_CREATE, json=data)
+        if response is None:
+            return False, None
+
+        # Process status. Jira answers 201 when everything was created, and 400 with the
+        # same body shape when some or all of the items failed
+        status_code = response.status_code
+        if status_code not in (201, 400):
+            # Failed
+            return False, None
+        response_json = response.json()
+        if "issues" not in response_json:
+            return False, None
+
+        # Created issues come back in request order, minus the failed elements. Element numbers count only
+        # what was sent, so they're mapped back to the summaries
+        failed = {valid[error["failedElementNumber"]] for error in response_json.get("errors", [])}
+        created = iter(response_json["issues"])
+        results = []
+        sent = set(valid)
+        for index in range(len(issue_summaries)):
+            if index not in sent or index in failed:
+                results.append((False, None))
+            else:
+                issue = next(created, None)
+                results.append((issue is not None, issue["key"] if issue is not None else None))
+        return True, results
+
+    def transition_ids(self, issue_key, issue_type, from_status, project_key):
+        """Gets the transitions out of a status, as {target status name: transition id}. Every issue of a type
+        in a project shares a workflow, so one issue's transitions are looked up and cached for the rest"""
+        cache_key = (self.site_id, project_key, issue_type["Name"], from_status)
+        transitions = transition_cache.get(cache_key)
+        if transitions is not None:
+            self.metrics.add("TransitionCacheHits", 1)
+            return True, transitions
+
+        # Construct the API URL
+        api = self.TRANSITIONS["API"].format(issue_key)
+        jira_rest_url = f"{self.BASE_API_URL}/{self.site_id}/{api}"
+
+        # Invoke the API
+        response = self.send_request("GET", jira_rest_url, self.OP_TRANSITION_LOOKUP)
+        if response is None or response.status_code != 200:
+            return False, None
+        transitions = {transition["to"]["name"]: transition["id"]
+                       for transition in response.json()["transitions"]}
+        transition_cache.put(cache_key, transitions)
+        return True, transitions
+
+    def transition_issue(self, issue_key, transition_id):
+        """Moves one issue through a workflow transition"""
+
+        # Construct the API URL
+        api = self.TRANSITIONS["API"].format(issue_key)
+        jira_rest_url = f"{self.BASE_API_URL}/{self.site_id}/{api}"
+
+        # Invoke the API
+        response = self.send_request("POST", jira_rest_url, self.OP_TRANSITION,
+                                     json={"transition": {"id": transition_id}})
+        if response is None:
+            return False
+
+        # Jira answers a successful transition with no content
+        return response.status_code == 204
+
+    def transition_issues(self, issues, issue_type, to_status, project_key, max_in_flight=TRANSITION_CONCURRENCY):
+        """Moves several issues to a status, given as (issue key, current status) pairs. Transition ids are
+        looked up once per starting status, then at most max_in_flight transitions are sent at a time.
+        Returns a status, and a list of (issue key, moved) pairs in the same order as the issues"""
+        moved = {}
+        futures = {}
+        in_flight = threading.BoundedSemaphore(max_in_flight)
+        for issue_key, from_status in issues:
+            if from_status == to_status:
+                moved[issue_key] = True
+                continue
+            ret_status, transitions = self.transition_ids(issue_key, issue_type, from_status, project_key)
+            if not ret_status or to_status not in transitions:
+                moved[issue_key] = False
+                continue
+            # Wait for a free slot, so a long list can't flood Jira or the connection pool
+            in_flight.acquire()
+            future = transition_pool.submit(self.transition_issue, issue_key, transitions[to_status])
+            future.add_done_callback(lambda done: in_flight.release())
+            futures[issue_key] = future
+
+        for issue_key, future in futures.items():
+            try:
+                moved[issue_key] = future.result()
+            except Exception as e:
+                logger.warning(f"Transition failed: {type(e).__name__}")
+                moved[issue_key] = False
+        results = [(issue_key, moved[issue_key]) for issue_key, from_status in issues]
+        return any(ok for issue_key, ok in results) or not results, results
+
+    def issue_fields(self, issue_type, issue_summary, project_key):
+        """Builds the create payload for a single issue, by id once the metadata is loaded"""
+        project = self.projects.get(project_key)
+        type_meta = project["types"].get(issue_type["Name"]) if project is not None else None
+        return {
+            "fields": {
+                "project": {"id": project["id"]} if project is not None else {"key": project_key},
+                "issuetype": {"id": type_meta["id"]} if type_meta is not None else {"name": issue_type["Name"]},
+                "summary": issue_summary,
+            }
+        }
+
     def issue_count(self, issue_type, use_status, status, project_key):
         """Gets a count of issues with type and status"""
 
-        # Get list of issues and grab total
-        status, response = self.get_issue_list(issue_type, use_status, status, project_key)
-        status_code = response.status_code
-        if status_code != 200:
+        # Ask for no issues at all, just the total
+        jql = self.build_jql(issue_type, use_status, status, project_key)
+        ret_status, page = self.search_page(jql, self.PROJECTION_COUNT)
+        if not ret_status:
             # Failed
             return False, None
         else:
             # Success
-            response_json = response.json()
-            total = response_json['total']
-            return True, total
+            return True, page.total
 
-    def issue_summaries(self, issue_type, use_status, status, project_key):
-        """Get a list of issue summaries with type and status"""
-        status, response = self.get_issue_list(issue_type, use_status, status, project_key)
-        status_code = response.status_code
-        if status_code != 200:
+    def updated_count(self, issue_type, project_key, since_minutes):
+        """Gets a count of issues of a type created or changed in the last few minutes, whatever their status"""
+        jql = self.build_updated_jql(issue_type, project_key, since_minutes)
+        ret_status, page = self.search_page(jql, self.PROJECTION_COUNT)
+        if not ret_status:
+            return False, None
+        return True, page.total
+
+    def issue_keys(self, issue_type, use_status, status, project_key):
+        """Get a list of issue keys with type and status"""
+        jql = self.build_jql(issue_type, use_status, status, project_key)
+        ret_status, page = self.search_page(jql, self.PROJECTION_KEYS)
+        if not ret_status:
             # Failed
             return False, None
         else:
-            # Success. Parse the issue responses into a speakable string
-            response_json = response.json()
-            issue_summaries = ""
-            issues = response_json["issues"]
-            for issue in issues:
-                issue_summaries += f'{issue["fields"]["summary"]}. '
-            return True, issue_summaries
+            # Success
+            return True, [issue.key for issue in page.issues]
 
-    def get_issue_list(self, issue_type, use_status, status, project_key):
-        """Query the REST API for issues with type and status"""
+    def issue_summaries(self, issue_type, use_status, status, project_key, max_chars=MAX_SPEECH_CHARS,
+                        max_issues=None, max_seconds=None, more=MORE_WORDS):
+        """Get a list of issue summaries with type and status as speech, stopping once max_chars of speech or
+        max_seconds of speaking is reached, and saying how many more there are"""
+        jql = self.build_jql(issue_type, use_status, status, project_key)
+        projection = self.PROJECTION_SUMMARY
+        if max_issues is not None:
+            projection = self.field_projection(projection["fields"], min(max_issues, self.PAGE_SIZE))
+        results = self.search_issues(jql, projection, max_issues)
+        renderer = SpeechRenderer(max_chars, max_seconds, more)
 
-        # Construct the API URL
-        api = self.QUERY["API"]
-        jira_rest_url = f"{self.BASE_API_URL}/{self.site_id}/{api}"
-        issue_type_name = issue_type["Name"]
+        # Render the issues as the pages arrive, no more pages are fetched once the speech is full
+        try:
+            with closing(iter(results)) as issues:
+                renderer.extend(issue.summary for issue in issues)
+        except JiraSearchError:
+            # Failed
+            return False, None
+        return True, renderer.render(results.total)
 
-        # Construct the JSON payload
+    def issue_summary_page(self, issue_type, status, project_key, start_at, max_results=PAGE_SIZE):
+        """Get one page of issue summaries with type and status, oldest first, for reading a list in parts"""
+        jql = f"{self.build_jql(issue_type, True, status, project_key)} ORDER BY key ASC"
+        projection = self.field_projection(self.PROJECTION_SUMMARY["fields"], max_results)
+        ret_status, page = self.search_page(jql, projection, start_at)
+        if not ret_status:
+            return False, None
+        return True, [issue.summary for issue in page.issues]
+
+    def sync_issues(self, jql, projection=None):
+        """Fetches every issue matching the JQL, across all pages, as records for the task index"""
+        try:
+            with closing(iter(self.search_issues(jql, projection or self.PROJECTION_SYNC))) as issues:
+                return True, [issue.index_record() for issue in issues]
+        except JiraSearchError:
+            return False, None
+
+    def status_histogram(self, project_key):
+        """Counts every issue in the project by status and by issue type, in one paged scan rather than a
+        count query per status. Returns {"total": n, "statuses": {status: n}, "types": {type: {status: n}}}"""
+        jql = self.build_project_jql(project_key)
+        try:
+            with closing(iter(self.search_issues(jql, self.PROJECTION_STATUS))) as issues:
+                return True, self.count_statuses(issues)
+        except JiraSearchError:
+            return False, None
+
+    @staticmethod
+    def count_statuses(issues):
+        """Builds a status histogram from IssueRecords carrying their status and issue type"""
+        statuses = Counter()
+        types = defaultdict(Counter)
+        for issue in issues:
+            statuses[issue.status] += 1
+            types[issue.issuetype][issue.status] += 1
+        return {
+            "total": sum(statuses.values()),
+            "statuses": dict(statuses),
+            "types": {issue_type: dict(counts) for issue_type, counts in types.items()},
+        }
+
+    @staticmethod
+    def index_record(issue):
+        """Keeps just what the task index needs from a search result issue"""
+        fields = issue.get("fields", {})
+        return {
+            "key": issue["key"],
+            "summary": fields.get("summary"),
+            "status": (fields.get("status") or {}).get("name"),
+            "updated": fields.get("updated"),
+        }
+
+    def search_issues(self, jql, projection, limit=None):
+        """Returns an IssueSearch that pages through every issue matching the JQL"""
+        return IssueSearch(self, jql, projection, limit)
+
+    def fetch_page(self, jql, projection, start_at):
+        """Fetches one page of search results as a SearchPage, raising JiraSearchError on failure"""
+        ret_status, page = self.search_page(jql, projection, start_at)
+        if not ret_status:
+            raise JiraSearchError()
+        return page
+
+    @staticmethod
+    def field_projection(fields, max_results=PAGE_SIZE):
+        """Builds a projection that asks for an explicit list of fields"""
+        return {"fields": list(fields), "maxResults": max_results}
+
+    def build_jql(self, issue_type, use_status, status, project_key):
+        """Builds the JQL for issues with type and, optionally, status"""
+        project = self.project_ref(project_key)
+        issue_type_ref = self.type_ref(issue_type, project_key)
         if use_status:
-            jql = f"project = {project_key} AND status={status} AND type={issue_type_name}"
+            return f"project = {project} AND status={status} AND type={issue_type_ref}"
         else:
-            jql = f"project = {project_key} AND type={issue_type_name}"
-        data = {
-                "jql": jql,
-                "startAt": 0,
-                "maxResults": 15,
-                "fields": [
-                    "summary",
-                    "status",
-                    "assignee"
-                ]
-        }
+            return f"project = {project} AND type={issue_type_ref}"
+
+    def build_project_jql(self, project_key):
+        """Builds the JQL for every issue in the project, whatever its type and status"""
+        return f"project = {self.project_ref(project_key)}"
+
+    def build_open_jql(self, issue_type, project_key):
+        """Builds the JQL for issues with type that aren't done"""
+        return f"{self.build_jql(issue_type, False, None, project_key)} AND status != '{self.STATUS_DONE}'"
+
+    def build_updated_jql(self, issue_type, project_key, since_minutes):
+        """Builds the JQL for issues with type, in any status, created or changed in the last few minutes.
+        Relative dates don't depend on the timezone of the Jira user"""
+        return f"{self.build_jql(issue_type, False, None, project_key)} AND updated >= -{since_minutes}m"
+
+    def get_issue_list(self, issue_type, use_status, status, project_key, projection=None, start_at=0):
+        """Query the REST API for issues with type and status"""
+        jql = self.build_jql(issue_type, use_status, status, project_key)
+        if projection is None:
+            projection = self.PROJECTION_DEFAULT
+        return self.search(jql, projection, start_at)
+
+    def search(self, jql, projection, start_at=0):
+        """Run a JQL search, asking only for what the projection needs"""
+        jira_rest_url, data = self.search_request(jql, projection, start_at)
 
         # Invoke the API
-        response = requests.post(jira_rest_url, headers=self.headers, json=data)
+        response = self.send_request("POST", jira_rest_url, self.OP_SEARCH, json=data)
+        if response is None:
+            return False, None
 
         # Process status
         status_code = response.status_code
@@ -158,3 +836,52 @@ class JiraInstance:
         else:
             # Success
             return True, response
+
+    def search_page(self, jql, projection, start_at=0):
+        """Run a JQL search, decoding the response as it's read into a SearchPage of IssueRecords, so only the
+        total and the fields the skill reads are ever held rather than the whole response"""
+        jira_rest_url, data = self.search_request(jql, projection, start_at)
+
+        # Invoke the API, leaving the body to be read a chunk at a time
+        response = self.send_request("POST", jira_rest_url, self.OP_SEARCH, json=data, stream=True)
+        if response is None:
+            return False, None
+        # Already loaded by the session, this just binds the names
+        from requests import exceptions as request_errors
+        decoder = SearchDecoder()
+        with closing(response):
+            if response.status_code != 200:
+                return False, None
+            try:
+                for chunk in response.iter_content(CHUNK_BYTES):
+                    decoder.feed(chunk)
+                page = decoder.close()
+            except request_errors.RequestException as e:
+                # The body stopped arriving part way through
+                return self.read_failed(type(e).__name__, self.FAILURE_TIMEOUT)
+            except ValueError:
+                return self.read_failed("InvalidSearchResponse", self.FAILURE_ERROR)
+        if not response.headers.get("Content-Length"):
+            self.metrics.add("JiraResponseBytes", decoder.bytes_read, "Bytes")
+        return True, page
+
+    def read_failed(self, error_name, failure):
+        """Records a response whose body couldn't be read"""
+        self.call_failed(error_name, failure, resilience.breaker_for(self.site_id))
+        return False, None
+
+    def search_request(self, jql, projection, start_at=0):
+        """Builds the search URL and JSON payload for one page of a JQL search"""
+
+        # Construct the API URL
+        api = self.QUERY["API"]
+        jira_rest_url = f"{self.BASE_API_URL}/{self.site_id}/{api}"
+
+        # Construct the JSON payload
+        data = {
+                "jql": jql,
+                "startAt": start_at,
+                "maxResults": projection["maxResults"],
+                "fields": projection["fields"]
+        }
+        return jira_rest_url, data
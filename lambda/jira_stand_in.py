@@ -0,0 +1,474 @@
+# Local stand-in for the Jira Cloud REST API, for testing and load testing the skill without touching production Jira.
+# Serves accessible-resources, createmeta, search, issue create, bulk create and transitions, with configurable latency, errors
+# and data size. Can also record the webhook payloads Jira would send for each change.
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from jira_instance import JiraInstance
+
+# Jira's timestamp format, e.g. 2020-01-01T09:00:00.000+0000
+JIRA_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+
+STATUSES = ["To Do", "In Progress", "Complete"]
+PROJECT_ID = "10000"
+ISSUE_TYPE_IDS = {"Task": "10001", "Story": "10002", "Epic": "10003"}
+# One workflow for every issue, with a transition into each status from any other
+TRANSITIONS = {"11": ("Start over", "To Do"), "21": ("Start", "In Progress"), "31": ("Done", "Complete")}
+ISSUE_TRANSITIONS = re.compile(r"^issue/([A-Z][A-Z0-9]*-\d+)/transitions$")
+WORDS = ["buy", "milk", "eggs", "bread", "call", "mum", "book", "dentist", "fix", "bike", "pay", "council",
+         "tax", "walk", "dog", "clean", "kitchen", "renew", "passport", "water", "plants", "post", "parcel"]
+
+# JQL clauses the stand-in understands, e.g. status='To Do' or updated >= "2020/01/01 09:00"
+JQL_CLAUSE = re.compile(r"""^\s*(\w+)\s*(>=|<=|=|!=|>|<)\s*['"]?(.*?)['"]?\s*$""")
+
+# Relative JQL dates, such as -15m or -2d
+RELATIVE_TIME = re.compile(r"^-(\d+)([mhdw])$")
+RELATIVE_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def jira_now():
+    """The current time as Jira writes it, to the millisecond"""
+    now = datetime.now(timezone.utc)
+    return f"{now.strftime('%Y-%m-%dT%H:%M:%S')}.{now.microsecond // 1000:03d}{now.strftime('%z')}"
+
+
+class JiraStandIn:
+    """In-process fake Jira server holding a generated set of issues for one site and project"""
+
+    def __init__(self, issue_count=50, latency_ms=0, latency_jitter_ms=0, error_rate=0.0, site_id="local-site",
+                 project_key="PTD", seed=None, rate_limit=None, record_webhooks=False):
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        # Calls a second before answering 429, like Atlassian's rate limiting, or None for no limit
+        self.rate_limit = rate_limit
+        self.window_start = 0
+        self.window_calls = 0
+        self.throttled = 0
+        # Webhook payloads for every change, oldest first, when recording
+        self.record_webhooks = record_webhooks
+        self.webhook_events = []
+        self.site_id = site_id
+        self.project_key = project_key
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.server = None
+        self.url = None
+        self.next_id = 10000
+        self.issues = [self.new_issue(self.random_summary(), self.random.choice(STATUSES))
+                       for _ in range(issue_count)]
+
+    def random_summary(self):
+        return " ".join(self.random.sample(WORDS, 3)).capitalize()
+
+    def new_issue(self, summary, status="To Do", issue_type="Task"):
+        """Builds an issue record with the next key, without storing it"""
+        self.next_id += 1
+        now = jira_now()
+        return {
+            "id": str(self.next_id),
+            "key": f"{self.project_key}-{self.next_id - 10000}",
+            "summary": summary,
+            "status": status,
+            "issuetype": issue_type,
+            "created": now,
+            "updated": now,
+        }
+
+    # Server lifecycle
+
+    def start(self, host="127.0.0.1", port=0):
+        """Starts serving in a background thread, returning the base URL"""
+        self.server = ThreadingHTTPServer((host, port), make_handler(self))
+        self.server.daemon_threads = True
+        host, port = self.server.server_address[:2]
+        # Kept once stopped, so anything still holding the URL gets a refused connection rather than an error here
+        self.url = f"http://{host}:{port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base_url()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def base_url(self):
+        return self.url
+
+    def use_for_jira(self):
+        """Points JiraInstance at this stand-in instead of api.atlassian.com"""
+        JiraInstance.BASE_RESOURCE_URL = f"{self.base_url()}/oauth/token/accessible-resources"
+        JiraInstance.BASE_API_URL = f"{self.base_url()}/ex/jira"
+
+    def total_calls(self):
+        with self.lock:
+            return sum(self.calls.values())
+
+    # Behaviour
+
+    def over_rate_limit(self):
+        """Counts the call against the current one second window, returning True if it's over the limit"""
+        if self.rate_limit is None:
+            return False
+        with self.lock:
+            now = int(time.monotonic())
+            if now != self.window_start:
+                self.window_start = now
+                self.window_calls = 0
+            self.window_calls += 1
+            if self.window_calls <= self.rate_limit:
+                return False
+            self.throttled += 1
+            return True
+
+    def simulate_conditions(self):
+        """Sleeps for the configured latency, and returns True if this call should fail"""
+        delay = self.latency_ms + self.random.uniform(0, self.latency_jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+        return self.random.random() < self.error_rate
+
+    def route(self, method, path, body):
+        """Handles one API call, returning (status code, JSON body, extra headers)"""
+        site_prefix = f"/ex/jira/{self.site_id}/rest/api/2/"
+        if method == "GET" and path == "/oauth/token/accessible-resources":
+            endpoint = "accessible-resources"
+        elif path.startswith(site_prefix):
+            endpoint = path[len(site_prefix):]
+        else:
+            return 404, {"errorMessages": [f"No route for {path}"]}, {}
+        transitions = ISSUE_TRANSITIONS.match(endpoint)
+
+        with self.lock:
+            # Per issue endpoints are counted together
+            self.calls["issue/transitions" if transitions else endpoint] += 1
+        if self.over_rate_limit():
+            return 429, {"errorMessages": ["Rate limit exceeded."]}, {"Retry-After": "1"}
+        if self.simulate_conditions():
+            return 500, {"errorMessages": ["Stand-in error"]}, {}
+
+        if endpoint == "accessible-resources":
+            return 200, [{"id": self.site_id, "name": "local", "url": self.base_url(),
+                          "scopes": ["read:jira-work", "write:jira-work"]}], {}
+        if method == "GET" and endpoint == "issue/createmeta":
+            return self.create_meta(body)
+        if method == "POST" and endpoint == "search":
+            return self.search(body)
+        if method == "POST" and endpoint == "issue":
+            return self.create(body)
+        if method == "POST" and endpoint == "issue/bulk":
+            return self.bulk_create(body)
+        if transitions and method == "GET":
+            return self.list_transitions(transitions.group(1))
+        if transitions and method == "POST":
+            return self.transition(transitions.group(1), body)
+        return 404, {"errorMessages": [f"No route for {path}"]}, {}
+
+    def search(self, body):
+        clauses = parse_jql(body.get("jql", ""))
+        with self.lock:
+            matches = [issue for issue in self.issues if matches_jql(issue, clauses, self.project_key)]
+        start_at = body.get("startAt", 0)
+        max_results = body.get("maxResults", 50)
+        fields = body.get("fields", ["*navigable"])
+        page = matches[start_at:start_at + max_results]
+        return 200, {
+            "expand": "schema,names",
+            "startAt": start_at,
+            "maxResults": max_results,
+            "total": len(matches),
+            "issues": [self.render_issue(issue, fields) for issue in page],
+        }, {}
+
+    def render_issue(self, issue, fields):
+        """Renders an issue the way the search API does, with only the requested fields"""
+        everything = "*all" in fields or "*navigable" in fields
+        rendered = {}
+        if everything or "summary" in fields:
+            rendered["summary"] = issue["summary"]
+        if everything or "status" in fields:
+            rendered["status"] = {
+                "self": f"{self.base_url()}/rest/api/2/status/1",
+                "description": "",
+                "iconUrl": f"{self.base_url()}/images/icons/statuses/open.png",
+                "name": issue["status"],
+                "id": str(STATUSES.index(issue["status"]) + 1) if issue["status"] in STATUSES else "0",
+                "statusCategory": {"self": f"{self.base_url()}/rest/api/2/statuscategory/2", "id": 2,
+                                   "key": "new", "colorName": "blue-gray", "name": issue["status"]},
+            }
+        if everything or "issuetype" in fields:
+            rendered["issuetype"] = {"self": f"{self.base_url()}/rest/api/2/issuetype/10001", "id": "10001",
+                                     "name": issue["issuetype"], "subtask": False,
+                                     "iconUrl": f"{self.base_url()}/images/icons/task.svg"}
+        if everything or "assignee" in fields:
+            rendered["assignee"] = {
+                "self": f"{self.base_url()}/rest/api/2/user?accountId=local",
+                "accountId": "local",
+                "avatarUrls": {size: f"{self.base_url()}/avatar/{size}.png"
+                               for size in ("48x48", "24x24", "16x16", "32x32")},
+                "displayName": "Local User",
+                "active": True,
+                "timeZone": "Europe/London",
+                "accountType": "atlassian",
+            }
+        if everything or "project" in fields:
+            rendered["project"] = {"self": f"{self.base_url()}/rest/api/2/project/{PROJECT_ID}", "id": PROJECT_ID,
+                                   "key": self.project_key, "name": "Personal To Do"}
+        if everything or "updated" in fields:
+            rendered["updated"] = issue["updated"]
+        if everything or "created" in fields:
+            rendered["created"] = issue["created"]
+        return {
+            "expand": "operations,versionedRepresentations,editmeta,changelog,renderedFields",
+            "id": issue["id"],
+            "self": f"{self.base_url()}/rest/api/2/issue/{issue['id']}",
+            "key": issue["key"],
+            "fields": rendered,
+        }
+
+    def create_meta(self, query):
+        """Describes the project and its issue types, by id, with the fields a create needs"""
+        project_keys = query.get("projectKeys", self.project_key).split(",")
+        type_names = query.get("issuetypeNames", ",".join(ISSUE_TYPE_IDS)).split(",")
+        if self.project_key not in project_keys:
+            return 200, {"expand": "projects", "projects": []}, {}
+        required = {"required": True, "hasDefaultValue": False}
+        issue_types = [{
+            "id": ISSUE_TYPE_IDS[name], "name": name, "subtask": False,
+            "fields": {
+                "summary": dict(required, key="summary", name="Summary"),
+                "issuetype": dict(required, key="issuetype", name="Issue Type"),
+                "project": dict(required, key="project", name="Project"),
+                "reporter": {"required": True, "hasDefaultValue": True, "key": "reporter", "name": "Reporter"},
+                "description": {"required": False, "hasDefaultValue": False, "key": "description",
+                                "name": "Description"},
+            },
+        } for name in type_names if name in ISSUE_TYPE_IDS]
+        return 200, {"expand": "projects", "projects": [
+            {"id": PROJECT_ID, "key": self.project_key, "name": "Personal To Do", "issuetypes": issue_types}
+        ]}, {}
+
+    def create_one(self, update):
+        """Validates and stores one issue from a create payload, returning (created issue, error)"""
+        fields = update.get("fields", {})
+        project = fields.get("project", {})
+        issue_type = fields.get("issuetype", {})
+        type_names = {type_id: name for name, type_id in ISSUE_TYPE_IDS.items()}
+        if project.get("key", self.project_key) != self.project_key or project.get("id", PROJECT_ID) != PROJECT_ID \
+                or not fields.get("summary"):
+            return None, {"summary": "Summary and a valid project are required"}
+        if "id" in issue_type and issue_type["id"] not in type_names:
+            return None, {"issuetype": "Specify a valid issue type"}
+        issue = self.new_issue(fields["summary"],
+                               issue_type=type_names.get(issue_type.get("id"), issue_type.get("name", "Task")))
+        with self.lock:
+            self.issues.append(issue)
+        self.record_event("jira:issue_created", issue)
+        return {"id": issue["id"], "key": issue["key"],
+                "self": f"{self.base_url()}/rest/api/2/issue/{issue['id']}"}, None
+
+    def create(self, body):
+        created, error = self.create_one(body)
+        if error is not None:
+            return 400, {"errorMessages": [], "errors": error}, {}
+        return 201, created, {}
+
+    def bulk_create(self, body):
+        issues = []
+        errors = []
+        for index, update in enumerate(body.get("issueUpdates", [])):
+            created, error = self.create_one(update)
+            if error is not None:
+                errors.append({"status": 400, "elementErrors": {"errorMessages": [], "errors": error},
+                               "failedElementNumber": index})
+            else:
+                issues.append(created)
+        return (201 if not errors else 400), {"issues": issues, "errors": errors}, {}
+
+
+    def find_issue(self, issue_key):
+        with self.lock:
+            return next((issue for issue in self.issues if issue["key"] == issue_key), None)
+
+    def list_transitions(self, issue_key):
+        issue = self.find_issue(issue_key)
+        if issue is None:
+            return 404, {"errorMessages": ["Issue does not exist or you do not have permission to see it."]}, {}
+        return 200, {"expand": "transitions", "transitions": [
+            {"id": transition_id, "name": name, "hasScreen": False, "isGlobal": True, "isInitial": False,
+             "isAvailable": True, "isConditional": False,
+             "to": {"self": f"{self.base_url()}/rest/api/2/status/{STATUSES.index(status) + 1}",
+                    "name": status, "id": str(STATUSES.index(status) + 1)}}
+            for transition_id, (name, status) in TRANSITIONS.items() if status != issue["status"]
+        ]}, {}
+
+    def transition(self, issue_key, body):
+        issue = self.find_issue(issue_key)
+        if issue is None:
+            return 404, {"errorMessages": ["Issue does not exist or you do not have permission to see it."]}, {}
+        transition_id = body.get("transition", {}).get("id")
+        if transition_id not in TRANSITIONS or TRANSITIONS[transition_id][1] == issue["status"]:
+            return 400, {"errorMessages": [f"Transition id '{transition_id}' is not valid for this issue."]}, {}
+        with self.lock:
+            issue["status"] = TRANSITIONS[transition_id][1]
+            issue["updated"] = jira_now()
+        self.record_event("jira:issue_updated", issue)
+        return 204, None, {}
+
+    # Changes made in Jira itself rather than through the API, for webhook testing
+
+    def edit_issue(self, issue_key, summary):
+        issue = self.find_issue(issue_key)
+        with self.lock:
+            issue["summary"] = summary
+            issue["updated"] = jira_now()
+        self.record_event("jira:issue_updated", issue)
+
+    def delete_issue(self, issue_key):
+        issue = self.find_issue(issue_key)
+        with self.lock:
+            self.issues.remove(issue)
+        self.record_event("jira:issue_deleted", issue)
+
+    def record_event(self, event_name, issue):
+        """Records the webhook payload Jira would send for a change to an issue"""
+        if not self.record_webhooks:
+            return
+        payload = {
+            "timestamp": int(time.time() * 1000),
+            "webhookEvent": event_name,
+            "issue_event_type_name": {"jira:issue_created": "issue_created",
+                                      "jira:issue_deleted": "issue_deleted"}.get(event_name, "issue_generic"),
+            "user": {"accountId": "local", "displayName": "Local User"},
+            "issue": self.render_issue(issue, ["*all"]),
+        }
+        with self.lock:
+            self.webhook_events.append(payload)
+
+
+def parse_jql(jql):
+    """Splits the simple AND-only JQL the skill sends into (field, operator, value) clauses"""
+    jql = re.split(r"\s+ORDER\s+BY\s+", jql, flags=re.IGNORECASE)[0]
+    clauses = []
+    for part in re.split(r"\s+AND\s+", jql, flags=re.IGNORECASE):
+        match = JQL_CLAUSE.match(part)
+        if match:
+            clauses.append((match.group(1).lower(), match.group(2), match.group(3)))
+    return clauses
+
+
+def parse_time(value):
+    """Parses Jira's stored timestamp, a JQL date, such as "2020/01/01 09:00", or a relative date like -15m"""
+    relative = RELATIVE_TIME.match(value)
+    if relative:
+        seconds = int(relative.group(1)) * RELATIVE_UNITS[relative.group(2)]
+        return datetime.now(timezone.utc) - timedelta(seconds=seconds)
+    for time_format in (JIRA_TIME_FORMAT, "%Y/%m/%d %H:%M", "%Y-%m-%d %H:%M", "%Y/%m/%d", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(value, time_format)
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    return datetime.min.replace(tzinfo=timezone.utc)
+
+
+def matches_jql(issue, clauses, project_key):
+    """Applies parsed JQL clauses to an issue record"""
+    for field, operator, value in clauses:
+        if field == "project":
+            actual = PROJECT_ID if value == PROJECT_ID else project_key
+        elif field in ("type", "issuetype"):
+            actual = ISSUE_TYPE_IDS.get(issue["issuetype"]) if value.isdigit() else issue["issuetype"]
+        elif field in ("status", "summary", "key"):
+            actual = issue[field]
+        elif field in ("updated", "created"):
+            actual, value = parse_time(issue[field]), parse_time(value)
+        else:
+            continue
+        if operator == "=" and actual != value:
+            return False
+        if operator == "!=" and actual == value:
+            return False
+        if operator == ">=" and not actual >= value:
+            return False
+        if operator == ">" and not actual > value:
+            return False
+        if operator == "<=" and not actual <= value:
+            return False
+        if operator == "<" and not actual < value:
+            return False
+    return True
+
+
+def make_handler(stand_in):
+    """Builds the request handler class bound to a stand-in"""
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self.dispatch("GET")
+
+        def do_POST(self):
+            self.dispatch("POST")
+
+        def do_PUT(self):
+            self.dispatch("PUT")
+
+        def do_DELETE(self):
+            self.dispatch("DELETE")
+
+        def dispatch(self, method):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw_body = self.rfile.read(length) if length else b""
+            body = json.loads(raw_body) if raw_body else {}
+            path, _, query = self.path.partition("?")
+            if method == "GET":
+                # GET endpoints take their parameters from the query string instead
+                body = {name: values[-1] for name, values in parse_qs(query).items()}
+            status_code, response_json, headers = stand_in.route(method, path, body)
+
+            payload = json.dumps(response_json).encode("utf-8") if response_json is not None else b""
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StandInHandler
+
+
+# Run the stand-in on its own, for pointing a local skill or a tool like Postman at it
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a local Jira stand-in server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--issues", type=int, default=50, help="number of generated issues")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with a 500")
+    parser.add_argument("--rate-limit", type=int, help="calls a second before answering 429")
+    args = parser.parse_args()
+
+    server = JiraStandIn(args.issues, args.latency_ms, args.jitter_ms, args.error_rate, rate_limit=args.rate_limit)
+    print(f"Jira stand-in on {server.start(port=args.port)}, site {server.site_id}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -4,20 +4,127 @@ import logging
 
 import ask_sdk_core.utils as ask_utils
 from ask_sdk_core.dispatch_components import (AbstractRequestHandler, AbstractExceptionHandler,
-                                              AbstractRequestInterceptor)
+                                              AbstractRequestInterceptor, AbstractResponseInterceptor)
 from ask_sdk_core.handler_input import HandlerInput
 from ask_sdk_core.skill_builder import SkillBuilder
 from ask_sdk_model import Response
 from ask_sdk_core.utils.request_util import get_slot
 
 import json
-
-from alexa_jira_helper import AlexaJiraHelper
+import os
+from types import MappingProxyType
+
+from alexa_jira_helper import AlexaJiraHelper, split_task_names, spoken_task_names
+from deadline import Deadline
+from speech import escape_ssml, speech_summaries
+from metrics import InvocationMetrics
+import persistence
 import prompts
+import warmup
+import webhooks
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# Localized strings stored in language_strings.json, next to this module
+LANGUAGE_STRINGS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "language_strings.json")
+DEFAULT_LANGUAGE = "en"
+
+# Session attribute holding the rest of a list being read out a page at a time
+LIST_CURSOR = "list_cursor"
+# Session attribute holding the Tasks, named ambiguously, still to be confirmed before marking them done
+CONFIRM_TASKS = "confirm_tasks"
+# Session attribute holding a spoken task that may have been a list, until the user says which it was
+CONFIRM_SPLIT = "confirm_split"
+
+
+def load_language_table(file_name=LANGUAGE_STRINGS_FILE):
+    """Parses the language strings once into read only tables, with each locale already merged over its
+    broader language and the default language"""
+    with open(file_name) as language_prompts:
+        language_data = json.load(language_prompts)
+
+    default_strings = language_data[DEFAULT_LANGUAGE]
+    table = {}
+    for locale, strings in language_data.items():
+        # example: "fr-CA" is built from the default strings, then "fr", then "fr-CA" itself
+        data = dict(default_strings)
+        data.update(language_data.get(locale[:2], {}))
+        data.update(strings)
+        table[locale] = MappingProxyType(data)
+    return MappingProxyType(table)
+
+
+def get_language_strings(locale):
+    """Returns the strings for a locale, falling back to its broader language and then the default language"""
+    if locale:
+        data = LANGUAGE_TABLE.get(locale) or LANGUAGE_TABLE.get(locale[:2])
+        if data is not None:
+            return data
+    return LANGUAGE_TABLE[DEFAULT_LANGUAGE]
+
+
+LANGUAGE_TABLE = load_language_table()
+
+
+def jira_helper(handler_input, access_token):
+    """Creates the Jira helper for this request, bound to its deadline, metrics and the user's snapshot"""
+    request_attributes = handler_input.attributes_manager.request_attributes
+    deadline = Deadline.from_context(handler_input.context)
+    user_id = user_id_of(handler_input)
+    helper = AlexaJiraHelper(access_token, deadline, request_attributes.get("metrics"),
+                             request_attributes.get("snapshot"),
+                             persistence.user_key(user_id) if user_id is not None else None)
+    # Kept so the snapshot interceptor can save what this request learnt
+    request_attributes["jira_helper"] = helper
+    return helper
+
+
+def user_id_of(handler_input):
+    """Returns the Alexa user id of the request, if it has one"""
+    system = handler_input.request_envelope.context.system if handler_input.request_envelope.context else None
+    return system.user.user_id if system is not None and system.user is not None else None
+
+
+def emit_metrics(handler_input, error=None):
+    """Writes this request's metrics line, if the metrics interceptor started one"""
+    metrics = handler_input.attributes_manager.request_attributes.get("metrics")
+    if metrics is not None:
+        if error is not None:
+            metrics.add("Errors", 1)
+            metrics.set_property("Error", type(error).__name__)
+        metrics.emit()
+
+
+def list_page_response(handler_input, speak_output, cursor):
+    """Speaks a page of a list. If there's more, the cursor is kept in the session and the session left open
+    for the user to ask for the next page"""
+    data = handler_input.attributes_manager.request_attributes["_"]
+    session_attributes = handler_input.attributes_manager.session_attributes
+    if cursor is None:
+        session_attributes.pop(LIST_CURSOR, None)
+        return handler_input.response_builder.speak(speak_output).response
+
+    session_attributes[LIST_CURSOR] = cursor
+    remaining = len(cursor["items"]) + cursor["total"] - cursor["start_at"]
+    speak_output = f"{speak_output.rstrip()} {data[prompts.LIST_MORE_1]} {remaining} {data[prompts.LIST_MORE_2]}"
+    return (
+        handler_input.response_builder
+        .speak(speak_output)
+        .ask(data[prompts.LIST_MORE_REPROMPT])
+        .response
+    )
+
+
+def stale_answer(data, speak_output):
+    """Prefixes an answer given from the last known results, e.g. "Last I checked, you have 7 items..." """
+    return f"{data[prompts.STALE_ANSWER]} {speak_output[:1].lower()}{speak_output[1:]}"
+
+
+def more_words(data):
+    """The words around the count that ends a list cut short, e.g. ("And", "more.")"""
+    return data[prompts.SUMMARIES_MORE_1], data[prompts.SUMMARIES_MORE_2]
+
 
 class LaunchRequestHandler(AbstractRequestHandler):
     """Handler for Skill Launch."""
@@ -36,11 +143,10 @@ class LaunchRequestHandler(AbstractRequestHandler):
         # Must have linked to Jira account before using the skill
         user = handler_input.request_envelope.session.user
         if user.access_token is None:
-            print("Access token not found")
+            logger.info("Access token not found")
             speak_output = data[prompts.ERROR_NOT_LINKED]
         else:
-            print("Access token found")
-            print(user.access_token)
+            logger.info("Access token found")
             speak_output = data[prompts.WELCOME]
         return (
             handler_input.response_builder
@@ -62,6 +168,7 @@ class CatchAccountLinkingErrorHandler(AbstractExceptionHandler):
     def handle(self, handler_input, exception):
         # type: (HandlerInput, Exception) -> Response
         logger.info("In CatchAccountLinkingErrorHandler")
+        emit_metrics(handler_input, exception)
 
         # Get localised strings
         data = handler_input.attributes_manager.request_attributes["_"]
@@ -70,6 +177,45 @@ class CatchAccountLinkingErrorHandler(AbstractExceptionHandler):
         return handler_input.response_builder.response
 
 
+def add_tasks_speech(handler_input, access_token, task_names):
+    """Creates the named tasks, one or several, returning what to say about how that went"""
+    data = handler_input.attributes_manager.request_attributes["_"]
+    task_names = [task_name.capitalize() for task_name in task_names]
+    logger.info(f"Adding {len(task_names)} tasks")
+
+    # Call the Jira function API
+    jira_handler = jira_helper(handler_input, access_token)
+
+    available = jira_handler.connected or jira_handler.degraded
+    if available and len(task_names) == 1:
+        ret_status, issue_id = jira_handler.add_new_todo_task(task_names[0])
+        logger.info(f"Return status: {ret_status}")
+        if not ret_status:
+            return data[prompts.ERROR_UNKNOWN]
+        if jira_handler.queued:
+            return data[prompts.TASK_QUEUED]
+        return f"{data[prompts.TASK_CREATED]} {issue_id}"
+    if not available or not task_names:
+        return data[prompts.ERROR_UNKNOWN]
+
+    # Several tasks in one go, created with a single bulk call
+    ret_status, results = jira_handler.add_new_todo_tasks(task_names)
+    logger.info(f"Return status: {ret_status}")
+    created = [issue_id for ok, issue_id in results if ok] if ret_status else []
+    failed = [task_name for task_name, (ok, issue_id) in zip(task_names, results) if not ok] \
+        if ret_status else task_names
+    if ret_status and jira_handler.queued:
+        return data[prompts.TASK_QUEUED]
+    if not created:
+        return data[prompts.ERROR_UNKNOWN]
+    speak_output = (f"{data[prompts.TASKS_CREATED_1]} {len(created)} "
+                    f"{data[prompts.TASKS_CREATED_2]} {', '.join(created)}.")
+    if failed:
+        failed = [escape_ssml(task_name) for task_name in failed]
+        speak_output += f" {data[prompts.TASKS_FAILED]} {', '.join(failed)}."
+    return speak_output
+
+
 class AddNewTaskIntentHandler(AbstractRequestHandler):
     """Handler for Add New Task Intent."""
 
@@ -90,19 +236,55 @@ class AddNewTaskIntentHandler(AbstractRequestHandler):
             speak_output = data[prompts.ERROR_NOT_LINKED]
         else:
             task_name_slot = get_slot(handler_input, "taskName")
-            task_name = task_name_slot.value.capitalize()
-            print(f"Got task name {task_name} from slot")
+            utterance = task_name_slot.value or ""
+            spoken_names = spoken_task_names(utterance)
+            if spoken_names is not None:
+                # Said without pauses Alexa would punctuate, so check whether it was one task or several
+                handler_input.attributes_manager.session_attributes[CONFIRM_SPLIT] = {
+                    "task": utterance, "tasks": spoken_names}
+                names = ", ".join(escape_ssml(task_name) for task_name in spoken_names)
+                question = (f"{data[prompts.TASKS_SPLIT_1]} {len(spoken_names)} {data[prompts.TASKS_SPLIT_2]} "
+                            f"{names}{data[prompts.TASKS_SPLIT_3]}")
+                return handler_input.response_builder.speak(question).ask(question).response
+            speak_output = add_tasks_speech(handler_input, access_token, split_task_names(utterance))
+        return (
+            handler_input.response_builder
+            .speak(speak_output)
+            .response
+        )
+
+
+class GetToDoCountIntentHandler(AbstractRequestHandler):
+    """Handler for Add New Task Intent."""
+
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return ask_utils.is_intent_name("GetToDoCountIntent")(handler_input)
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+
+        # Get localised strings
+        data = handler_input.attributes_manager.request_attributes["_"]
 
+        # We like to keep an eye on the access_token, just in case it expires or fails to refresh
+        user = handler_input.request_envelope.session.user
+        access_token = user.access_token
+        if access_token is None:
+            speak_output = data[prompts.ERROR_NOT_LINKED]
+        else:
             # Call the Jira function API
-            jira_handler = AlexaJiraHelper(access_token)
+            jira_handler = jira_helper(handler_input, access_token)
 
-            if jira_handler.connected:
-                ret_status, issue_id = jira_handler.add_new_todo_task(task_name)
-                print(f"Return status: {ret_status}")
+            if jira_handler.connected or jira_handler.degraded:
+                ret_status, count = jira_handler.todo_task_count()
+                logger.info(f"Return status: {ret_status}")
                 if not ret_status:
                     speak_output = data[prompts.ERROR_UNKNOWN]
                 else:
-                    speak_output = f"{data[prompts.TASK_CREATED]} {issue_id}"
+                    speak_output = f"{data[prompts.TASK_COUNT_1]} {count} {data[prompts.TASK_COUNT_2]}"
+                    if jira_handler.stale:
+                        speak_output = stale_answer(data, speak_output)
             else:
                 speak_output = data[prompts.ERROR_UNKNOWN]
         return (
@@ -112,12 +294,12 @@ class AddNewTaskIntentHandler(AbstractRequestHandler):
         )
 
 
-class GetToDoCountIntentHandler(AbstractRequestHandler):
+class GetToDoListIntentHandler(AbstractRequestHandler):
     """Handler for Add New Task Intent."""
 
     def can_handle(self, handler_input):
         # type: (HandlerInput) -> bool
-        return ask_utils.is_intent_name("GetToDoCountIntent")(handler_input)
+        return ask_utils.is_intent_name("GetToDoListIntent")(handler_input)
 
     def handle(self, handler_input):
         # type: (HandlerInput) -> Response
@@ -132,15 +314,18 @@ class GetToDoCountIntentHandler(AbstractRequestHandler):
             speak_output = data[prompts.ERROR_NOT_LINKED]
         else:
             # Call the Jira function API
-            jira_handler = AlexaJiraHelper(access_token)
+            jira_handler = jira_helper(handler_input, access_token)
 
-            if jira_handler.connected:
-                ret_status, count = jira_handler.todo_task_count()
-                print(f"Return status: {ret_status}")
+            if jira_handler.connected or jira_handler.degraded:
+                ret_status, task_summaries, cursor = jira_handler.todo_task_page()
+                logger.info(f"Return status: {ret_status}")
                 if not ret_status:
                     speak_output = data[prompts.ERROR_UNKNOWN]
                 else:
-                    speak_output = f"{data[prompts.TASK_COUNT_1]} {count} {data[prompts.TASK_COUNT_2]}"
+                    speak_output = f"{data[prompts.TASK_LIST]} {speech_summaries(task_summaries)}"
+                    if jira_handler.stale:
+                        speak_output = stale_answer(data, speak_output)
+                    return list_page_response(handler_input, speak_output, cursor)
             else:
                 speak_output = data[prompts.ERROR_UNKNOWN]
         return (
@@ -150,12 +335,105 @@ class GetToDoCountIntentHandler(AbstractRequestHandler):
         )
 
 
-class GetToDoListIntentHandler(AbstractRequestHandler):
-    """Handler for Add New Task Intent."""
+class ReadMoreIntentHandler(AbstractRequestHandler):
+    """Handler for Read More Intent, continuing a list from the session."""
 
     def can_handle(self, handler_input):
         # type: (HandlerInput) -> bool
-        return ask_utils.is_intent_name("GetToDoListIntent")(handler_input)
+        return ask_utils.is_intent_name("ReadMoreIntent")(handler_input)
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+
+        # Get localised strings
+        data = handler_input.attributes_manager.request_attributes["_"]
+
+        # We like to keep an eye on the access_token, just in case it expires or fails to refresh
+        user = handler_input.request_envelope.session.user
+        access_token = user.access_token
+        cursor = handler_input.attributes_manager.session_attributes.get(LIST_CURSOR)
+        if access_token is None:
+            speak_output = data[prompts.ERROR_NOT_LINKED]
+        elif cursor is None:
+            speak_output = data[prompts.LIST_END]
+        else:
+            # Call the Jira function API, which is only needed if the session has run out of items
+            jira_handler = jira_helper(handler_input, access_token)
+
+            ret_status, task_summaries, cursor = jira_handler.next_task_page(cursor)
+            logger.info(f"Return status: {ret_status}")
+            if not ret_status:
+                speak_output = data[prompts.ERROR_UNKNOWN]
+            elif not task_summaries:
+                speak_output = data[prompts.LIST_END]
+            else:
+                return list_page_response(handler_input, speech_summaries(task_summaries), cursor)
+        handler_input.attributes_manager.session_attributes.pop(LIST_CURSOR, None)
+        return (
+            handler_input.response_builder
+            .speak(speak_output)
+            .response
+        )
+
+
+class GetDailyBriefingIntentHandler(AbstractRequestHandler):
+    """Handler for Get Daily Briefing Intent."""
+
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return ask_utils.is_intent_name("GetDailyBriefingIntent")(handler_input)
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+
+        # Get localised strings
+        data = handler_input.attributes_manager.request_attributes["_"]
+
+        # We like to keep an eye on the access_token, just in case it expires or fails to refresh
+        user = handler_input.request_envelope.session.user
+        access_token = user.access_token
+        if access_token is None:
+            speak_output = data[prompts.ERROR_NOT_LINKED]
+        else:
+            # Call the Jira function API
+            jira_handler = jira_helper(handler_input, access_token)
+
+            if jira_handler.connected or jira_handler.degraded:
+                ret_status, briefing = jira_handler.daily_briefing()
+                logger.info(f"Return status: {ret_status}")
+                if not ret_status:
+                    speak_output = data[prompts.ERROR_UNKNOWN]
+                else:
+                    # Say whatever came back in time
+                    parts = []
+                    if briefing["todo_count"] is not None:
+                        parts.append(f"{data[prompts.TASK_COUNT_1]} {briefing['todo_count']} "
+                                     f"{data[prompts.TASK_COUNT_2]}")
+                    if briefing["in_progress_count"] is not None:
+                        parts.append(f"{data[prompts.TASK_COUNT_1]} {briefing['in_progress_count']} "
+                                     f"{data[prompts.IN_PROGRESS_COUNT]}")
+                    if briefing["todo_summaries"]:
+                        next_up = speech_summaries(briefing["todo_summaries"], total=briefing["todo_count"],
+                                                   more=more_words(data))
+                        parts.append(f"{data[prompts.BRIEFING_NEXT]} {next_up}")
+                    speak_output = " ".join(parts)
+                    if jira_handler.stale:
+                        speak_output = stale_answer(data, speak_output)
+            else:
+                speak_output = data[prompts.ERROR_UNKNOWN]
+        return (
+            handler_input.response_builder
+            .speak(speak_output)
+            .response
+        )
+
+
+class GetStatusSummaryIntentHandler(AbstractRequestHandler):
+    """Handler for Get Status Summary Intent."""
+
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return ask_utils.is_intent_name("GetStatusSummaryIntent")(handler_input)
 
     def handle(self, handler_input):
         # type: (HandlerInput) -> Response
@@ -170,15 +448,23 @@ class GetToDoListIntentHandler(AbstractRequestHandler):
             speak_output = data[prompts.ERROR_NOT_LINKED]
         else:
             # Call the Jira function API
-            jira_handler = AlexaJiraHelper(access_token)
+            jira_handler = jira_helper(handler_input, access_token)
 
-            if jira_handler.connected:
-                ret_status, task_summaries = jira_handler.todo_task_list()
-                print(f"Return status: {ret_status}")
+            if jira_handler.connected or jira_handler.degraded:
+                ret_status, histogram = jira_handler.status_summary()
+                logger.info(f"Return status: {ret_status}")
                 if not ret_status:
                     speak_output = data[prompts.ERROR_UNKNOWN]
+                elif not histogram["total"]:
+                    speak_output = data[prompts.STATUS_SUMMARY_EMPTY]
                 else:
-                    speak_output = f"{data[prompts.TASK_LIST]} {task_summaries}"
+                    # Busiest status first, e.g. "Your project has 16 issues: 10 Complete, 4 To Do, 2 In Progress."
+                    statuses = sorted(histogram["statuses"].items(), key=lambda item: -item[1])
+                    counts = ", ".join(f"{count} {status}" for status, count in statuses)
+                    speak_output = (f"{data[prompts.STATUS_SUMMARY_1]} {histogram['total']} "
+                                    f"{data[prompts.STATUS_SUMMARY_2]} {counts}.")
+                    if jira_handler.stale:
+                        speak_output = stale_answer(data, speak_output)
             else:
                 speak_output = data[prompts.ERROR_UNKNOWN]
         return (
@@ -188,6 +474,154 @@ class GetToDoListIntentHandler(AbstractRequestHandler):
         )
 
 
+def completed_speech(data, results, missing):
+    """What was marked done, what couldn't be and which names matched nothing, as speech"""
+    parts = []
+    if results:
+        done = sum(1 for issue_key, summary, moved in results if moved)
+        parts.append(f"{data[prompts.TASKS_DONE_1]} {done} {data[prompts.TASKS_DONE_2]} {len(results)}.")
+        failed = [escape_ssml(summary) for issue_key, summary, moved in results if not moved]
+        if failed:
+            parts.append(f"{data[prompts.TASKS_NOT_DONE]} {', '.join(failed)}.")
+    if missing:
+        missing = [escape_ssml(spoken_name) for spoken_name in missing]
+        parts.append(f"{data[prompts.TASK_NOT_FOUND]} {', '.join(missing)}.")
+    return " ".join(parts)
+
+
+def confirm_response(handler_input, speak_output, unclear):
+    """Speaks the output, then asks about the first Task left to confirm, keeping the rest in the session. Ends
+    the session if there's nothing to confirm"""
+    data = handler_input.attributes_manager.request_attributes["_"]
+    session_attributes = handler_input.attributes_manager.session_attributes
+    if not unclear:
+        session_attributes.pop(CONFIRM_TASKS, None)
+        return handler_input.response_builder.speak(speak_output or data[prompts.ERROR_UNKNOWN]).response
+
+    session_attributes[CONFIRM_TASKS] = unclear
+    question = f"{data[prompts.TASK_CONFIRM_1]} {escape_ssml(unclear[0]['summary'])}{data[prompts.TASK_CONFIRM_2]}"
+    return (
+        handler_input.response_builder
+        .speak(f"{speak_output} {question}".lstrip())
+        .ask(question)
+        .response
+    )
+
+
+class CompleteTasksIntentHandler(AbstractRequestHandler):
+    """Handler for Complete Tasks Intent and Complete All Tasks Intent."""
+
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return (ask_utils.is_intent_name("CompleteTasksIntent")(handler_input) or
+                ask_utils.is_intent_name("CompleteAllTasksIntent")(handler_input))
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+
+        # Get localised strings
+        data = handler_input.attributes_manager.request_attributes["_"]
+
+        # We like to keep an eye on the access_token, just in case it expires or fails to refresh
+        user = handler_input.request_envelope.session.user
+        access_token = user.access_token
+        if access_token is None:
+            speak_output = data[prompts.ERROR_NOT_LINKED]
+        else:
+            task_name_slot = get_slot(handler_input, "taskName")
+            task_names = split_task_names(task_name_slot.value or "")
+            # Only "complete all my ... tasks" marks every Task a name matches, otherwise each name is one Task
+            match_all = ask_utils.is_intent_name("CompleteAllTasksIntent")(handler_input)
+
+            # Call the Jira function API
+            jira_handler = jira_helper(handler_input, access_token)
+
+            ret_status, results, missing, unclear = jira_handler.complete_tasks(task_names, match_all)
+            logger.info(f"Return status: {ret_status}")
+            if not ret_status:
+                speak_output = data[prompts.ERROR_UNKNOWN]
+            else:
+                unclear = [{"key": record["key"], "summary": record["summary"]} for record in unclear]
+                return confirm_response(handler_input, completed_speech(data, results, missing), unclear)
+        return (
+            handler_input.response_builder
+            .speak(speak_output)
+            .response
+        )
+
+
+class ConfirmTaskIntentHandler(AbstractRequestHandler):
+    """Handler for Yes and No Intents, answering whether a Task named ambiguously is the one meant."""
+
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return ((ask_utils.is_intent_name("AMAZON.YesIntent")(handler_input) or
+                 ask_utils.is_intent_name("AMAZON.NoIntent")(handler_input)) and
+                bool(handler_input.attributes_manager.session_attributes.get(CONFIRM_TASKS)))
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+
+        # Get localised strings
+        data = handler_input.attributes_manager.request_attributes["_"]
+
+        unclear = handler_input.attributes_manager.session_attributes[CONFIRM_TASKS]
+        task = unclear.pop(0)
+
+        # We like to keep an eye on the access_token, just in case it expires or fails to refresh
+        user = handler_input.request_envelope.session.user
+        access_token = user.access_token
+        if access_token is None:
+            speak_output = data[prompts.ERROR_NOT_LINKED]
+            unclear = []
+        elif ask_utils.is_intent_name("AMAZON.NoIntent")(handler_input):
+            speak_output = data[prompts.TASK_CONFIRM_NO]
+        else:
+            # Call the Jira function API
+            jira_handler = jira_helper(handler_input, access_token)
+
+            ret_status, results = jira_handler.complete_task(task["key"])
+            logger.info(f"Return status: {ret_status}")
+            if not ret_status:
+                speak_output = data[prompts.ERROR_UNKNOWN]
+            else:
+                speak_output = completed_speech(data, results, [] if results else [task["summary"]])
+        return confirm_response(handler_input, speak_output, unclear)
+
+
+class ConfirmTaskSplitIntentHandler(AbstractRequestHandler):
+    """Handler for Yes and No Intents, answering whether a task that may have been a list was several tasks."""
+
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return ((ask_utils.is_intent_name("AMAZON.YesIntent")(handler_input) or
+                 ask_utils.is_intent_name("AMAZON.NoIntent")(handler_input)) and
+                CONFIRM_SPLIT in handler_input.attributes_manager.session_attributes)
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+
+        # Get localised strings
+        data = handler_input.attributes_manager.request_attributes["_"]
+
+        confirm = handler_input.attributes_manager.session_attributes.pop(CONFIRM_SPLIT)
+
+        # We like to keep an eye on the access_token, just in case it expires or fails to refresh
+        user = handler_input.request_envelope.session.user
+        access_token = user.access_token
+        if access_token is None:
+            speak_output = data[prompts.ERROR_NOT_LINKED]
+        else:
+            several = ask_utils.is_intent_name("AMAZON.YesIntent")(handler_input)
+            task_names = confirm["tasks"] if several else [confirm["task"]]
+            speak_output = add_tasks_speech(handler_input, access_token, task_names)
+        return (
+            handler_input.response_builder
+            .speak(speak_output)
+            .response
+        )
+
+
 class HelpIntentHandler(AbstractRequestHandler):
     """Handler for Help Intent."""
 
@@ -275,20 +709,62 @@ class LocalizationInterceptor(AbstractRequestInterceptor):
 
     def process(self, handler_input):
         locale = handler_input.request_envelope.request.locale
-        logger.info("Locale is {}".format(locale[:2]))
+        logger.info("Locale is {}".format(locale))
+
+        # Strings are parsed and merged once at import, so this is just a lookup
+        handler_input.attributes_manager.request_attributes["_"] = get_language_strings(locale)
+
+
+class MetricsRequestInterceptor(AbstractRequestInterceptor):
+    """Starts timing the request, and makes its metrics available to the handlers."""
+
+    def process(self, handler_input):
+        if ask_utils.is_request_type("IntentRequest")(handler_input):
+            name = ask_utils.get_intent_name(handler_input)
+        else:
+            name = ask_utils.get_request_type(handler_input)
+        metrics = InvocationMetrics(name)
+        metrics.set_property("RequestId", handler_input.request_envelope.request.request_id)
+        handler_input.attributes_manager.request_attributes["metrics"] = metrics
+
+
+class SnapshotRequestInterceptor(AbstractRequestInterceptor):
+    """Loads the user's saved snapshot, so a cold container doesn't start from nothing."""
 
-        # Localized strings stored in language_strings.json
-        with open("language_strings.json") as language_prompts:
-            language_data = json.load(language_prompts)
+    def process(self, handler_input):
+        if persistence.snapshot_store is None:
+            return
+        # Let a write left unfinished when the container was frozen complete first
+        persistence.wait_for_pending_save()
+        user_id = user_id_of(handler_input)
+        if user_id is None or handler_input.request_envelope.context.system.user.access_token is None:
+            return
+        metrics = handler_input.attributes_manager.request_attributes.get("metrics")
+        with metrics.span("SnapshotLoad"):
+            snapshot = persistence.load_snapshot(persistence.user_key(user_id))
+        handler_input.attributes_manager.request_attributes["snapshot"] = snapshot
+
+
+class SnapshotResponseInterceptor(AbstractResponseInterceptor):
+    """Saves the user's snapshot in the background, after the response is built."""
+
+    def process(self, handler_input, response):
+        helper = handler_input.attributes_manager.request_attributes.get("jira_helper")
+        user_id = user_id_of(handler_input)
+        if helper is None or user_id is None:
+            return
+        snapshot = helper.build_snapshot()
+        if snapshot is not None and snapshot != handler_input.attributes_manager.request_attributes.get("snapshot"):
+            persistence.save_snapshot_async(persistence.user_key(user_id), snapshot)
+        if helper.connected:
+            warmup.note_active(user_id, helper.jira_instance.access_token)
+
+
+class MetricsResponseInterceptor(AbstractResponseInterceptor):
+    """Writes one structured metrics line per request, once the response is ready."""
 
-        # Set default translation data to broader translation
-        data = language_data[locale[:2]]
-        # If a more specialized translation exists, then select it instead
-        # example: "fr-CA" will pick "fr" translations first, but if "fr-CA" translation exists,
-        #          then pick that instead
-        if locale in language_data:
-            data.update(language_data[locale])
-        handler_input.attributes_manager.request_attributes["_"] = data
+    def process(self, handler_input, response):
+        emit_metrics(handler_input)
 
 
 class CatchAllExceptionHandler(AbstractExceptionHandler):
@@ -304,6 +780,7 @@ class CatchAllExceptionHandler(AbstractExceptionHandler):
     def handle(self, handler_input, exception):
         # type: (HandlerInput, Exception) -> Response
         logger.error(exception, exc_info=True)
+        emit_metrics(handler_input, exception)
 
         speak_output = "Sorry, I had trouble doing what you asked. Please try again."
 
@@ -325,12 +802,42 @@ sb.add_request_handler(LaunchRequestHandler())
 sb.add_request_handler(AddNewTaskIntentHandler())
 sb.add_request_handler(GetToDoCountIntentHandler())
 sb.add_request_handler(GetToDoListIntentHandler())
+sb.add_request_handler(GetDailyBriefingIntentHandler())
+sb.add_request_handler(ReadMoreIntentHandler())
+sb.add_request_handler(CompleteTasksIntentHandler())
+sb.add_request_handler(ConfirmTaskIntentHandler())
+sb.add_request_handler(ConfirmTaskSplitIntentHandler())
+sb.add_request_handler(GetStatusSummaryIntentHandler())
 sb.add_request_handler(HelpIntentHandler())
 sb.add_request_handler(CancelOrStopIntentHandler())
 sb.add_request_handler(SessionEndedRequestHandler())
 sb.add_request_handler(IntentReflectorHandler())
+sb.add_global_request_interceptor(MetricsRequestInterceptor())
 sb.add_global_request_interceptor(LocalizationInterceptor())
+sb.add_global_request_interceptor(SnapshotRequestInterceptor())
+sb.add_global_response_interceptor(SnapshotResponseInterceptor())
+sb.add_global_response_interceptor(MetricsResponseInterceptor())
 sb.add_exception_handler(CatchAccountLinkingErrorHandler())
 sb.add_exception_handler(CatchAllExceptionHandler())
 
-lambda_handler = sb.lambda_handler()
+skill_handler = sb.lambda_handler()
+
+
+def webhook_handler(event, context):
+    """Entry point for Jira webhooks, posted to the function URL"""
+    return webhooks.handle_webhook(event)
+
+
+def warmup_handler(event, context):
+    """Entry point for the scheduled warm up, and the pings it sends to warm more containers"""
+    return warmup.handle_scheduled(event, context)
+
+
+def lambda_handler(event, context):
+    """Entry point for Alexa requests. Jira webhooks and the scheduled warm up are routed here too, so they
+    update and warm the same containers that answer the skill's requests"""
+    if warmup.is_scheduled(event):
+        return warmup_handler(event, context)
+    if webhooks.is_webhook(event):
+        return webhook_handler(event, context)
+    return skill_handler(event, context)
@@ -0,0 +1,156 @@
+# Load harness - replays synthetic Alexa envelopes through lambda_handler against the local Jira stand-in,
+# reporting latency percentiles, throughput and Jira calls per request for each intent.
+import argparse
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import alexa_jira_helper
+import async_jira
+import jira_instance
+import lambda_function
+import metrics
+import persistence
+import resilience
+from envelopes import LocalLambdaContext, build_envelope
+from jira_stand_in import JiraStandIn
+
+# Relative share of each request in the replayed traffic, roughly matching what users say
+INTENT_MIX = {
+    "GetToDoCountIntent": 40,
+    "GetToDoListIntent": 25,
+    "AddNewTaskIntent": 20,
+    "GetDailyBriefingIntent": 10,
+    "LaunchRequest": 5,
+}
+
+
+def make_envelope(intent_name, user_number):
+    """Builds an envelope for the intent, from one of a fixed pool of linked users"""
+    access_token = f"load-test-token-{user_number}"
+    user_id = f"amzn1.ask.account.load-test-{user_number}"
+    if intent_name == "LaunchRequest":
+        return build_envelope("LaunchRequest", access_token=access_token, user_id=user_id)
+    slots = {"taskName": f"load test task {user_number}"} if intent_name == "AddNewTaskIntent" else None
+    return build_envelope("IntentRequest", intent_name, slots, access_token=access_token, user_id=user_id)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def replay(envelopes, concurrency):
+    """Sends the envelopes through lambda_handler, returning per request latencies in milliseconds"""
+
+    def invoke(envelope):
+        start = time.perf_counter()
+        lambda_function.lambda_handler(envelope, LocalLambdaContext())
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(invoke, envelopes))
+
+
+# The skill's background pools, in the order their work hands on to the next
+BACKGROUND_POOLS = (alexa_jira_helper.query_pool, jira_instance.prefetch_pool, jira_instance.transition_pool)
+
+
+def drain(pool):
+    """Waits for the work already queued on a pool, keeping it usable. Each worker is held at a barrier, which
+    it can only reach once everything submitted before has been picked up and finished"""
+    workers = pool._max_workers
+    barrier = threading.Barrier(workers + 1)
+    for _ in range(workers):
+        pool.submit(barrier.wait)
+    barrier.wait()
+
+
+def drain_background_work():
+    """Lets the previous phase's background work finish, so its Jira calls aren't counted against the next
+    intent"""
+    for pool in BACKGROUND_POOLS:
+        drain(pool)
+    async_jira.settle()
+    drain(persistence.persist_pool)
+
+
+def wait_for_background_work():
+    """Lets the work the skill carries on with after responding finish, e.g. prefetches, index syncs, briefing
+    queries and snapshot writes, so none of it is still calling the stand-in when it stops"""
+    for pool in BACKGROUND_POOLS + (persistence.persist_pool,):
+        pool.shutdown(wait=True)
+    async_jira.close()
+
+
+def run_load(requests_total, concurrency, users, stand_in):
+    stand_in.use_for_jira()
+    total_weight = sum(INTENT_MIX.values())
+    rows = []
+    all_latencies = []
+    started = time.perf_counter()
+
+    # One phase per intent, so the stand-in's call count can be put down to that intent alone
+    for intent_name, weight in INTENT_MIX.items():
+        count = max(1, requests_total * weight // total_weight)
+        envelopes = [make_envelope(intent_name, number % users) for number in range(count)]
+        calls_before = stand_in.total_calls()
+        phase_start = time.perf_counter()
+        latencies = sorted(replay(envelopes, concurrency))
+        phase_seconds = time.perf_counter() - phase_start
+        drain_background_work()
+        jira_calls = stand_in.total_calls() - calls_before
+        all_latencies.extend(latencies)
+        rows.append((intent_name, count, percentile(latencies, 0.5), percentile(latencies, 0.95),
+                     percentile(latencies, 0.99), count / phase_seconds, jira_calls / count))
+
+    elapsed = time.perf_counter() - started
+    all_latencies.sort()
+    print(f"{len(all_latencies)} requests, concurrency {concurrency}, {users} users, "
+          f"stand-in latency {stand_in.latency_ms} ms, error rate {stand_in.error_rate}")
+    print(f"{'intent':<24}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'jira/req':>10}")
+    for intent_name, count, p50, p95, p99, throughput, calls_per_request in rows:
+        print(f"{intent_name:<24}{count:>6}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{throughput:>10.1f}"
+              f"{calls_per_request:>10.2f}")
+    print(f"{'all':<24}{len(all_latencies):>6}{percentile(all_latencies, 0.5):>10.1f}"
+          f"{percentile(all_latencies, 0.95):>10.1f}{percentile(all_latencies, 0.99):>10.1f}"
+          f"{len(all_latencies) / elapsed:>10.1f}{stand_in.total_calls() / len(all_latencies):>10.2f}")
+    print(f"Mean latency {statistics.mean(all_latencies):.1f} ms, Jira calls by endpoint {dict(stand_in.calls)}")
+    print(f"Stand-in answered {stand_in.throttled} calls with 429, client resilience counters {resilience.stats()}")
+
+
+# Run the main function
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay Alexa requests against a local Jira stand-in")
+    parser.add_argument("--requests", type=int, default=500, help="total requests to replay")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=20, help="distinct linked users in the traffic")
+    parser.add_argument("--issues", type=int, default=50, help="issues in the stand-in project")
+    parser.add_argument("--latency-ms", type=float, default=50, help="stand-in latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, help="stand-in calls a second before it answers 429")
+    parser.add_argument("--show-metrics", action="store_true", help="print each request's metrics line")
+    parser.add_argument("--snapshots", action="store_true", help="persist user snapshots, in memory instead of S3")
+    args = parser.parse_args()
+
+    if args.snapshots:
+        persistence.snapshot_store = persistence.MemorySnapshotStore()
+
+    # Metrics are still collected, to keep their cost in the numbers, but not printed unless asked for
+    if not args.show_metrics:
+        metrics.stream = open(os.devnull, "w")
+
+    server = JiraStandIn(args.issues, args.latency_ms, args.jitter_ms, args.error_rate, seed=1,
+                         rate_limit=args.rate_limit)
+    server.start()
+    try:
+        run_load(args.requests, args.concurrency, args.users, server)
+    finally:
+        wait_for_background_work()
+        server.stop()
@@ -0,0 +1,111 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# CloudWatch namespace the embedded metric format lines are published under
+NAMESPACE = os.environ.get("METRICS_NAMESPACE", "MyPlanner")
+
+# Where metrics lines go, stdout unless a local tool wants them elsewhere
+stream = None
+
+# Anything that looks like a bearer token or JWT is never written out
+TOKEN_PATTERN = re.compile(r"(Bearer\s+)\S+|eyJ[\w-]+\.[\w-]+\.[\w-]*", re.IGNORECASE)
+
+
+def redact(value):
+    """Masks tokens in a string, leaving everything else as is"""
+    if not isinstance(value, str):
+        return value
+    return TOKEN_PATTERN.sub(lambda match: f"{match.group(1) or ''}[REDACTED]", value)
+
+
+class InvocationMetrics:
+    """Collects timings and counters for one invocation and writes them as a single CloudWatch EMF line.
+
+    Recording is a few dictionary updates under a lock, so it is safe to leave on in production and to
+    use from the query and prefetch pools.
+    """
+
+    def __init__(self, intent="Unknown"):
+        self.intent = intent
+        self.started = time.perf_counter()
+        self.values = {}
+        self.units = {}
+        self.properties = {}
+        self.emitted = False
+        self._lock = threading.Lock()
+
+    def add(self, name, value, unit="Count"):
+        """Adds to a metric, summing repeated values within the invocation"""
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + value
+            self.units[name] = unit
+
+    def set_property(self, name, value):
+        """Attaches a searchable, non-metric value to the log line"""
+        with self._lock:
+            self.properties[name] = redact(value)
+
+    @contextmanager
+    def span(self, name):
+        """Times the enclosed block as <name>Ms, and counts it as <name>Calls"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(f"{name}Ms", (time.perf_counter() - start) * 1000, "Milliseconds")
+            self.add(f"{name}Calls", 1)
+
+    def record_http(self, operation, status_code, request_bytes, response_bytes, duration_ms):
+        """Records one Jira HTTP call"""
+        self.add(f"{operation}Ms", duration_ms, "Milliseconds")
+        self.add(f"{operation}Calls", 1)
+        self.add("JiraCalls", 1)
+        self.add("JiraMs", duration_ms, "Milliseconds")
+        self.add("JiraRequestBytes", request_bytes, "Bytes")
+        self.add("JiraResponseBytes", response_bytes, "Bytes")
+        if status_code is None:
+            self.add("JiraFailures", 1)
+        else:
+            self.add(f"Jira{status_code // 100}xx", 1)
+        with self._lock:
+            statuses = self.properties.setdefault("JiraStatusCodes", [])
+            statuses.append(status_code)
+
+    def document(self):
+        """Builds the embedded metric format document for this invocation"""
+        with self._lock:
+            values = dict(self.values)
+            units = dict(self.units)
+            properties = dict(self.properties)
+        values["HandlerMs"] = (time.perf_counter() - self.started) * 1000
+        units["HandlerMs"] = "Milliseconds"
+
+        document = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": NAMESPACE,
+                    "Dimensions": [["Intent"]],
+                    "Metrics": [{"Name": name, "Unit": units[name]} for name in values],
+                }],
+            },
+            "Intent": self.intent,
+        }
+        document.update(properties)
+        document.update({name: round(value, 3) for name, value in values.items()})
+        return document
+
+    def emit(self):
+        """Writes the metrics line once. Lambda sends stdout to CloudWatch Logs, which extracts the metrics"""
+        if self.emitted:
+            return
+        self.emitted = True
+        # One write per line, so lines from concurrent local runs don't interleave
+        output = stream if stream is not None else sys.stdout
+        output.write(json.dumps(self.document(), separators=(",", ":")) + "\n")
+        output.flush()
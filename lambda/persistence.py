@@ -0,0 +1,434 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Bump when the snapshot layout changes, older snapshots are then ignored
+SNAPSHOT_VERSION = 3
+SNAPSHOT_PREFIX = "snapshots/"
+# Recently active users, for the scheduled warm up to precompute answers for. Each record holds the user key and the
+# access token of the user's last request, encrypted with KMS, so it's only written when precompute is switched on
+# and a KMS key is set. It's deleted once used, and never trusted for longer than Atlassian's hour long tokens last
+ACTIVE_PREFIX = "active/"
+ACTIVE_USER_WINDOW = 50 * 60
+# Binds each encrypted token to its user, so one can't be passed off as another's
+TOKEN_CONTEXT = "user_key"
+# Tasks a request couldn't send to Jira in time, kept until one of the user's later requests creates them. Keyed by
+# user, not token, since tokens are refreshed every hour and the next request may be served by another container
+PENDING_PREFIX = "pending/"
+# Every change to a queue is a conditional write against the version read, so two containers can't both take the
+# same tasks, or put back tasks another has already created. A change that loses the race is tried again this often
+PENDING_UPDATE_ATTEMPTS = 3
+# Outcomes of a conditional queue write
+PENDING_SAVED, PENDING_CONFLICT, PENDING_FAILED = "saved", "conflict", "failed"
+# Time a request needs left to change a queue, more before boto3 has been loaded
+PENDING_WRITE_TIME = 0.5
+PENDING_WRITE_COLD_TIME = 1.5
+# S3 calls made while answering a user give up quickly, rather than holding the response up
+S3_CONNECT_TIMEOUT = 1
+S3_READ_TIMEOUT = 2
+
+# Snapshots already read or written by this container, so S3 is only read once per user per container
+SNAPSHOT_CACHE_TTL = 3600
+SNAPSHOT_CACHE_SIZE = 256
+snapshot_cache = TTLCache(SNAPSHOT_CACHE_SIZE, SNAPSHOT_CACHE_TTL)
+
+# Snapshots are written after the response is returned, one at a time
+persist_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot-writer")
+_pending_save = None
+_pending_lock = threading.Lock()
+# Longest a request waits for an earlier snapshot write to finish
+PENDING_SAVE_WAIT = 0.5
+
+
+def user_key(user_id):
+    """Hashes the Alexa user id, so it never appears in object keys"""
+    return hashlib.sha256(user_id.encode("utf-8")).hexdigest()
+
+
+def new_snapshot(site_id, cloud_ids, project_key, todo_count, todo_summaries, last_sync, projects=None,
+                 precomputed=False):
+    """Builds the compact per-user snapshot. projects is the site's project metadata, saving a lookup on
+    the user's next cold start. precomputed marks a snapshot written ahead of time by the scheduled warm up"""
+    return {
+        "version": SNAPSHOT_VERSION,
+        "site_id": site_id,
+        "cloud_ids": cloud_ids,
+        "project_key": project_key,
+        "todo_count": todo_count,
+        "todo_summaries": todo_summaries,
+        "last_sync": last_sync,
+        "projects": projects,
+        "precomputed": precomputed,
+    }
+
+
+class S3SnapshotStore:
+    """Keeps per-user snapshots in the skill's S3 persistence bucket.
+
+    endpoint_url points the store at a local S3 stand-in, such as moto or MinIO, for testing.
+    """
+
+    def __init__(self, bucket, region=None, endpoint_url=None):
+        self.bucket = bucket
+        self.region = region
+        self.endpoint_url = endpoint_url
+        self._client = None
+
+    def client(self):
+        """Creates the S3 client on first use, boto3 being slow to import"""
+        if self._client is None:
+            import boto3
+            from botocore.config import Config
+            config = Config(connect_timeout=S3_CONNECT_TIMEOUT, read_timeout=S3_READ_TIMEOUT,
+                            retries={"max_attempts": 2})
+            self._client = boto3.client("s3", region_name=self.region, endpoint_url=self.endpoint_url,
+                                        config=config)
+        return self._client
+
+    def loaded(self):
+        """Whether boto3 and the client are loaded yet"""
+        return self._client is not None
+
+    def load(self, key):
+        """Returns the snapshot of a user key, or None if there isn't a usable one"""
+        from botocore.exceptions import BotoCoreError, ClientError
+        try:
+            response = self.client().get_object(Bucket=self.bucket, Key=SNAPSHOT_PREFIX + key)
+            snapshot = json.loads(response["Body"].read())
+        except (BotoCoreError, ClientError, ValueError) as e:
+            logger.info(f"No snapshot loaded: {type(e).__name__}")
+            return None
+        return snapshot if snapshot.get("version") == SNAPSHOT_VERSION else None
+
+    def save(self, key, snapshot):
+        """Writes the snapshot of a user key"""
+        from botocore.exceptions import BotoCoreError, ClientError
+        body = json.dumps(snapshot, separators=(",", ":")).encode("utf-8")
+        try:
+            self.client().put_object(Bucket=self.bucket, Key=SNAPSHOT_PREFIX + key, Body=body,
+                                     ContentType="application/json")
+        except (BotoCoreError, ClientError) as e:
+            logger.warning(f"Snapshot save failed: {type(e).__name__}")
+            return False
+        return True
+
+    def save_active(self, key, record):
+        """Writes the active record of a user key"""
+        from botocore.exceptions import BotoCoreError, ClientError
+        try:
+            self.client().put_object(Bucket=self.bucket, Key=ACTIVE_PREFIX + key,
+                                     Body=json.dumps(record).encode("utf-8"), ContentType="application/json")
+        except (BotoCoreError, ClientError) as e:
+            logger.warning(f"Active user save failed: {type(e).__name__}")
+            return False
+        return True
+
+    def list_active(self, since):
+        """Returns the active records written since a time.time(), deleting any older ones"""
+        from botocore.exceptions import BotoCoreError, ClientError
+        records = []
+        try:
+            pages = self.client().get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=ACTIVE_PREFIX)
+            for page in pages:
+                for item in page.get("Contents", []):
+                    if item["LastModified"].timestamp() < since:
+                        self.client().delete_object(Bucket=self.bucket, Key=item["Key"])
+                        continue
+                    response = self.client().get_object(Bucket=self.bucket, Key=item["Key"])
+                    records.append(json.loads(response["Body"].read()))
+        except (BotoCoreError, ClientError, ValueError) as e:
+            logger.warning(f"Active user listing failed: {type(e).__name__}")
+        return records
+
+    def delete_active(self, key):
+        """Deletes the active record of a user key, once it's been used"""
+        from botocore.exceptions import BotoCoreError, ClientError
+        try:
+            self.client().delete_object(Bucket=self.bucket, Key=ACTIVE_PREFIX + key)
+        except (BotoCoreError, ClientError) as e:
+            logger.warning(f"Active user delete failed: {type(e).__name__}")
+            return False
+        return True
+
+    def load_pending(self, key):
+        """Returns (task summaries, version) for the queue of a user key, where the version is the object's ETag,
+        or None if there's no queue yet. The summaries are None if the queue couldn't be read"""
+        from botocore.exceptions import BotoCoreError, ClientError
+        try:
+            response = self.client().get_object(Bucket=self.bucket, Key=PENDING_PREFIX + key)
+            return json.loads(response["Body"].read()), response["ETag"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "NoSuchKey":
+                return [], None
+            logger.warning(f"Pending tasks load failed: {type(e).__name__}")
+        except (BotoCoreError, ValueError) as e:
+            logger.warning(f"Pending tasks load failed: {type(e).__name__}")
+        return None, None
+
+    def save_pending(self, key, task_summaries, version):
+        """Writes the queue of a user key, only if it's still at the version read. An emptied queue is kept as an
+        empty list, so taking the tasks is a conditional write too. Returns PENDING_SAVED, PENDING_CONFLICT or
+        PENDING_FAILED"""
+        from botocore.exceptions import BotoCoreError, ClientError
+        condition = {"IfMatch": version} if version is not None else {"IfNoneMatch": "*"}
+        try:
+            self.client().put_object(Bucket=self.bucket, Key=PENDING_PREFIX + key,
+                                     Body=json.dumps(task_summaries).encode("utf-8"),
+                                     ContentType="application/json", **condition)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+                return PENDING_CONFLICT
+            logger.warning(f"Pending tasks save failed: {type(e).__name__}")
+            return PENDING_FAILED
+        except BotoCoreError as e:
+            logger.warning(f"Pending tasks save failed: {type(e).__name__}")
+            return PENDING_FAILED
+        return PENDING_SAVED
+
+
+class MemorySnapshotStore:
+    """Snapshot store held in memory, for local runs without S3"""
+
+    def __init__(self):
+        self.snapshots = {}
+        self.active = {}
+        # (version, queue) by user key, with a lock making each conditional write atomic the way S3's are
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+
+    def loaded(self):
+        return True
+
+    def load(self, key):
+        snapshot = self.snapshots.get(key)
+        return json.loads(snapshot) if snapshot is not None else None
+
+    def save(self, key, snapshot):
+        self.snapshots[key] = json.dumps(snapshot)
+        return True
+
+    def save_active(self, key, record):
+        self.active[key] = json.dumps(record)
+        return True
+
+    def delete_active(self, key):
+        return self.active.pop(key, None) is not None
+
+    def list_active(self, since):
+        records = []
+        for key, value in list(self.active.items()):
+            record = json.loads(value)
+            if record["seen"] < since:
+                del self.active[key]
+            else:
+                records.append(record)
+        return records
+
+    def load_pending(self, key):
+        with self.pending_lock:
+            version, queue = self.pending.get(key, (None, "[]"))
+        return json.loads(queue), version
+
+    def save_pending(self, key, task_summaries, version):
+        with self.pending_lock:
+            current = self.pending.get(key, (None, None))[0]
+            if current != version:
+                return PENDING_CONFLICT
+            self.pending[key] = ((current or 0) + 1, json.dumps(task_summaries))
+        return PENDING_SAVED
+
+
+def store_from_environment():
+    """Returns the S3 store configured for this Lambda, or None if no persistence bucket is set"""
+    bucket = os.environ.get("S3_PERSISTENCE_BUCKET")
+    if not bucket:
+        return None
+    return S3SnapshotStore(bucket, os.environ.get("S3_PERSISTENCE_REGION"), os.environ.get("S3_ENDPOINT_URL"))
+
+
+# The store used by the skill, replaceable for local runs
+snapshot_store = store_from_environment()
+
+
+class KmsTokenCipher:
+    """Encrypts access tokens with a KMS key before they're stored, bound to their user key by the encryption
+    context. The key policy should only let this function's role use it"""
+
+    def __init__(self, key_id, region=None):
+        self.key_id = key_id
+        self.region = region
+        self._client = None
+
+    def client(self):
+        """Creates the KMS client on first use, boto3 being slow to import"""
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("kms", region_name=self.region)
+        return self._client
+
+    def encrypt(self, access_token, key):
+        """Returns the token encrypted as base64 text, or None if it couldn't be"""
+        from botocore.exceptions import BotoCoreError, ClientError
+        try:
+            response = self.client().encrypt(KeyId=self.key_id, Plaintext=access_token.encode("utf-8"),
+                                             EncryptionContext={TOKEN_CONTEXT: key})
+        except (BotoCoreError, ClientError) as e:
+            logger.warning(f"Token encrypt failed: {type(e).__name__}")
+            return None
+        return base64.b64encode(response["CiphertextBlob"]).decode("ascii")
+
+    def decrypt(self, token, key):
+        """Returns the token a user key's record holds, or None if it can't be decrypted for that user key"""
+        from botocore.exceptions import BotoCoreError, ClientError
+        if not token or not key:
+            return None
+        try:
+            response = self.client().decrypt(CiphertextBlob=base64.b64decode(token), KeyId=self.key_id,
+                                             EncryptionContext={TOKEN_CONTEXT: key})
+        except (BotoCoreError, ClientError, ValueError) as e:
+            logger.warning(f"Token decrypt failed: {type(e).__name__}")
+            return None
+        return response["Plaintext"].decode("utf-8")
+
+
+class MemoryTokenCipher:
+    """Keeps tokens as they are, for local runs with MemorySnapshotStore. Never for a real bucket"""
+
+    def encrypt(self, access_token, key):
+        return json.dumps([key, access_token])
+
+    def decrypt(self, token, key):
+        if not token:
+            return None
+        stored_key, access_token = json.loads(token)
+        return access_token if stored_key == key else None
+
+
+def cipher_from_environment():
+    """Returns the KMS cipher for stored tokens, or None if no key is set, in which case no token is stored"""
+    key_id = os.environ.get("TOKEN_KMS_KEY_ID")
+    if not key_id:
+        return None
+    return KmsTokenCipher(key_id, os.environ.get("S3_PERSISTENCE_REGION"))
+
+
+# The cipher used for stored access tokens, replaceable for local runs
+token_cipher = cipher_from_environment()
+
+
+def load_snapshot(key):
+    """Returns the snapshot of a user key, from this container if it has one, otherwise from the store"""
+    if snapshot_store is None:
+        return None
+    snapshot = snapshot_cache.get(key)
+    if snapshot is None:
+        snapshot = snapshot_store.load(key)
+        if snapshot is not None:
+            snapshot_cache.put(key, snapshot)
+    return snapshot
+
+
+def save_snapshot_async(key, snapshot):
+    """Queues a snapshot write, so the response doesn't wait on S3"""
+    global _pending_save
+    if snapshot_store is None:
+        return None
+    snapshot_cache.put(key, snapshot)
+    store = snapshot_store
+    with _pending_lock:
+        _pending_save = persist_pool.submit(store.save, key, snapshot)
+        return _pending_save
+
+
+def save_snapshot(key, snapshot):
+    """Writes a snapshot straight away, for callers that aren't answering a user"""
+    if snapshot_store is None:
+        return False
+    snapshot_cache.put(key, snapshot)
+    return snapshot_store.save(key, snapshot)
+
+
+def save_active_async(key, access_token):
+    """Queues a write recording that a user was just active, with the token to act for them encrypted. Nothing is
+    written without a token cipher"""
+    if snapshot_store is None or token_cipher is None:
+        return None
+    store, cipher = snapshot_store, token_cipher
+
+    def save():
+        token = cipher.encrypt(access_token, key)
+        return token is not None and store.save_active(key, {"user_key": key, "token": token, "seen": time.time()})
+
+    return persist_pool.submit(save)
+
+
+def recently_active(window=ACTIVE_USER_WINDOW):
+    """Returns the active records of users seen within the window, most recent first, each with its access token
+    decrypted. Records whose token can't be decrypted are left out"""
+    if snapshot_store is None or token_cipher is None:
+        return []
+    records = []
+    for record in snapshot_store.list_active(time.time() - window):
+        access_token = token_cipher.decrypt(record.get("token"), record.get("user_key"))
+        if access_token is not None:
+            records.append(dict(record, access_token=access_token))
+    return sorted(records, key=lambda record: record["seen"], reverse=True)
+
+
+def used_active(key):
+    """Deletes a user's active record once the warm up has used it, so their token isn't kept any longer"""
+    if snapshot_store is None:
+        return False
+    return snapshot_store.delete_active(key)
+
+
+def pending_write_time():
+    """Time a request needs left to change a user's queue of tasks, None if there's nowhere to keep one"""
+    if snapshot_store is None:
+        return None
+    return PENDING_WRITE_TIME if snapshot_store.loaded() else PENDING_WRITE_COLD_TIME
+
+
+def update_pending_tasks(key, update):
+    """Changes the task summaries queued for a user key, always reading them from the store. update is given the
+    queue and returns the new one, or None to leave it as it is. The write only succeeds if nothing else changed
+    the queue since it was read, and is tried again from a fresh read if something did. Returns the queue update
+    was given and whether its change was written, or (None, False) if the queue couldn't be read"""
+    if snapshot_store is None:
+        return None, False
+    for _ in range(PENDING_UPDATE_ATTEMPTS):
+        task_summaries, version = snapshot_store.load_pending(key)
+        if task_summaries is None:
+            return None, False
+        updated = update(list(task_summaries))
+        if updated is None:
+            return task_summaries, False
+        outcome = snapshot_store.save_pending(key, updated, version)
+        if outcome != PENDING_CONFLICT:
+            return task_summaries, outcome == PENDING_SAVED
+    logger.warning("Pending tasks changed by other requests too often to update")
+    return None, False
+
+
+def wait_for_pending_save(timeout=PENDING_SAVE_WAIT):
+    """Waits briefly for the last queued write. Lambda freezes the container once the response is returned,
+    so a write can be left half done until the next request thaws it"""
+    with _pending_lock:
+        pending = _pending_save
+    if pending is not None:
+        start = time.monotonic()
+        try:
+            pending.result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"Snapshot write still pending after {time.monotonic() - start:.2f}s: "
+                           f"{type(e).__name__}")
@@ -9,3 +9,29 @@ TASK_COUNT_2 = "TASK_COUNT_2"
 TASK_LIST = "TASK_LIST"
 ERROR_UNKNOWN = "ERROR_UNKNOWN"
 ERROR_NOT_LINKED = "ERROR_NOT_LINKED"
+TASKS_CREATED_1 = "TASKS_CREATED_1"
+TASKS_CREATED_2 = "TASKS_CREATED_2"
+TASKS_FAILED = "TASKS_FAILED"
+IN_PROGRESS_COUNT = "IN_PROGRESS_COUNT"
+BRIEFING_NEXT = "BRIEFING_NEXT"
+STALE_ANSWER = "STALE_ANSWER"
+TASK_QUEUED = "TASK_QUEUED"
+LIST_MORE_1 = "LIST_MORE_1"
+LIST_MORE_2 = "LIST_MORE_2"
+LIST_MORE_REPROMPT = "LIST_MORE_REPROMPT"
+LIST_END = "LIST_END"
+TASKS_DONE_1 = "TASKS_DONE_1"
+TASKS_DONE_2 = "TASKS_DONE_2"
+TASKS_NOT_DONE = "TASKS_NOT_DONE"
+TASK_NOT_FOUND = "TASK_NOT_FOUND"
+TASK_CONFIRM_1 = "TASK_CONFIRM_1"
+TASK_CONFIRM_2 = "TASK_CONFIRM_2"
+TASK_CONFIRM_NO = "TASK_CONFIRM_NO"
+TASKS_SPLIT_1 = "TASKS_SPLIT_1"
+TASKS_SPLIT_2 = "TASKS_SPLIT_2"
+TASKS_SPLIT_3 = "TASKS_SPLIT_3"
+STATUS_SUMMARY_1 = "STATUS_SUMMARY_1"
+STATUS_SUMMARY_2 = "STATUS_SUMMARY_2"
+STATUS_SUMMARY_EMPTY = "STATUS_SUMMARY_EMPTY"
+SUMMARIES_MORE_1 = "SUMMARIES_MORE_1"
+SUMMARIES_MORE_2 = "SUMMARIES_MORE_2"
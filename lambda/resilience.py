@@ -0,0 +1,181 @@
+import os
+import random
+import threading
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+
+# Client side rate limit per Jira site, overridable from the Lambda environment. Atlassian counts requests per
+# site and app, so staying under it here avoids paying a 429 round trip to find out
+RATE_LIMIT = float(os.environ.get("JIRA_RATE_LIMIT", "10"))
+RATE_BURST = int(os.environ.get("JIRA_RATE_BURST", "20"))
+
+# Retries of a throttled or briefly unavailable call, always within the invocation deadline
+MAX_RETRIES = int(os.environ.get("JIRA_MAX_RETRIES", "2"))
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 2.0
+
+# Consecutive failures that open a site's breaker, and how long it stays open before a trial call
+BREAKER_FAILURES = int(os.environ.get("JIRA_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.environ.get("JIRA_BREAKER_RESET", "30"))
+
+# Container wide counters, next to the per invocation metrics
+counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def count(name, value=1):
+    with _counters_lock:
+        counters[name] += value
+
+
+class TokenBucket:
+    """Thread safe token bucket, refilled continuously at rate tokens a second up to burst"""
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, timeout=0.0):
+        """Takes a token, waiting up to timeout seconds for one. Returns False, without waiting, if none would
+        be available in time"""
+        wait = self.reserve(timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def reserve(self, timeout=0.0):
+        """Claims a token, returning the seconds to wait before using it, or None if none would be available
+        within timeout. For callers that wait their own way, such as with asyncio.sleep"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > timeout:
+                return None
+            # Claim the token now, so waiting callers queue up rather than all take the same one
+            self.tokens -= 1
+        return wait
+
+
+class CircuitBreaker:
+    """Fails calls fast while a site is unhealthy.
+
+    Closed, calls go through and consecutive failures are counted. Open, after failure_threshold failures in a
+    row, calls are refused until reset_timeout has passed. Half open, one trial call is let through, and its
+    result closes or reopens the breaker. A trial that shows nothing, because it was throttled or cancelled,
+    leaves the breaker open for another wait, and if a trial's result never arrives another is let through
+    after reset_timeout.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may be made now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                # Let this one call through as a trial, timed from now in case its result never comes back
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_inconclusive(self):
+        """A call ended without showing whether the site is healthy, such as a 429 or a cancelled call. A trial
+        that ends this way leaves the breaker open for another wait"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    count("BreakerOpened")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+# One bucket and one breaker per site, for as long as the container lives. Each is a few numbers, and a
+# container only ever sees the sites of its users
+_buckets = {}
+_breakers = {}
+_site_state_lock = threading.Lock()
+
+
+def _for_site(states, site, factory):
+    with _site_state_lock:
+        state = states.get(site)
+        if state is None:
+            state = states[site] = factory()
+        return state
+
+
+def bucket_for(site):
+    """Returns the token bucket for a Jira site"""
+    return _for_site(_buckets, site, TokenBucket)
+
+
+def breaker_for(site):
+    """Returns the circuit breaker for a Jira site"""
+    return _for_site(_breakers, site, CircuitBreaker)
+
+
+def retry_after_seconds(value):
+    """Parses a Retry-After header, given either as seconds or as an HTTP date, or returns None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds to wait before a retry. Jira's Retry-After is honoured, plus a little jitter so throttled
+    callers don't all come back at once, otherwise exponential backoff with full jitter"""
+    if retry_after is not None:
+        return retry_after + random.uniform(0, BACKOFF_BASE)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def stats():
+    """Returns the container wide counters and the state of each site's breaker"""
+    with _counters_lock:
+        snapshot = dict(counters)
+    with _site_state_lock:
+        snapshot["BreakerStates"] = {site: breaker.state for site, breaker in _breakers.items()}
+    return snapshot
@@ -0,0 +1,149 @@
+import codecs
+import json
+import re
+
+# Bytes read from a search response at a time
+CHUNK_BYTES = 16 * 1024
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Where the decoder is in the response body
+START, KEY, COLON, VALUE, ISSUES, END = range(6)
+
+
+class IssueRecord:
+    """The fields of a search result issue the skill reads, without the rest of the issue"""
+
+    __slots__ = ("key", "summary", "status", "issuetype", "updated")
+
+    def __init__(self, key, summary=None, status=None, issuetype=None, updated=None):
+        self.key = key
+        self.summary = summary
+        self.status = status
+        self.issuetype = issuetype
+        self.updated = updated
+
+    @classmethod
+    def from_issue(cls, issue):
+        fields = issue.get("fields") or {}
+        return cls(issue["key"], fields.get("summary"), (fields.get("status") or {}).get("name"),
+                   (fields.get("issuetype") or {}).get("name"), fields.get("updated"))
+
+    def index_record(self):
+        """What the task index keeps for the issue"""
+        return {"key": self.key, "summary": self.summary, "status": self.status, "updated": self.updated}
+
+
+class SearchPage:
+    """One page of search results: Jira's total for the search, and the page's issues as IssueRecords"""
+
+    __slots__ = ("total", "issues")
+
+    def __init__(self, total, issues):
+        self.total = total
+        self.issues = issues
+
+
+class SearchDecoder:
+    """Decodes a search response body as it's read, keeping only the total and an IssueRecord per issue.
+
+    Bytes are fed in as they arrive. The top level of the response is walked a token at a time, and each issue
+    is decoded on its own and reduced to a record straight away, so the whole response is never held, as text
+    or as objects. Only the current issue and the unread part of the last chunk are.
+    """
+
+    def __init__(self):
+        self.text = codecs.getincrementaldecoder("utf-8")()
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.state = START
+        self.key = None
+        self.total = None
+        self.issues = []
+        self.bytes_read = 0
+        # A value split across chunks isn't tried again until the buffer has doubled, so one large issue
+        # doesn't get decoded over and over
+        self.retry_at = 0
+
+    def feed(self, chunk):
+        """Decodes whatever complete values a chunk of the body makes available"""
+        self.bytes_read += len(chunk)
+        self.buffer += self.text.decode(chunk)
+        if len(self.buffer) >= self.retry_at:
+            self.parse(final=False)
+
+    def close(self):
+        """Finishes decoding, returning the SearchPage. Raises ValueError if the body was cut short or isn't a
+        search response"""
+        self.buffer += self.text.decode(b"", final=True)
+        self.parse(final=True)
+        if self.state != END or self.total is None:
+            raise ValueError("Incomplete search response")
+        return SearchPage(self.total, self.issues)
+
+    def parse(self, final):
+        buffer = self.buffer
+        pos = 0
+        try:
+            while True:
+                pos = WHITESPACE.match(buffer, pos).end()
+                if pos >= len(buffer) or self.state == END:
+                    break
+                char = buffer[pos]
+                if self.state == START:
+                    if char != "{":
+                        raise ValueError("Search response isn't a JSON object")
+                    pos += 1
+                    self.state = KEY
+                elif self.state == KEY:
+                    if char == "}":
+                        pos += 1
+                        self.state = END
+                    elif char == ",":
+                        pos += 1
+                    else:
+                        self.key, pos = self.decoder.raw_decode(buffer, pos)
+                        self.state = COLON
+                elif self.state == COLON:
+                    if char != ":":
+                        raise ValueError("Expected : in search response")
+                    pos += 1
+                    self.state = VALUE
+                elif self.state == VALUE:
+                    if self.key == "issues" and char == "[":
+                        pos += 1
+                        self.state = ISSUES
+                        continue
+                    value, end = self.decoder.raw_decode(buffer, pos)
+                    if end >= len(buffer) and not final:
+                        # A number could go on in the next chunk
+                        break
+                    if self.key == "total":
+                        self.total = value
+                    pos = end
+                    self.state = KEY
+                elif char == "]":
+                    pos += 1
+                    self.state = KEY
+                elif char == ",":
+                    pos += 1
+                else:
+                    issue, pos = self.decoder.raw_decode(buffer, pos)
+                    self.issues.append(IssueRecord.from_issue(issue))
+        except json.JSONDecodeError:
+            # The value isn't all here yet, unless the body has ended
+            if final:
+                raise
+            self.retry_at = 2 * (len(buffer) - pos)
+        else:
+            self.retry_at = 0
+        # Drop what's been decoded
+        self.buffer = buffer[pos:]
+
+
+def decode_search(chunks):
+    """Decodes a search response from an iterable of byte chunks into a SearchPage"""
+    decoder = SearchDecoder()
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.close()
@@ -0,0 +1,73 @@
+# Alexa allows 8000 characters of output speech, so leave room for the surrounding prompt
+MAX_SPEECH_CHARS = 6000
+# Roughly how many characters Alexa reads out a second, for budgeting speech by how long it takes to say
+CHARS_PER_SECOND = 14
+
+# Ends a list that was cut short, e.g. "And 12 more.". Handlers pass the words for the user's locale
+MORE_WORDS = ("And", "more.")
+
+# Characters with a meaning in SSML, which a summary could otherwise use to break the response
+SSML_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&apos;"})
+
+
+def escape_ssml(text):
+    """Escapes text for use inside an SSML <speak> element"""
+    return text.translate(SSML_ESCAPES)
+
+
+class SpeechRenderer:
+    """Renders issue summaries into a speakable SSML list as they arrive, escaping each one.
+
+    Summaries are added until the next would go over the character budget, or the time it would take to say
+    them, and add returns False from then on so the caller can stop reading search results. Only what will be
+    spoken is kept, so memory stays within the budget however many issues there are. render adds "And N more."
+    when the total is more than was spoken.
+    """
+
+    def __init__(self, max_chars=MAX_SPEECH_CHARS, max_seconds=None, more=MORE_WORDS):
+        self.budget = max_chars
+        if max_seconds is not None:
+            self.budget = min(max_chars, int(max_seconds * CHARS_PER_SECOND))
+        self.more = more
+        # Keep room for the suffix, whatever the count turns out to be
+        self.budget -= len(self.more_text(10 ** 6))
+        self.parts = []
+        self.length = 0
+        self.spoken = 0
+        self.full = False
+
+    def add(self, summary):
+        """Adds a summary, returning False once the budget is met and nothing more will be added"""
+        if self.full:
+            return False
+        part = f"{escape_ssml(summary)}. "
+        if self.length + len(part) > self.budget:
+            self.full = True
+            return False
+        self.parts.append(part)
+        self.length += len(part)
+        self.spoken += 1
+        return True
+
+    def extend(self, summaries):
+        """Adds summaries until the budget is met, leaving the rest of the iterable unread"""
+        for summary in summaries:
+            if not self.add(summary):
+                break
+        return self
+
+    def more_text(self, count):
+        return f"{self.more[0]} {count} {self.more[1]}"
+
+    def render(self, total=None):
+        """The speech so far, followed by how many more there are if total says some weren't spoken"""
+        speech = "".join(self.parts)
+        if total is not None and total > self.spoken:
+            speech += self.more_text(total - self.spoken)
+        return speech
+
+
+def speech_summaries(summaries, max_chars=MAX_SPEECH_CHARS, total=None, more=MORE_WORDS):
+    """Joins issue summaries into one speakable string, stopping once max_chars of speech is reached. With the
+    total, a list cut short ends with how many more there are"""
+    return SpeechRenderer(max_chars, more=more).extend(summaries).render(total)
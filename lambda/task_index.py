@@ -0,0 +1,169 @@
+import threading
+from datetime import datetime
+
+from task_matcher import TaskMatcher
+
+
+def key_number(key):
+    """The number in an issue key, e.g. 42 for PTD-42, which orders a project's issues oldest first"""
+    return int(key.rsplit("-", 1)[-1])
+
+
+def parse_updated(value):
+    """Parses Jira's updated timestamp, e.g. 2020-01-01T09:00:00.000+0000, or returns None"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z")
+    except (TypeError, ValueError):
+        return None
+
+
+class TaskIndex:
+    """Local copy of the open issues of one type in one project, for one user, keyed by issue key.
+
+    Kept up to date by syncing only the issues updated since the last sync, so count and list queries can
+    be answered locally. Deleted issues never show up as updated, so a periodic reconcile against the full
+    list of keys removes them. A TaskMatcher over the summaries resolves spoken task names to keys.
+
+    Jira webhooks update it in place too. Deliveries can arrive late or out of order, so a change older than
+    what the index already has for an issue, or than the issue's removal, is ignored.
+    """
+
+    def __init__(self, closed_statuses=()):
+        self.closed_statuses = frozenset(closed_statuses)
+        self.issues = {}
+        self.matcher = TaskMatcher()
+        # time.time() at the start of the last successful sync and reconcile, None until the first full sync
+        self.last_sync = None
+        self.last_reconcile = None
+        # When each removed issue was closed or deleted, so a late update doesn't bring it back
+        self.removed = {}
+        # time.time() of the last webhook delivery for this index's site, None if there hasn't been one
+        self.last_event = None
+        self._lock = threading.Lock()
+        # Held for the whole of a sync, so concurrent queries in one request sync once between them
+        self.sync_lock = threading.Lock()
+
+    def replace(self, records, started):
+        """Replaces the whole index with the result of a full sync"""
+        issues = {record["key"]: record for record in records if record["status"] not in self.closed_statuses}
+        matcher = TaskMatcher()
+        for key, record in issues.items():
+            matcher.add(key, record["summary"])
+        with self._lock:
+            self.issues = issues
+            self.matcher = matcher
+            self.removed = {}
+            self.last_sync = started
+            self.last_reconcile = started
+
+    def apply(self, records, started):
+        """Applies issues updated since the last sync. Issues moved to a closed status are dropped"""
+        with self._lock:
+            for record in records:
+                self._put(record)
+            self.last_sync = started
+
+    def add(self, record):
+        """Adds an issue just created by the skill, so it can be found before the next sync"""
+        with self._lock:
+            self._put(record)
+
+    def upsert(self, record):
+        """Applies one issue from a webhook, returning False if the index already has a newer version"""
+        with self._lock:
+            return self._put(record)
+
+    def delete(self, key, when):
+        """Removes a deleted issue, unless the index has seen it updated since. when is a datetime"""
+        with self._lock:
+            return self._remove(key, when)
+
+    def _put(self, record):
+        key = record["key"]
+        updated = parse_updated(record.get("updated"))
+        if updated is not None:
+            current = self.issues.get(key)
+            current_updated = parse_updated(current.get("updated")) if current is not None else None
+            removed = self.removed.get(key)
+            if (current_updated is not None and updated < current_updated) or \
+                    (removed is not None and updated <= removed):
+                return False
+        if record["status"] in self.closed_statuses:
+            return self._remove(key, updated)
+        self.issues[key] = record
+        self.removed.pop(key, None)
+        self.matcher.add(key, record["summary"])
+        return True
+
+    def _remove(self, key, when):
+        current = self.issues.get(key)
+        current_updated = parse_updated(current.get("updated")) if current is not None else None
+        if when is not None and current_updated is not None and when < current_updated:
+            return False
+        self.issues.pop(key, None)
+        self.matcher.remove(key)
+        if when is not None:
+            self.removed[key] = max(when, self.removed.get(key, when))
+        return current is not None
+
+    def retain(self, keys, started):
+        """Drops issues that are no longer open in Jira, returning True if Jira has open issues the index
+        doesn't know about, which means it needs a full sync"""
+        keys = set(keys)
+        with self._lock:
+            for key in [key for key in self.issues if key not in keys]:
+                del self.issues[key]
+                self.matcher.remove(key)
+            self.last_reconcile = started
+            return not keys.issubset(self.issues)
+
+    def count(self, status):
+        """Number of issues with the status"""
+        with self._lock:
+            return sum(1 for record in self.issues.values() if record["status"] == status)
+
+    def summaries(self, status, limit=None):
+        """Summaries of issues with the status, oldest first"""
+        with self._lock:
+            records = [record for record in self.issues.values() if record["status"] == status]
+        records.sort(key=lambda record: key_number(record["key"]))
+        return [record["summary"] for record in records[:limit]]
+
+    def match(self, spoken_name, limit=3):
+        """Ranks open issues against a spoken name, as (score, key, summary), best first"""
+        with self._lock:
+            return self.matcher.match(spoken_name, limit)
+
+    def match_all(self, spoken_name):
+        """Every open issue a spoken name matches well, as copies of their records, best first"""
+        with self._lock:
+            return [dict(self.issues[key]) for score, key, summary in self.matcher.match_all(spoken_name)]
+
+    def resolve(self, spoken_name):
+        """Returns (key, summary) of the open issue a spoken name clearly means, or None"""
+        with self._lock:
+            return self.matcher.resolve(spoken_name)
+
+    def lookup(self, spoken_name):
+        """Returns (record, clear) for the open issue matching a spoken name best: a copy of its record, and
+        whether it's clearly the one meant rather than one of several matching about as well. None if no issue
+        matches well enough"""
+        with self._lock:
+            best = self.matcher.best(spoken_name)
+            if best is None:
+                return None
+            return dict(self.issues[best[0]]), best[2]
+
+    def get(self, key):
+        """A copy of an open issue's record, or None"""
+        with self._lock:
+            record = self.issues.get(key)
+            return dict(record) if record is not None else None
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self.issues
+
+    def __len__(self):
+        with self._lock:
+            return len(self.issues)
@@ -0,0 +1,111 @@
+import heapq
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from itertools import chain
+
+# Words that say nothing about which task is meant, e.g. "mark the task buy milk as done"
+STOP_WORDS = frozenset(["a", "an", "the", "to", "my", "task", "item", "please", "for", "of", "on", "in"])
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Lowest score treated as a match, and how far the best match must lead the next to not be ambiguous
+MATCH_THRESHOLD = 0.5
+AMBIGUITY_MARGIN = 0.15
+
+
+def normalize(text):
+    """Lower case, accent free word tokens without stop words, with simple plurals made singular"""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii").lower()
+    tokens = []
+    for word in WORD_PATTERN.findall(text):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def trigrams(tokens):
+    """Character trigrams of each token, padded so short words and word boundaries still count"""
+    grams = set()
+    for token in tokens:
+        padded = f" {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TaskMatcher:
+    """In-memory index from spoken task names to issue keys, using trigrams of the normalized summaries.
+
+    Scores average the Dice coefficient of the trigram sets with how much of the spoken name the summary
+    covers, so word order, small mis-hearings and plurals only cost a little, and saying part of a long
+    summary still finds it. Not thread safe, its owner serializes access.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(set)
+        self.grams = {}
+        self.summaries = {}
+
+    def add(self, key, summary):
+        """Indexes a task, replacing any earlier summary for the key"""
+        self.remove(key)
+        grams = trigrams(normalize(summary))
+        self.grams[key] = grams
+        self.summaries[key] = summary
+        for gram in grams:
+            self.postings[gram].add(key)
+
+    def remove(self, key):
+        grams = self.grams.pop(key, None)
+        if grams is None:
+            return
+        del self.summaries[key]
+        for gram in grams:
+            keys = self.postings[gram]
+            keys.discard(key)
+            if not keys:
+                del self.postings[gram]
+
+    def scores(self, spoken_name):
+        """Scores every task sharing a trigram with a spoken name, as (score, key) pairs"""
+        query = trigrams(normalize(spoken_name))
+        if not query:
+            return []
+        # Trigrams each task shares with the name, counted in one pass over the posting lists
+        shared = Counter(chain.from_iterable(self.postings.get(gram, ()) for gram in query))
+        size = len(query)
+        return ((count / (size + len(self.grams[key])) + count / (2 * size), key) for key, count in shared.items())
+
+    def match(self, spoken_name, limit=3):
+        """Ranks tasks against a spoken name, returning up to limit (score, key, summary), best first"""
+        return [(score, key, self.summaries[key]) for score, key in heapq.nlargest(limit, self.scores(spoken_name))]
+
+    def match_all(self, spoken_name, threshold=MATCH_THRESHOLD):
+        """Every task matching a spoken name at least as well as the threshold, as (score, key, summary), best
+        first. For commands about all tasks of a kind, e.g. "complete all my milk tasks" """
+        matches = sorted((item for item in self.scores(spoken_name) if item[0] >= threshold), reverse=True)
+        return [(score, key, self.summaries[key]) for score, key in matches]
+
+    def best(self, spoken_name):
+        """Returns (key, summary, clear) for the task matching a spoken name best, where clear is False if
+        another task matches about as well, or None if no task matches well enough"""
+        matches = self.match(spoken_name, limit=2)
+        if not matches or matches[0][0] < MATCH_THRESHOLD:
+            return None
+        # Saying exactly one summary means that task, however many others start the same way
+        clear = len(matches) == 1 or matches[0][0] - matches[1][0] >= AMBIGUITY_MARGIN or \
+            matches[0][0] >= 1.0 > matches[1][0]
+        return matches[0][1], matches[0][2], clear
+
+    def resolve(self, spoken_name):
+        """Returns (key, summary) for the task the name clearly means, or None if no task matches well
+        enough or two match about as well"""
+        best = self.best(spoken_name)
+        if best is None or not best[2]:
+            return None
+        return best[0], best[1]
+
+    def __len__(self):
+        return len(self.grams)
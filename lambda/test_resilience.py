@@ -0,0 +1,66 @@
+import unittest
+from unittest import mock
+
+from resilience import CircuitBreaker
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    """Breaker states, on a clock the test moves forward"""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch("resilience.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+    def test_opens_after_threshold(self):
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_trial_success_closes(self):
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_trial_failure_reopens(self):
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_throttled_trial_reopens_and_retries(self):
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        # A 429 says nothing about whether the site has recovered
+        self.breaker.record_inconclusive()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_lost_trial_allows_another_after_reset(self):
+        self.now += 30
+        self.assertTrue(self.breaker.allow())
+        # The trial's result never arrives
+        self.assertFalse(self.breaker.allow())
+        self.now += 29
+        self.assertFalse(self.breaker.allow())
+        self.now += 1
+        self.assertTrue(self.breaker.allow())
+
+    def test_inconclusive_leaves_closed_alone(self):
+        self.breaker.record_success()
+        self.breaker.record_inconclusive()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
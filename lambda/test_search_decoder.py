@@ -0,0 +1,76 @@
+import json
+import unittest
+
+from search_decoder import SearchDecoder, decode_search
+
+ISSUES = [
+    {"key": "PTD-1", "id": "10001", "fields": {"summary": "Buy crème brûlée 🍮", "status": {"name": "To Do"},
+                                               "issuetype": {"name": "Task"},
+                                               "updated": "2026-10-18T09:00:00.000+0000",
+                                               "description": "A long description " * 50}},
+    {"key": "PTD-2", "fields": {"summary": "Call mum", "status": {"name": "In Progress"},
+                                "issuetype": {"name": "Task"}}},
+]
+BODY = json.dumps({"expand": "schema,names", "startAt": 0, "maxResults": 50, "total": 1234,
+                   "issues": ISSUES}, ensure_ascii=False).encode("utf-8")
+
+
+def chunks_of(body, size):
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+class SearchDecoderTest(unittest.TestCase):
+    """Search responses decoded from chunks split wherever the network splits them"""
+
+    def assert_page(self, page):
+        self.assertEqual(page.total, 1234)
+        self.assertEqual([issue.key for issue in page.issues], ["PTD-1", "PTD-2"])
+        first = page.issues[0]
+        self.assertEqual(first.summary, "Buy crème brûlée 🍮")
+        self.assertEqual((first.status, first.issuetype, first.updated),
+                         ("To Do", "Task", "2026-10-18T09:00:00.000+0000"))
+        self.assertIsNone(page.issues[1].updated)
+
+    def test_whole_body(self):
+        self.assert_page(decode_search([BODY]))
+
+    def test_one_byte_chunks(self):
+        self.assert_page(decode_search(chunks_of(BODY, 1)))
+
+    def test_every_chunk_size(self):
+        for size in (2, 3, 7, 64, 1000):
+            with self.subTest(size=size):
+                self.assert_page(decode_search(chunks_of(BODY, size)))
+
+    def test_multibyte_character_split_across_chunks(self):
+        split = BODY.index("🍮".encode("utf-8")) + 2
+        self.assert_page(decode_search([BODY[:split], BODY[split:]]))
+
+    def test_number_split_at_the_end_of_a_chunk(self):
+        body = b'{"issues": [], "total": 1234}'
+        split = body.index(b"1234") + 2
+        decoder = SearchDecoder()
+        decoder.feed(body[:split])
+        self.assertIsNone(decoder.total)
+        decoder.feed(body[split:])
+        self.assertEqual(decoder.close().total, 1234)
+
+    def test_total_as_the_last_token_of_a_chunk(self):
+        self.assertEqual(decode_search([b'{"total": 12', b"34", b', "issues": []}']).total, 1234)
+
+    def test_bytes_read(self):
+        decoder = SearchDecoder()
+        for chunk in chunks_of(BODY, 100):
+            decoder.feed(chunk)
+        self.assertEqual(decoder.bytes_read, len(BODY))
+
+    def test_cut_short_body_raises(self):
+        for end in (0, len(BODY) // 2, len(BODY) - 1):
+            with self.subTest(end=end), self.assertRaises(ValueError):
+                decode_search(chunks_of(BODY[:end], 16))
+
+    def test_not_a_search_response_raises(self):
+        with self.assertRaises(ValueError):
+            decode_search([b"[1, 2, 3]"])
+        with self.assertRaises(ValueError):
+            decode_search([b'{"issues": []}'])
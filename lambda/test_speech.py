@@ -0,0 +1,67 @@
+import unittest
+
+from speech import CHARS_PER_SECOND, MAX_SPEECH_CHARS, SpeechRenderer, escape_ssml, speech_summaries
+
+
+class EscapeSsmlTest(unittest.TestCase):
+
+    def test_escapes_markup(self):
+        self.assertEqual(escape_ssml('Fix <b> & "quotes" in Bob\'s page'),
+                         "Fix &lt;b&gt; &amp; &quot;quotes&quot; in Bob&apos;s page")
+
+    def test_plain_text_is_unchanged(self):
+        self.assertEqual(escape_ssml("Buy milk"), "Buy milk")
+
+
+class SpeechRendererTest(unittest.TestCase):
+    """Summaries read out within a budget, ending with how many were left unsaid"""
+
+    def test_everything_fits(self):
+        self.assertEqual(speech_summaries(["Buy milk", "Call mum"], total=2), "Buy milk. Call mum. ")
+
+    def test_summaries_are_escaped(self):
+        self.assertEqual(speech_summaries(["Tom & Jerry <3"]), "Tom &amp; Jerry &lt;3. ")
+
+    def test_cut_short_with_and_n_more(self):
+        # 17 characters are kept for "And 1000000 more.", leaving room for two 10 character parts
+        renderer = SpeechRenderer(max_chars=37)
+        self.assertTrue(renderer.add("Task one"))
+        self.assertTrue(renderer.add("Task two"))
+        self.assertFalse(renderer.add("Task six"))
+        self.assertTrue(renderer.full)
+        self.assertEqual(renderer.spoken, 2)
+        speech = renderer.render(total=25)
+        self.assertEqual(speech, "Task one. Task two. And 23 more.")
+        self.assertLessEqual(len(speech), 37)
+
+    def test_nothing_more_is_added_once_full(self):
+        renderer = SpeechRenderer(max_chars=27)
+        self.assertFalse(renderer.add("A long task summary"))
+        self.assertFalse(renderer.add("Short"))
+        self.assertEqual(renderer.render(total=2), "And 2 more.")
+
+    def test_extend_leaves_the_rest_unread(self):
+        summaries = iter(["Task %d" % number for number in range(1000)])
+        renderer = SpeechRenderer(max_chars=100).extend(summaries)
+        self.assertEqual(next(summaries), "Task %d" % (renderer.spoken + 1))
+
+    def test_escaping_counts_against_the_budget(self):
+        self.assertTrue(SpeechRenderer(max_chars=17 + len("&amp;. ")).add("&"))
+        self.assertFalse(SpeechRenderer(max_chars=17 + len("&amp;. ") - 1).add("&"))
+
+    def test_max_seconds_tightens_the_budget(self):
+        summaries = ["Task number %d" % number for number in range(100)]
+        renderer = SpeechRenderer(max_seconds=5).extend(summaries)
+        speech = renderer.render(total=len(summaries))
+        self.assertLessEqual(len(speech), 5 * CHARS_PER_SECOND)
+        self.assertTrue(speech.endswith(f"And {100 - renderer.spoken} more."))
+
+    def test_large_lists_stay_within_the_character_limit(self):
+        summaries = ["Task number %d" % number for number in range(5000)]
+        speech = speech_summaries(summaries, total=len(summaries))
+        self.assertLessEqual(len(speech), MAX_SPEECH_CHARS)
+        self.assertIn("more.", speech)
+
+    def test_more_words_for_the_locale(self):
+        self.assertEqual(speech_summaries(["Eins", "Zwei"], max_chars=26, total=3, more=("Und", "weitere.")),
+                         "Eins. Und 2 weitere.")
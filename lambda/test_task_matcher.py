@@ -0,0 +1,59 @@
+import unittest
+
+from task_matcher import MATCH_THRESHOLD, TaskMatcher, normalize
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_drops_stop_words_accents_and_plurals(self):
+        self.assertEqual(normalize("The task to buy Crème Brûlées for my Mum"), ["buy", "creme", "brulee", "mum"])
+
+    def test_keeps_double_s(self):
+        self.assertEqual(normalize("pay the gas bills"), ["pay", "gas", "bill"])
+
+
+class TaskMatcherTest(unittest.TestCase):
+    """Resolving spoken names against a handful of summaries"""
+
+    def setUp(self):
+        self.matcher = TaskMatcher()
+        for key, summary in (("PTD-1", "Buy milk"), ("PTD-2", "Buy milk and eggs"), ("PTD-3", "Buy oat milk"),
+                             ("PTD-4", "Call mum"), ("PTD-5", "Book the car in for its service")):
+            self.matcher.add(key, summary)
+
+    def test_clear_match(self):
+        self.assertEqual(self.matcher.resolve("call my mum"), ("PTD-4", "Call mum"))
+
+    def test_part_of_a_long_summary_matches(self):
+        self.assertEqual(self.matcher.resolve("car service"), ("PTD-5", "Book the car in for its service"))
+
+    def test_mishearing_still_matches(self):
+        self.assertEqual(self.matcher.resolve("cal mum"), ("PTD-4", "Call mum"))
+
+    def test_ambiguous_name_isnt_resolved(self):
+        self.assertIsNone(self.matcher.resolve("milk"))
+        key, summary, clear = self.matcher.best("milk")
+        self.assertFalse(clear)
+        self.assertIn(key, ("PTD-1", "PTD-2", "PTD-3"))
+
+    def test_exact_summary_is_clear(self):
+        self.assertEqual(self.matcher.best("buy milk"), ("PTD-1", "Buy milk", True))
+
+    def test_below_threshold_is_no_match(self):
+        self.assertIsNone(self.matcher.best("walk the dog"))
+        self.assertTrue(all(score < MATCH_THRESHOLD for score, key, summary in self.matcher.match("walk dog")))
+
+    def test_match_all_ranks_every_good_match(self):
+        keys = [key for score, key, summary in self.matcher.match_all("buy milk")]
+        self.assertEqual(keys[0], "PTD-1")
+        self.assertEqual(set(keys), {"PTD-1", "PTD-2", "PTD-3"})
+
+    def test_removed_task_no_longer_matches(self):
+        self.matcher.remove("PTD-4")
+        self.assertIsNone(self.matcher.resolve("call mum"))
+        self.assertEqual(len(self.matcher), 4)
+
+    def test_re_adding_replaces_the_summary(self):
+        self.matcher.add("PTD-4", "Walk the dog")
+        self.assertEqual(self.matcher.resolve("walk dog"), ("PTD-4", "Walk the dog"))
+        self.assertIsNone(self.matcher.resolve("call mum"))
@@ -0,0 +1,45 @@
+import unittest
+
+from alexa_jira_helper import split_task_names, spoken_task_names
+
+
+class SplitTaskNamesTest(unittest.TestCase):
+    """Task names as Alexa's slot values give them, which are unpunctuated unless the user paused"""
+
+    def test_one_task_without_a_comma(self):
+        self.assertEqual(split_task_names("buy fish and chips"), ["buy fish and chips"])
+        self.assertEqual(split_task_names("call mum then walk the dog"), ["call mum then walk the dog"])
+
+    def test_and_closes_a_comma_list(self):
+        self.assertEqual(split_task_names("milk, eggs and bread"), ["milk", "eggs", "bread"])
+        self.assertEqual(split_task_names("milk, eggs, and bread"), ["milk", "eggs", "bread"])
+        self.assertEqual(split_task_names("buy milk, then call mum"), ["buy milk", "call mum"])
+
+    def test_empty(self):
+        self.assertEqual(split_task_names(""), [])
+        self.assertEqual(split_task_names(" , ; "), [])
+
+
+class SpokenTaskNamesTest(unittest.TestCase):
+    """The lists an unpunctuated utterance may be, for the user to confirm"""
+
+    def test_and_joined_speech(self):
+        self.assertEqual(spoken_task_names("buy milk and call mum"), ["buy milk", "call mum"])
+        self.assertEqual(spoken_task_names("milk and eggs and bread"), ["milk", "eggs", "bread"])
+        self.assertEqual(spoken_task_names("buy fish and chips"), ["buy fish", "chips"])
+
+    def test_then_joined_speech(self):
+        self.assertEqual(spoken_task_names("book the car in then call the garage and then pay the bill"),
+                         ["book the car in", "call the garage", "pay the bill"])
+
+    def test_single_task(self):
+        self.assertIsNone(spoken_task_names("renew passport"))
+        self.assertIsNone(spoken_task_names("hand in the brand new report"))
+        self.assertIsNone(spoken_task_names(""))
+
+    def test_leading_and_isnt_a_task(self):
+        self.assertEqual(spoken_task_names("and then call mum and walk the dog"), ["call mum", "walk the dog"])
+        self.assertIsNone(spoken_task_names("and"))
+
+    def test_punctuated_speech_is_left_to_split_task_names(self):
+        self.assertIsNone(spoken_task_names("milk, eggs and bread"))
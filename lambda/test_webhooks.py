@@ -0,0 +1,100 @@
+import unittest
+
+import alexa_jira_helper
+import webhooks
+from jira_instance import JiraInstance
+from task_index import TaskIndex
+
+SITE = "test-site"
+INDEX_KEY = ("test-user", SITE, "PTD", JiraInstance.TYPE_TASK["Name"])
+
+
+def issue_event(event_name, key, summary="Buy milk", status="To Do", updated="2026-10-18T09:00:00.000+0000",
+                issue_type="Task", project_key="PTD", timestamp=None):
+    """A webhook payload shaped like Jira's"""
+    return {
+        "webhookEvent": event_name,
+        "timestamp": timestamp,
+        "issue": {"key": key, "fields": {
+            "summary": summary, "status": {"name": status}, "issuetype": {"name": issue_type},
+            "project": {"key": project_key}, "updated": updated}},
+    }
+
+
+class ApplyEventTest(unittest.TestCase):
+    """Webhook events applied to a task index, in the orders Jira may deliver them"""
+
+    def setUp(self):
+        self.index = TaskIndex(closed_statuses=[JiraInstance.STATUS_DONE])
+        self.index.replace([{"key": "PTD-1", "summary": "Call mum", "status": "To Do",
+                             "updated": "2026-10-18T08:00:00.000+0000"}], 0)
+        alexa_jira_helper.task_indexes.put(INDEX_KEY, self.index)
+        self.addCleanup(alexa_jira_helper.task_indexes.invalidate, INDEX_KEY)
+
+    def apply(self, payload):
+        return webhooks.apply_event(SITE, payload)
+
+    def test_created_issue_is_added(self):
+        self.assertEqual(self.apply(issue_event(webhooks.EVENT_CREATED, "PTD-2")), 1)
+        self.assertIn("PTD-2", self.index)
+        self.assertIsNotNone(self.index.last_event)
+
+    def test_duplicate_delivery_changes_nothing_more(self):
+        event = issue_event(webhooks.EVENT_UPDATED, "PTD-1", summary="Call dad",
+                            updated="2026-10-18T10:00:00.000+0000")
+        self.assertEqual(self.apply(event), 1)
+        self.apply(event)
+        self.assertEqual(len(self.index), 1)
+        self.assertEqual(self.index.get("PTD-1")["summary"], "Call dad")
+
+    def test_late_update_is_ignored(self):
+        self.apply(issue_event(webhooks.EVENT_UPDATED, "PTD-1", summary="Newer",
+                               updated="2026-10-18T10:00:00.000+0000"))
+        self.assertEqual(self.apply(issue_event(webhooks.EVENT_UPDATED, "PTD-1", summary="Older",
+                                                updated="2026-10-18T09:00:00.000+0000")), 0)
+        self.assertEqual(self.index.get("PTD-1")["summary"], "Newer")
+
+    def test_update_to_done_removes(self):
+        self.apply(issue_event(webhooks.EVENT_UPDATED, "PTD-1", status=JiraInstance.STATUS_DONE,
+                               updated="2026-10-18T10:00:00.000+0000"))
+        self.assertNotIn("PTD-1", self.index)
+
+    def test_update_delivered_after_delete_doesnt_bring_it_back(self):
+        # Deleted at 11:00, then a 10:00 update arrives late
+        deleted_at = 1792321200000
+        self.assertEqual(self.apply(issue_event(webhooks.EVENT_DELETED, "PTD-1", timestamp=deleted_at)), 1)
+        self.assertEqual(self.apply(issue_event(webhooks.EVENT_UPDATED, "PTD-1",
+                                                updated="2026-10-18T10:00:00.000+0000")), 0)
+        self.assertNotIn("PTD-1", self.index)
+        self.assertEqual(self.apply(issue_event(webhooks.EVENT_UPDATED, "PTD-1",
+                                                updated="2026-10-18T12:00:00.000+0000")), 1)
+        self.assertIn("PTD-1", self.index)
+
+    def test_moved_to_another_issue_type_is_removed(self):
+        self.assertEqual(self.apply(issue_event(webhooks.EVENT_UPDATED, "PTD-1", issue_type="Bug",
+                                                updated="2026-10-18T10:00:00.000+0000")), 1)
+        self.assertNotIn("PTD-1", self.index)
+
+    def test_other_project_and_unknown_events_are_ignored(self):
+        self.assertEqual(self.apply(issue_event(webhooks.EVENT_CREATED, "OTH-1", project_key="OTH")), 0)
+        self.assertEqual(self.apply(issue_event("comment_created", "PTD-3")), 0)
+        self.assertEqual(len(self.index), 1)
+
+    def test_restricted_issue_only_updates_known_issues(self):
+        unknown = issue_event(webhooks.EVENT_CREATED, "PTD-4")
+        unknown["issue"]["fields"]["security"] = {"name": "Private"}
+        self.assertEqual(self.apply(unknown), 0)
+        known = issue_event(webhooks.EVENT_UPDATED, "PTD-1", summary="Call dad",
+                            updated="2026-10-18T10:00:00.000+0000")
+        known["issue"]["fields"]["security"] = {"name": "Private"}
+        self.assertEqual(self.apply(known), 1)
+
+
+class SignatureTest(unittest.TestCase):
+
+    def test_signed_body_verifies(self):
+        body = b'{"webhookEvent": "jira:issue_created"}'
+        self.assertTrue(webhooks.verify_signature(body, webhooks.signature(body, "secret"), "secret"))
+        self.assertFalse(webhooks.verify_signature(body, webhooks.signature(body, "other"), "secret"))
+        self.assertFalse(webhooks.verify_signature(body, None, "secret"))
+        self.assertFalse(webhooks.verify_signature(body, webhooks.signature(body, "secret"), None))
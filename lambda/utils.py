@@ -1,7 +1,5 @@
 import logging
 import os
-import boto3
-from botocore.exceptions import ClientError
 
 
 def create_presigned_url(object_name):
@@ -10,6 +8,10 @@ def create_presigned_url(object_name):
     :param object_name: string
     :return: Presigned URL as string. If error, returns None.
     """
+    # boto3 is slow to import and rarely needed, so load it on first use
+    import boto3
+    from botocore.exceptions import ClientError
+
     s3_client = boto3.client('s3',
                              region_name=os.environ.get('S3_PERSISTENCE_REGION'),
                              config=boto3.session.Config(signature_version='s3v4',s3={'addressing_style': 'path'}))
@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import http_pool
+import persistence
+from alexa_jira_helper import PROJECT_KEYS, AlexaJiraHelper
+from cache import TTLCache
+from deadline import Deadline
+from jira_instance import JiraInstance
+from metrics import InvocationMetrics
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Containers each scheduled run keeps warm, counting the one it runs in
+WARM_CONTAINERS = int(os.environ.get("WARM_CONTAINERS", "1"))
+# Most recently active users to precompute answers for on each run. Off by default, because it means keeping
+# users' access tokens in the persistence bucket between requests, encrypted with the TOKEN_KMS_KEY_ID key
+PRECOMPUTE_USERS = int(os.environ.get("PRECOMPUTE_USERS", "0"))
+PRECOMPUTE_WORKERS = 4
+PRECOMPUTE_BUDGET = 5.0
+
+# Marks the invocations a scheduled run sends to warm further containers. Each holds its container a moment, so
+# concurrent pings can't all be served by the same one
+PING = "warmupPing"
+PING_HOLD = 0.25
+
+# A user's active record is refreshed at most this often by one container
+ACTIVE_MARK_INTERVAL = 10 * 60
+active_marks = TTLCache(1024, ACTIVE_MARK_INTERVAL)
+
+
+def is_scheduled(event):
+    """True for a scheduled EventBridge event, or a warm up ping"""
+    return event.get("source") == "aws.events" or PING in event
+
+
+def note_active(user_id, access_token):
+    """Records a user as active, so the next scheduled run precomputes their answers"""
+    if PRECOMPUTE_USERS <= 0 or user_id is None or persistence.token_cipher is None:
+        return
+    key = persistence.user_key(user_id)
+    if active_marks.get(key) is None:
+        active_marks.put(key, True)
+        persistence.save_active_async(key, access_token)
+
+
+def warm_container(users):
+    """Loads what a first request would otherwise wait for: the HTTP pool, with a connection to Atlassian already
+    open, the S3 client, and each active user's snapshot, site id and project metadata"""
+    session = http_pool.get_session()
+    from requests import exceptions as request_errors
+    try:
+        # Not signed, so refused, but the connection and TLS session are left in the pool
+        session.get(JiraInstance.BASE_RESOURCE_URL, timeout=http_pool.default_timeout())
+    except request_errors.RequestException as e:
+        logger.info(f"Warm up connection failed: {type(e).__name__}")
+    if hasattr(persistence.snapshot_store, "client"):
+        persistence.snapshot_store.client()
+
+    seeded = 0
+    for record in users:
+        snapshot = persistence.load_snapshot(record["user_key"])
+        if snapshot is None:
+            continue
+        jira_instance = JiraInstance(record["access_token"])
+        jira_instance.seed_site_id(snapshot.get("site_id"), snapshot.get("cloud_ids"))
+        jira_instance.seed_metadata(snapshot.get("site_id"), PROJECT_KEYS, snapshot.get("projects"))
+        seeded += 1
+    return seeded
+
+
+def precompute_user(record):
+    """Works out a user's To Do count and list and saves them as a precomputed snapshot. The user's active record
+    is deleted either way, so their token is only kept until it's been used once"""
+    key = record["user_key"]
+    metrics = InvocationMetrics("Precompute")
+    try:
+        # No snapshot is passed in, so the answers come from Jira rather than from the last precompute
+        helper = AlexaJiraHelper(record["access_token"], Deadline(PRECOMPUTE_BUDGET), metrics, None, key)
+        if not helper.connected:
+            return False
+        helper.todo_task_count()
+        helper.todo_task_items()
+        snapshot = helper.build_snapshot(precomputed=True)
+        return snapshot is not None and persistence.save_snapshot(key, snapshot)
+    finally:
+        persistence.used_active(key)
+
+
+def fan_out(context, count):
+    """Invokes this function count times at once with a ping, returning the futures of the invocations"""
+    function_name = getattr(context, "invoked_function_arn", None) or os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+    if count <= 0 or not function_name:
+        return []
+    # boto3 is slow to import, and only the scheduled run needs the Lambda client
+    import boto3
+    client = boto3.client("lambda")
+    payload = json.dumps({PING: True}).encode("utf-8")
+    pool = ThreadPoolExecutor(max_workers=count, thread_name_prefix="warmup-ping")
+    futures = [pool.submit(client.invoke, FunctionName=function_name, InvocationType="RequestResponse",
+                           Payload=payload) for _ in range(count)]
+    pool.shutdown(wait=False)
+    return futures
+
+
+def handle_scheduled(event, context):
+    """Runs a scheduled warm up: pings to warm more containers, then this container warmed and the answers of
+    recently active users precomputed. A ping just warms the container it lands on"""
+    started = time.perf_counter()
+    users = persistence.recently_active()[:PRECOMPUTE_USERS] if PRECOMPUTE_USERS > 0 else []
+    if event.get(PING):
+        seeded = warm_container(users)
+        time.sleep(PING_HOLD)
+        return {"warmed": True, "seeded": seeded}
+
+    pings = fan_out(context, WARM_CONTAINERS - 1)
+    seeded = warm_container(users)
+    with ThreadPoolExecutor(max_workers=PRECOMPUTE_WORKERS, thread_name_prefix="precompute") as pool:
+        precomputed = sum(pool.map(precompute_user, users))
+    done, not_done = wait(pings, timeout=PRECOMPUTE_BUDGET)
+    summary = {
+        "pings": len(pings),
+        "pingsFailed": len(not_done) + sum(1 for future in done if future.exception() is not None),
+        "activeUsers": len(users),
+        "seeded": seeded,
+        "precomputed": precomputed,
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+    logger.info(f"Warm up: {summary}")
+    return summary
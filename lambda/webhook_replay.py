@@ -0,0 +1,133 @@
+# Webhook replay - posts recorded Jira webhook payloads through lambda_handler as signed function URL events,
+# optionally shuffled and duplicated the way real deliveries can arrive, then checks the task index against Jira
+# and that a read intent no longer needs a sync.
+import argparse
+import json
+import os
+import random
+import time
+
+import alexa_jira_helper
+import lambda_function
+import metrics
+import webhooks
+from envelopes import LocalLambdaContext, build_envelope
+from jira_stand_in import JiraStandIn
+
+ACCESS_TOKEN = "webhook-replay-token"
+USER_ID = "amzn1.ask.account.webhook-replay"
+
+
+def webhook_event(payload, secret, site_id):
+    """Wraps a payload the way a Lambda function URL delivers a signed POST"""
+    body = json.dumps(payload)
+    return {
+        "version": "2.0",
+        "rawPath": "/",
+        "rawQueryString": f"site={site_id}",
+        "queryStringParameters": {"site": site_id},
+        "headers": {"content-type": "application/json",
+                    "x-hub-signature": webhooks.signature(body.encode("utf-8"), secret)},
+        "requestContext": {"http": {"method": "POST", "path": "/"}},
+        "body": body,
+        "isBase64Encoded": False,
+    }
+
+
+def ask(intent_name, stand_in):
+    """Sends a read intent, returning what was said and the Jira calls it took"""
+    stand_in.calls.clear()
+    envelope = build_envelope("IntentRequest", intent_name, access_token=ACCESS_TOKEN, user_id=USER_ID)
+    response = lambda_function.lambda_handler(envelope, LocalLambdaContext())
+    return response["response"]["outputSpeech"]["ssml"], dict(stand_in.calls)
+
+
+def make_changes(stand_in, changes, rng):
+    """Changes the stand-in the way people do in Jira itself, recording a webhook payload for each"""
+    for number in range(changes):
+        # Jira's updated time is to the millisecond, so changes closer together than that can't be ordered
+        time.sleep(0.002)
+        open_issues = [issue for issue in stand_in.issues if issue["status"] != "Complete"]
+        choice = rng.random()
+        if choice < 0.3 or not open_issues:
+            stand_in.create_one({"fields": {"summary": f"Webhook task {number}", "issuetype": {"name": "Task"}}})
+        elif choice < 0.6:
+            stand_in.edit_issue(rng.choice(open_issues)["key"], f"Renamed task {number}")
+        elif choice < 0.9:
+            issue = rng.choice(open_issues)
+            stand_in.transition(issue["key"], {"transition": {"id": rng.choice(["21", "31"])}})
+        else:
+            stand_in.delete_issue(rng.choice(open_issues)["key"])
+
+
+def index_mismatches(stand_in, index):
+    """Open Tasks where the index and the stand-in disagree"""
+    expected = {issue["key"]: (issue["summary"], issue["status"]) for issue in stand_in.issues
+                if issue["status"] != "Complete" and issue["issuetype"] == "Task"}
+    actual = {key: (record["summary"], record["status"]) for key, record in index.issues.items()}
+    return sorted(key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key))
+
+
+def do_replay(stand_in, payloads, secret, shuffle, duplicates, rng):
+    """Delivers the payloads through lambda_handler, then a forged one"""
+    # Out of order and repeated deliveries should make no difference to the outcome
+    deliveries = list(payloads) + [rng.choice(payloads) for _ in range(duplicates if payloads else 0)]
+    if shuffle:
+        rng.shuffle(deliveries)
+    statuses = {}
+    start = time.perf_counter()
+    for payload in deliveries:
+        response = lambda_function.lambda_handler(webhook_event(payload, secret, stand_in.site_id),
+                                                  LocalLambdaContext())
+        statuses[response["statusCode"]] = statuses.get(response["statusCode"], 0) + 1
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"Replayed {len(deliveries)} deliveries in {elapsed_ms:.1f} ms "
+          f"({elapsed_ms / max(1, len(deliveries)):.2f} ms each), status codes {statuses}")
+
+    # A bad signature must be refused
+    forged = webhook_event(payloads[0] if payloads else {}, secret + "x", stand_in.site_id)
+    print(f"Forged delivery answered {lambda_function.lambda_handler(forged, LocalLambdaContext())['statusCode']}")
+
+
+# Run the main function
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay Jira webhook payloads through the skill's Lambda handler")
+    parser.add_argument("--payloads", help="JSON lines file of recorded payloads, instead of generating them")
+    parser.add_argument("--save", help="write the generated payloads to this JSON lines file")
+    parser.add_argument("--issues", type=int, default=50, help="issues in the stand-in project")
+    parser.add_argument("--changes", type=int, default=40, help="changes to make when generating payloads")
+    parser.add_argument("--shuffle", action="store_true", help="deliver the payloads out of order")
+    parser.add_argument("--duplicates", type=int, default=0, help="extra repeated deliveries")
+    parser.add_argument("--secret", default="webhook-replay-secret")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    webhooks.WEBHOOK_SECRET = args.secret
+    metrics.stream = open(os.devnull, "w")
+    server = JiraStandIn(args.issues, seed=args.seed, record_webhooks=True)
+    server.start()
+    server.use_for_jira()
+    try:
+        # Build the user's task index, as their first request would
+        print(f"Before: {ask('GetToDoCountIntent', server)}")
+        key, index = alexa_jira_helper.site_indexes(server.site_id)[0]
+
+        if args.payloads:
+            with open(args.payloads) as payload_file:
+                recorded = [json.loads(line) for line in payload_file if line.strip()]
+        else:
+            make_changes(server, args.changes, rng)
+            recorded = list(server.webhook_events)
+            if args.save:
+                with open(args.save, "w") as payload_file:
+                    payload_file.writelines(json.dumps(payload) + "\n" for payload in recorded)
+
+        do_replay(server, recorded, args.secret, args.shuffle, args.duplicates, rng)
+        if not args.payloads:
+            # Recorded payloads describe some other Jira, so only generated ones can be checked
+            mismatches = index_mismatches(server, index)
+            print(f"Index has {len(index)} open Tasks, {len(mismatches)} differ from Jira {mismatches[:10]}")
+        print(f"After: {ask('GetToDoCountIntent', server)}")
+    finally:
+        server.stop()
@@ -0,0 +1,131 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from alexa_jira_helper import index_changed, site_indexes
+from jira_instance import JiraInstance
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Shared secret set on the Jira webhook, which signs each delivery. Deliveries are refused without one
+WEBHOOK_SECRET = os.environ.get("JIRA_WEBHOOK_SECRET")
+SIGNATURE_HEADER = "x-hub-signature"
+# The webhook URL is registered per site with ?site=<cloud id>, payloads only name the site by its URL
+SITE_PARAMETER = "site"
+
+# Issue events, a transition being an update to the status
+EVENT_CREATED = "jira:issue_created"
+EVENT_UPDATED = "jira:issue_updated"
+EVENT_DELETED = "jira:issue_deleted"
+
+
+def is_webhook(event):
+    """True for an HTTP event from the function URL or API Gateway, rather than an Alexa request"""
+    return "headers" in event and "body" in event and "request" not in event
+
+
+def signature(body, secret):
+    """The X-Hub-Signature value Jira sends for a body, e.g. sha256=<hex HMAC>"""
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, received, secret):
+    """Checks a delivery was signed with the shared secret, in constant time"""
+    if not secret or not received:
+        return False
+    return hmac.compare_digest(signature(body, secret), received)
+
+
+def request_body(event):
+    """The raw body of an HTTP event, as bytes, exactly as it was signed"""
+    body = event.get("body") or ""
+    if event.get("isBase64Encoded"):
+        return base64.b64decode(body)
+    return body.encode("utf-8")
+
+
+def header(event, name):
+    """Looks up a header, whatever case the caller sent it in"""
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def response(status_code, message=None):
+    """Builds the HTTP response for the function URL or API Gateway"""
+    return {
+        "statusCode": status_code,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps({"message": message}) if message else "",
+    }
+
+
+def event_time(payload):
+    """When Jira raised the event, from its timestamp in milliseconds"""
+    timestamp = payload.get("timestamp")
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc)
+
+
+def apply_event(site_id, payload):
+    """Applies one issue event to every task index this container holds for the site. Returns how many
+    indexes it changed"""
+    event_name = payload.get("webhookEvent")
+    issue = payload.get("issue") or {}
+    if event_name not in (EVENT_CREATED, EVENT_UPDATED, EVENT_DELETED) or "key" not in issue:
+        return 0
+    fields = issue.get("fields") or {}
+    project_key = (fields.get("project") or {}).get("key")
+    issue_type = (fields.get("issuetype") or {}).get("name")
+    record = JiraInstance.index_record(issue)
+    # Issues with a security level may be hidden from some users, so they're only updated where already known
+    restricted = fields.get("security") is not None
+
+    changed = 0
+    now = time.time()
+    for index_key, index in site_indexes(site_id):
+        user_key, _, index_project, index_type = index_key
+        # Any delivery shows the stream is flowing for the site
+        index.last_event = now
+        if index_project != project_key:
+            continue
+        if event_name == EVENT_DELETED:
+            applied = index.delete(issue["key"], event_time(payload))
+        elif issue_type != index_type:
+            # Moved to another issue type, so no longer one of this index's
+            applied = index.delete(issue["key"], None)
+        elif restricted and issue["key"] not in index:
+            applied = False
+        else:
+            applied = index.upsert(record)
+        if applied:
+            index_changed(index_key)
+            changed += 1
+    return changed
+
+
+def handle_webhook(event):
+    """Verifies a Jira webhook delivery and applies it to the task indexes in this container"""
+    body = request_body(event)
+    if not verify_signature(body, header(event, SIGNATURE_HEADER), WEBHOOK_SECRET):
+        logger.warning("Webhook refused: bad or missing signature")
+        return response(401, "Invalid signature")
+    site_id = (event.get("queryStringParameters") or {}).get(SITE_PARAMETER)
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return response(400, "Invalid JSON")
+    if not site_id:
+        return response(400, f"Missing {SITE_PARAMETER} parameter")
+
+    changed = apply_event(site_id, payload)
+    logger.info(f"Webhook {payload.get('webhookEvent')} changed {changed} task indexes")
+    return response(204)